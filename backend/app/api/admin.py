@@ -1,88 +1,137 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
-from sqlalchemy.orm import Session
-from typing import List
-
-from app import schemas, models, auth
-from app.database import get_db
-from app.auth import get_current_user, get_password_hash
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+from app import schemas, models, auth, tasks
+from app.database import get_db, get_pool_stats
+from app.auth import get_current_admin
+from app.hashing import hashing_pool
+from app.jobs import job_queue
+from app.catalog_index import catalog_index
+from app.reference_data import reference_data, CATEGORIES
+from app.serialization import NDJSON_MEDIA_TYPE, list_response, stream_ndjson
+from app.pagination import (
+    NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER, TOTAL_COUNT_EXACT_HEADER,
+    encode_cursor, decode_cursor, estimate_count, prefix_range
+)
+from app.response_cache import response_cache, seller_tag, CATALOG
 
 router = APIRouter()
 
 
-@router.get("/users", response_model=List[schemas.UserResponse])
-def get_all_users(
-        authorization: str = Header(None),  # ヘッダーから取得
-        db: Session = Depends(get_db)
+# 一覧に返す項目（パスワードのハッシュは返さない）
+USER_LIST_COLUMNS = [
+    models.User.id,
+    models.User.email,
+    models.User.username,
+    models.User.role,
+    models.User.is_active,
+    models.User.created_at,
+]
+
+
+def _user_list_query(role: Optional[str], is_active: Optional[bool], q: Optional[str]):
+    """絞り込み条件付きのユーザー一覧（新しい順）"""
+    query = select(*USER_LIST_COLUMNS)
+    if role:
+        query = query.where(models.User.role == models.UserRole(role))
+    if is_active is not None:
+        query = query.where(models.User.is_active == is_active)
+    if q:
+        # ユーザー名・メールアドレスの前方一致（それぞれのユニークインデックスを使う）
+        query = query.where(or_(
+            prefix_range(models.User.username, q),
+            prefix_range(models.User.email, q)
+        ))
+    return query.order_by(models.User.id.desc())
+
+
+@router.get("/users", response_model=List[schemas.User])
+async def get_all_users(
+        response: Response,
+        limit: int = Query(50, ge=1, le=200),
+        cursor: Optional[str] = None,
+        role: Optional[str] = Query(None, pattern="^(user|admin)$"),
+        is_active: Optional[bool] = None,
+        q: Optional[str] = Query(None, min_length=1, max_length=100),
+        format: str = Query("json", pattern="^(json|ndjson)$"),
+        current_user: auth.Principal = Depends(get_current_admin),
+        db: AsyncSession = Depends(get_db)
 ):
-    """全ユーザー取得（管理者のみ）"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="認証が必要です")
-
-    token = authorization.replace("Bearer ", "")
-    current_user = auth.get_current_user(token, db)
-
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="権限がありません")
-
-    users = db.query(models.User).all()
-    return users
+    """ユーザー一覧（管理者のみ・新しい順・カーソルページネーション）
+
+    1ページ目は X-Total-Count に件数（多い場合は概算）を返す。
+    format=ndjson の場合は条件に合う全ユーザーを1行ずつストリーミングで返す。
+    """
+    query = _user_list_query(role, is_active, q)
+
+    if format == "ndjson":
+        return StreamingResponse(stream_ndjson(query), media_type=NDJSON_MEDIA_TYPE)
+
+    if cursor:
+        data = decode_cursor(cursor)
+        try:
+            last_id = int(data["id"])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="カーソルが不正です")
+        page_query = query.where(models.User.id < last_id)
+    else:
+        total, exact = await estimate_count(db, query)
+        response.headers[TOTAL_COUNT_HEADER] = str(total)
+        response.headers[TOTAL_COUNT_EXACT_HEADER] = "true" if exact else "false"
+        page_query = query
+
+    # 1件多く取得して次ページの有無を判定
+    rows = (await db.execute(page_query.limit(limit + 1))).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor({"id": rows[-1].id})
+
+    return list_response(schemas.User, rows, dict(response.headers))
 
 
 @router.delete("/users/{user_id}")
-def delete_user(
+async def delete_user(
         user_id: int,
-        authorization: str = Header(None),  # ヘッダーから取得
-        db: Session = Depends(get_db)
+        current_user: auth.Principal = Depends(get_current_admin),
+        db: AsyncSession = Depends(get_db)
 ):
-    """ユーザー削除（管理者のみ）"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="認証が必要です")
+    """ユーザー削除（管理者のみ）
 
-    token = authorization.replace("Bearer ", "")
-    current_user = auth.get_current_user(token, db)
-
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="権限がありません")
-
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    商品の論理削除はバックグラウンドジョブで行う（進み具合は /api/jobs/{job_id} で確認できる）。
+    """
+    user = await db.get(models.User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="ユーザーが見つかりません")
 
     if user.role == "admin":
         raise HTTPException(status_code=400, detail="管理者は削除できません")
 
-    # ユーザーの商品を論理削除
-    db.query(models.Product).filter(
-        models.Product.seller_id == user_id
-    ).update({
-        "status": "deleted",
-        "is_active": False
-    })
+    # ユーザーの商品の論理削除は商品数に比例して重いため、削除と同じトランザクションでジョブに登録する
+    job = await tasks.enqueue_seller_cleanup(db, user_id, created_by=current_user.id)
 
-    db.delete(user)
-    db.commit()
+    await db.delete(user)
+    await db.commit()
+    job_queue.notify()
+    auth.invalidate_user(user_id)
+    # ジョブは別プロセスのワーカーで実行されることがあるため、このプロセスの索引・キャッシュはここで外す
+    catalog_index.remove_seller(user_id)
+    await response_cache.invalidate(CATALOG, seller_tag(user_id))
 
-    return {"message": "ユーザーを削除しました"}
+    return {"message": "ユーザーを削除しました", "job_id": job.id}
 
 
 @router.put("/users/{user_id}")
-def update_user(
+async def update_user(
         user_id: int,
         user_update: dict,
-        authorization: str = Header(None),
-        db: Session = Depends(get_db)
+        current_user: auth.Principal = Depends(get_current_admin),
+        db: AsyncSession = Depends(get_db)
 ):
     """ユーザー情報更新（管理者のみ）"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="認証が必要です")
-
-    token = authorization.replace("Bearer ", "")
-    current_user = auth.get_current_user(token, db)
-
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="権限がありません")
-
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await db.get(models.User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="ユーザーが見つかりません")
 
@@ -95,9 +144,64 @@ def update_user(
         user.role = user_update["role"]
     if "password" in user_update and user_update["password"]:
         # パスワードが空でない場合のみハッシュ化して更新
-        user.hashed_password = get_password_hash(user_update["password"])
+        user.hashed_password = await hashing_pool.hash(user_update["password"])
+
+    await db.commit()
+    auth.invalidate_user(user_id)
+    if "username" in user_update:
+        # 商品のレスポンスに出品者名が含まれるため
+        await response_cache.invalidate(CATALOG, seller_tag(user_id))
+
+    return {"message": "ユーザー情報を更新しました"}
 
-    db.commit()
-    db.refresh(user)
 
-    return {"message": "ユーザー情報を更新しました"}
\ No newline at end of file
+@router.post("/categories", response_model=schemas.Category)
+async def create_category(
+        category: schemas.CategoryCreate,
+        current_user: auth.Principal = Depends(get_current_admin),
+        db: AsyncSession = Depends(get_db)
+):
+    """カテゴリ追加（管理者のみ）"""
+    result = await db.execute(
+        select(models.Category).where(
+            (models.Category.name == category.name) |
+            (models.Category.slug == category.slug)
+        )
+    )
+    if result.scalars().first():
+        raise HTTPException(status_code=400, detail="カテゴリ名またはslugは既に使用されています")
+
+    db_category = models.Category(**category.dict())
+    db.add(db_category)
+    await db.commit()
+    await db.refresh(db_category)
+    reference_data.invalidate(CATEGORIES)
+    catalog_index.add_category(db_category.slug, db_category.id)
+    # 件数集計のレスポンスにはカテゴリの一覧が含まれる
+    await response_cache.invalidate(CATALOG)
+
+    return db_category
+
+
+@router.get("/cache")
+async def get_response_cache_stats(current_user: auth.Principal = Depends(get_current_admin)):
+    """レスポンスキャッシュの統計（管理者のみ）"""
+    return response_cache.stats()
+
+
+@router.get("/jobs")
+async def get_job_stats(current_user: auth.Principal = Depends(get_current_admin)):
+    """バックグラウンドジョブの統計（管理者のみ）"""
+    return await job_queue.stats()
+
+
+@router.get("/catalog-index")
+async def get_catalog_index_stats(current_user: auth.Principal = Depends(get_current_admin)):
+    """カタログ索引の統計（管理者のみ）"""
+    return catalog_index.stats()
+
+
+@router.get("/db/pool")
+async def get_db_pool_stats(current_user: auth.Principal = Depends(get_current_admin)):
+    """DBコネクションプールの統計（管理者のみ）"""
+    return get_pool_stats()
@@ -1,37 +1,39 @@
 # 認証用のAPIエンドポイント
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 from .. import models, schemas, auth
 from ..database import get_db
+from ..hashing import hashing_pool
 
 router = APIRouter()
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
-
 
 @router.post("/register", response_model=schemas.User)
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register(user: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
     """新規ユーザー登録"""
     # メールアドレスの重複チェック
-    if db.query(models.User).filter(models.User.email == user.email).first():
+    if await auth.get_user_by_email(db, user.email):
         raise HTTPException(status_code=400, detail="メールアドレスは既に使用されています")
 
     # ユーザー名の重複チェック
-    if db.query(models.User).filter(models.User.username == user.username).first():
+    if await auth.get_user_by_username(db, user.username):
         raise HTTPException(status_code=400, detail="ユーザー名は既に使用されています")
 
-    return auth.create_user(db=db, user=user)
+    # ハッシュ計算はプロセスプールで行う
+    hashed_password = await hashing_pool.hash(user.password)
+
+    return await auth.create_user(db, user, hashed_password)
 
 
 @router.post("/login", response_model=schemas.LoginResponse)
-def login(
+async def login(
         form_data: OAuth2PasswordRequestForm = Depends(),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
     """ユーザーログイン"""
-    user = auth.authenticate_user(db, form_data.username, form_data.password)
+    user = await auth.authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -40,8 +42,10 @@ def login(
         )
 
     access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
+    principal = auth.principal_from_user(user)
     access_token = auth.create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={"sub": user.username, "user_id": user.id, "role": principal.role},
+        expires_delta=access_token_expires
     )
 
     return {
@@ -54,29 +58,6 @@ def login(
 
 
 @router.get("/me", response_model=schemas.User)
-def read_users_me(
-        token: str = Depends(oauth2_scheme),
-        db: Session = Depends(get_db)
-):
+async def read_users_me(current_user: auth.Principal = Depends(auth.get_current_user)):
     """現在のユーザー情報を取得"""
-    from jose import JWTError, jwt
-
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="認証情報を検証できませんでした",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-
-    try:
-        payload = jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-
-    user = auth.get_user_by_username(db, username=username)
-    if user is None:
-        raise credentials_exception
-
-    return user
\ No newline at end of file
+    return current_user
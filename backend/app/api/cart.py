@@ -0,0 +1,23 @@
+# カート用APIエンドポイント（カートの中身はクライアントのLocalStorageに保存）
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from .. import schemas, auth
+from ..database import get_db
+from ..quotes import build_quote
+
+router = APIRouter()
+
+
+@router.post("/quote", response_model=schemas.CartQuote)
+async def quote_cart(
+        cart: schemas.CartQuoteRequest,
+        current_user: Optional[auth.Principal] = Depends(auth.get_optional_user),
+        db: AsyncSession = Depends(get_db)
+):
+    """カートの全明細の現在の価格・在庫を確認し、購入できれば署名付きの見積もりを返す
+
+    商品は1回のクエリでまとめて読み込む。明細ごとに価格の変更・在庫不足・販売停止を返す。
+    見積もりはログイン中のみ発行し、そのユーザーの注文で1回だけ使える。
+    """
+    return await build_quote(db, cart.items, current_user.id if current_user else None)
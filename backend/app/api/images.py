@@ -0,0 +1,49 @@
+# 商品画像の配信用APIエンドポイント
+import os
+from fastapi import APIRouter, HTTPException, Header
+from fastapi.responses import FileResponse
+from typing import Optional
+from .. import images
+from ..http_cache import etag_matches, not_modified
+
+router = APIRouter()
+
+# ファイル名がハッシュなので内容は変わらない（1年キャッシュ）
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def _serve_file(path: str, etag: str, if_none_match: Optional[str]):
+    """ETag・Range対応でファイルを返す"""
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        return not_modified(headers)
+    return FileResponse(path, headers=headers)
+
+
+@router.get("/thumbs/{name}")
+def get_thumbnail(name: str, if_none_match: Optional[str] = Header(None)):
+    """サムネイル画像を取得（未生成ならその場で生成）"""
+    digest = name.rsplit(".", 1)[0]
+    if not images.IMAGE_NAME_PATTERN.match(f"{digest}.jpg"):
+        raise HTTPException(status_code=404, detail="画像が見つかりません")
+
+    original = next(
+        (f"{digest}.{ext}" for ext in set(images.IMAGE_EXTENSIONS.values())
+         if os.path.exists(images.image_path(f"{digest}.{ext}"))),
+        None
+    )
+    if original is None:
+        raise HTTPException(status_code=404, detail="画像が見つかりません")
+
+    path = images.generate_thumbnail(original)
+    return _serve_file(path, f'"{digest}-thumb"', if_none_match)
+
+
+@router.get("/{name}")
+def get_image(name: str, if_none_match: Optional[str] = Header(None)):
+    """元画像を取得"""
+    path = images.image_path(name)
+    if not images.IMAGE_NAME_PATTERN.match(name) or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="画像が見つかりません")
+
+    return _serve_file(path, f'"{name.split(".")[0]}"', if_none_match)
@@ -0,0 +1,20 @@
+# バックグラウンドジョブの状態確認用APIエンドポイント
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import models, schemas, auth
+from ..database import get_db
+
+router = APIRouter()
+
+
+@router.get("/{job_id}", response_model=schemas.JobStatus)
+async def get_job(
+        job_id: int,
+        current_user: auth.Principal = Depends(auth.get_current_user),
+        db: AsyncSession = Depends(get_db)
+):
+    """ジョブの状態を取得（登録したユーザーと管理者のみ）"""
+    job = await db.get(models.Job, job_id)
+    if not job or (job.created_by != current_user.id and current_user.role != "admin"):
+        raise HTTPException(status_code=404, detail="ジョブが見つかりません")
+    return job
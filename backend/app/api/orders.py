@@ -1,71 +1,81 @@
 # 注文用APIエンドポイント
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from .. import models, schemas, auth
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from typing import List, Optional
+from .. import models, schemas, auth, tasks
 from ..database import get_db
-from jose import JWTError, jwt
+from ..jobs import job_queue
+from ..serialization import list_response
+from ..pagination import (
+    NEXT_CURSOR_HEADER, encode_cursor, decode_cursor, parse_cursor_datetime, keyset_after
+)
+from ..stock import aggregate_quantities, reserve_stock, StockError
+from ..quotes import QUOTE_USED_MESSAGE, quote_used, verify_quote
+from ..response_cache import response_cache, product_tag, seller_tag, CATALOG
+from ..catalog_index import catalog_index
 
 router = APIRouter()
 
 
-def get_current_user(token: str, db: Session):
-    """トークンから現在のユーザーを取得"""
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="認証情報を検証できませんでした",
-        headers={"WWW-Authenticate": "Bearer"},
+def _order_select():
+    """注文明細・商品・カテゴリまでまとめて読み込むクエリ（N+1を防ぐ）"""
+    return select(models.Order).options(
+        selectinload(models.Order.order_items)
+        .joinedload(models.OrderItem.product)
+        .joinedload(models.Product.category)
     )
 
-    try:
-        payload = jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-
-    user = auth.get_user_by_username(db, username=username)
-    if user is None:
-        raise credentials_exception
-
-    return user
-
 
 @router.post("/", response_model=schemas.OrderResponse)
-def create_order(
+async def create_order(
         order: schemas.OrderCreate,
-        token: str,
-        db: Session = Depends(get_db)
+        current_user: auth.Principal = Depends(auth.get_current_user),
+        db: AsyncSession = Depends(get_db)
 ):
-    """新規注文を作成"""
-    # ユーザー認証
-    current_user = get_current_user(token, db)
-
-    # 在庫チェックと減算
-    for item in order.items:
-        product = db.query(models.Product).filter(
-            models.Product.id == item.product_id
-        ).first()
-
-        if not product:
-            raise HTTPException(status_code=404, detail=f"商品ID {item.product_id} が見つかりません")
-
-        if product.stock < item.quantity:
+    """新規注文を作成
+
+    金額はサーバー側の価格で計算する。quote（POST /api/cart/quote の見積もり）を指定した場合は
+    見積もりの価格、指定しない場合は現在の価格を使い、明細の price が現在の価格と違えば409を返す。
+    見積もりは発行されたユーザーが1回だけ使える（使用済みなら409）。
+    """
+    quote_id, quoted = None, None
+    if order.quote:
+        quote_id, quoted = verify_quote(order.quote, current_user.id)
+        if await quote_used(db, quote_id):
+            raise HTTPException(status_code=409, detail=QUOTE_USED_MESSAGE)
+        if aggregate_quantities(order.items) != {
+            product_id: quantity for product_id, (quantity, _) in quoted.items()
+        }:
+            raise HTTPException(status_code=400, detail="見積もりとカートの内容が一致しません")
+
+    # 在庫チェックと減算（全明細を一括で引き当てる）
+    try:
+        products = await reserve_stock(db, order.items)
+    except StockError as e:
+        # 一部だけ減算された在庫を取り消す
+        await db.rollback()
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+
+    if quoted is not None:
+        prices = {product_id: price for product_id, (_, price) in quoted.items()}
+    else:
+        prices = {product_id: product.price for product_id, product in products.items()}
+        changed = [
+            products[item.product_id].name for item in order.items
+            if item.price is not None and item.price != prices[item.product_id]
+        ]
+        if changed:
+            # 引き当てはcommitせずに破棄される
             raise HTTPException(
-                status_code=400,
-                detail=f"{product.name}の在庫が不足しています（在庫: {product.stock}個）"
+                status_code=409,
+                detail=f"{'、'.join(dict.fromkeys(changed))}の価格が変更されました。カートを更新してください"
             )
 
-        # 在庫を減らす
-        product.stock -= item.quantity
-
-        # 在庫が0になったらstatusを更新
-        if product.stock == 0:
-            product.status = "sold"
-
     # 合計金額を計算
-    total_amount = sum(item.price * item.quantity for item in order.items)
+    total_amount = sum(prices[item.product_id] * item.quantity for item in order.items)
 
     # 注文を作成
     db_order = models.Order(
@@ -73,57 +83,110 @@ def create_order(
         total_amount=total_amount,
         shipping_name=order.shipping_name,
         shipping_phone=order.shipping_phone,
-        shipping_address=order.shipping_address
+        shipping_address=order.shipping_address,
+        quote_id=quote_id
     )
     db.add(db_order)
-    db.flush()  # IDを取得するためにflush
+    try:
+        await db.flush()  # IDを取得するためにflush
+    except IntegrityError:
+        if quote_id is None:
+            raise
+        # 同じ見積もりでの注文が同時に確定した（quote_id の一意制約）
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=QUOTE_USED_MESSAGE)
 
     # 注文アイテムを作成
     for item in order.items:
         db_order_item = models.OrderItem(
             order_id=db_order.id,
             product_id=item.product_id,
+            seller_id=products[item.product_id].seller_id,
             quantity=item.quantity,
-            price=item.price
+            price=prices[item.product_id]
         )
         db.add(db_order_item)
 
-    db.commit()
-    db.refresh(db_order)
-
-    return db_order
+    # 出品者への通知などの後続処理はジョブで行う（注文がcommitされたときだけ実行される）
+    await tasks.enqueue_order_placed(db, db_order.id, created_by=current_user.id)
+    await db.commit()
+    job_queue.notify()
+    catalog_index.upsert(*products.values())
+
+    # 在庫・販売状況が変わった商品のキャッシュを破棄（売り切れになった商品は一覧の絞り込み結果も変わる）
+    tags = set()
+    for product in products.values():
+        tags.update((product_tag(product.id), seller_tag(product.seller_id)))
+        if product.status == "sold":
+            tags.add(CATALOG)
+    await response_cache.invalidate(*tags)
+
+    result = await db.execute(
+        _order_select()
+        .where(models.Order.id == db_order.id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().one()
 
 
 @router.get("/", response_model=List[schemas.OrderResponse])
-def get_user_orders(
-        token: str,
-        db: Session = Depends(get_db)
+async def get_user_orders(
+        response: Response,
+        current_user: auth.Principal = Depends(auth.get_current_user),
+        limit: int = Query(50, ge=1, le=100),
+        cursor: Optional[str] = None,
+        db: AsyncSession = Depends(get_db)
 ):
-    """ユーザーの注文履歴を取得"""
-    current_user = get_current_user(token, db)
+    """ユーザーの注文履歴を取得（新しい順・カーソルページネーション）
 
-    orders = db.query(models.Order).filter(
+    次のページがある場合は X-Next-Cursor ヘッダーにカーソルを返す。
+    """
+    query = _order_select().where(
         models.Order.user_id == current_user.id
-    ).order_by(models.Order.created_at.desc()).all()
+    )
+
+    if cursor:
+        data = decode_cursor(cursor)
+        try:
+            last_id = int(data["id"])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="カーソルが不正です")
+        query = query.where(keyset_after(
+            models.Order.created_at, models.Order.id,
+            parse_cursor_datetime(data.get("v")), last_id
+        ))
+
+    # 1件多く取得して次ページの有無を判定
+    result = await db.execute(
+        query.order_by(
+            models.Order.created_at.desc(), models.Order.id.desc()
+        ).limit(limit + 1)
+    )
+    orders = list(result.scalars().all())
+    if len(orders) > limit:
+        orders = orders[:limit]
+        last = orders[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor({"v": last.created_at, "id": last.id})
 
-    return orders
+    return list_response(schemas.OrderResponse, orders, dict(response.headers))
 
 
 @router.get("/{order_id}", response_model=schemas.OrderResponse)
-def get_order(
+async def get_order(
         order_id: int,
-        token: str,
-        db: Session = Depends(get_db)
+        current_user: auth.Principal = Depends(auth.get_current_user),
+        db: AsyncSession = Depends(get_db)
 ):
     """注文詳細を取得"""
-    current_user = get_current_user(token, db)
-
-    order = db.query(models.Order).filter(
-        models.Order.id == order_id,
-        models.Order.user_id == current_user.id
-    ).first()
+    result = await db.execute(
+        _order_select().where(
+            models.Order.id == order_id,
+            models.Order.user_id == current_user.id
+        )
+    )
+    order = result.scalars().first()
 
     if not order:
         raise HTTPException(status_code=404, detail="注文が見つかりません")
 
-    return order
\ No newline at end of file
+    return order
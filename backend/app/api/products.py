@@ -1,134 +1,402 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+import orjson
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from .. import models, schemas, auth
 from ..database import get_db
-from jose import JWTError, jwt
+from ..images import ingest_image_url
+from .. import facets, search
+from ..projections import parse_fields, card_select, card_rows, card_response
+from ..serialization import list_response
+from ..product_io import EXPORT_FORMATS, bulk_create_products, export_query, stream_products
+from ..response_cache import response_cache, tag_response, product_tag, seller_tag, CATALOG
+from ..http_cache import etag_matches, not_modified
+from ..reference_data import reference_data, CATEGORIES
+from ..catalog_index import catalog_index
+from ..pagination import (
+    NEXT_CURSOR_HEADER, encode_cursor, decode_cursor, parse_cursor_datetime, keyset_after
+)
 from sqlalchemy.orm import joinedload
 
 router = APIRouter()
 
-def get_current_user(token: str, db: Session):
-    """トークンから現在のユーザーを取得"""
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="認証情報を検証できませんでした"
+
+def _product_select():
+    """出品者・カテゴリを同時に読み込む商品クエリ（非同期では遅延ロードできないため）
+
+    出品者はレスポンスに含めるIDとユーザー名だけを読み込む。
+    """
+    return select(models.Product).options(
+        joinedload(models.Product.seller).load_only(models.User.id, models.User.username),
+        joinedload(models.Product.category)
+    )
+
+
+async def _get_product(db: AsyncSession, product_id: int):
+    """出品者・カテゴリ付きで商品を1件取得"""
+    result = await db.execute(
+        _product_select()
+        .where(models.Product.id == product_id)
+        .execution_options(populate_existing=True)
     )
+    return result.scalars().first()
+
+
+#-------------------------------------
+# 商品一覧の並び順（ソートキー: (カラム, 降順か)）
+#-------------------------------------
+PRODUCT_SORTS = {
+    "newest": (models.Product.created_at, True),
+    "oldest": (models.Product.created_at, False),
+    "price_asc": (models.Product.price, False),
+    "price_desc": (models.Product.price, True),
+}
+
+
+def _parse_product_cursor(cursor: str, sort: str):
+    """カーソルからページ境界の (並び替えの値, 商品ID) を取り出す"""
+    data = decode_cursor(cursor)
+    if data.get("sort") != sort:
+        raise HTTPException(status_code=400, detail="カーソルと並び順が一致しません")
 
     try:
-        payload = jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
+        last_id = int(data["id"])
+        value = data["v"]
+        if sort in ("newest", "oldest"):
+            value = parse_cursor_datetime(value)
+        else:
+            value = float(value)
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="カーソルが不正です")
+    return value, last_id
 
-    user = auth.get_user_by_username(db, username=username)
-    if user is None:
-        raise credentials_exception
 
-    return user
+def _product_cursor_filter(after, sort: str):
+    """ページ境界から次ページの絞り込み条件を作成"""
+    sort_column, descending = PRODUCT_SORTS[sort]
+    value, last_id = after
+    return keyset_after(sort_column, models.Product.id, value, last_id, descending)
+
+
+def _in_index_order(rows, ids: List[int]):
+    """主キーで読み込んだ行を索引の並び順に戻す（その間に非公開になった商品は除く）"""
+    by_id = {row.id: row for row in rows}
+    return [by_id[product_id] for product_id in ids if product_id in by_id]
+
+
+def _listing_filters(query, category_id, category, min_price, max_price, product_status):
+    """商品一覧・検索で共通の絞り込み条件を追加"""
+    query = query.where(
+        models.Product.is_active == True,
+        models.Product.status != "deleted"  # 削除済みのみ除外、soldは表示
+    )
+
+    if category_id is not None:
+        query = query.where(models.Product.category_id == category_id)
+    if category:
+        category_subquery = select(models.Category.id).where(
+            models.Category.slug == category
+        ).scalar_subquery()
+        query = query.where(models.Product.category_id == category_subquery)
+    if min_price is not None:
+        query = query.where(models.Product.price >= min_price)
+    if max_price is not None:
+        query = query.where(models.Product.price <= max_price)
+    if product_status:
+        query = query.where(models.Product.status == product_status)
+    return query
+
+
+# fields= の説明（一覧系のエンドポイント共通）
+FIELDS_DESCRIPTION = "card でカード表示用の項目のみ、またはカンマ区切りで項目を指定（省略時は全項目）"
+
 
 #-------------------------------------
 # 商品一覧取得
 #-------------------------------------
 @router.get("/products", response_model=List[schemas.ProductResponse])
-def get_products(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    products = db.query(models.Product).options(
-        joinedload(models.Product.seller),
-        joinedload(models.Product.category)
-    ).filter(
-        models.Product.is_active == True,
-        models.Product.status != "deleted"  # 削除済みのみ除外、soldは表示
-    ).offset(skip).limit(limit).all()
-    return products
+async def get_products(
+        request: Request,
+        response: Response,
+        skip: int = 0,
+        limit: int = Query(100, ge=1, le=100),
+        cursor: Optional[str] = None,
+        sort: str = Query("newest", pattern="^(newest|oldest|price_asc|price_desc)$"),
+        category_id: Optional[int] = None,
+        category: Optional[str] = None,  # カテゴリのslug
+        min_price: Optional[float] = Query(None, ge=0),
+        max_price: Optional[float] = Query(None, ge=0),
+        product_status: Optional[str] = Query(None, alias="status", pattern="^(available|sold)$"),
+        fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+        db: AsyncSession = Depends(get_db)
+):
+    """商品一覧を取得（絞り込み・並び替え・カーソルページネーション）
+
+    次のページがある場合は X-Next-Cursor ヘッダーにカーソルを返す。
+    fields= を指定するとORMオブジェクトを作らず指定カラムだけを返す。
+    """
+    sort_column, descending = PRODUCT_SORTS[sort]
+    field_names = parse_fields(fields)
+
+    if field_names:
+        # カーソル作成用に並び替えのキーも取得する
+        base_query = card_select(field_names, sort_column.label("sort_value"))
+    else:
+        base_query = _product_select()
+    query = _listing_filters(
+        base_query, category_id, category, min_price, max_price, product_status
+    )
+
+    after = _parse_product_cursor(cursor, sort) if cursor else None
+
+    # カタログ索引が有効なら表示する商品IDを索引で決め、DBからは主キーで読み込むだけにする
+    # 1件多く取得して次ページの有無を判定
+    product_ids = catalog_index.query(
+        sort, limit + 1, after=after, offset=0 if after else skip,
+        category_id=category_id, category=category or None,
+        min_price=min_price, max_price=max_price, status=product_status
+    )
+    if product_ids is not None:
+        result = await db.execute(query.where(models.Product.id.in_(product_ids)))
+        products = _in_index_order(result.all() if field_names else result.scalars().all(), product_ids)
+    else:
+        if after:
+            query = query.where(_product_cursor_filter(after, sort))
+        elif skip:
+            # 旧来のOFFSET指定（互換性のため残す）
+            query = query.offset(skip)
+
+        if descending:
+            query = query.order_by(sort_column.desc(), models.Product.id.desc())
+        else:
+            query = query.order_by(sort_column.asc(), models.Product.id.asc())
+
+        result = await db.execute(query.limit(limit + 1))
+        products = list(result.all() if field_names else result.scalars().all())
+    if len(products) > limit:
+        products = products[:limit]
+        last = products[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor({
+            "sort": sort,
+            "v": last.sort_value if field_names else getattr(last, sort_column.key),
+            "id": last.id,
+        })
+
+    tag_response(request, CATALOG, *(product_tag(p.id) for p in products))
+    if field_names:
+        return card_response(card_rows(products, field_names), dict(response.headers))
+    return list_response(schemas.ProductResponse, products, dict(response.headers))
+
+#-------------------------------------
+# 絞り込みごとの件数
+#-------------------------------------
+@router.get("/products/facets", response_model=schemas.ProductFacets)
+async def get_product_facets(
+        request: Request,
+        category_id: Optional[int] = None,
+        category: Optional[str] = None,  # カテゴリのslug
+        max_price: Optional[float] = Query(None, ge=0),
+        product_status: Optional[str] = Query(None, alias="status", pattern="^(available|sold)$"),
+        db: AsyncSession = Depends(get_db)
+):
+    """カテゴリ・価格帯ごとの商品数（商品一覧と同じ絞り込み条件を指定できる）
+
+    集計テーブルを読むだけなので商品数に関係なく一定の時間で返す。
+    """
+    if max_price is not None and max_price not in facets.PRICE_BUCKETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"max_price は {', '.join(str(b) for b in facets.PRICE_BUCKETS)} のいずれかを指定してください"
+        )
+
+    categories = orjson.loads((await reference_data.get(CATEGORIES)).body)
+    if category:
+        matched = [c for c in categories if c["slug"] == category]
+        if not matched:
+            raise HTTPException(status_code=404, detail="カテゴリが見つかりません")
+        category_id = matched[0]["id"]
+
+    counts = await facets.load(db)
+    tag_response(request, CATALOG)
+    return facets.summarize(counts, categories, category_id, max_price, product_status)
+
+
+#-------------------------------------
+# 商品検索
+#-------------------------------------
+@router.get("/products/search", response_model=List[schemas.ProductResponse])
+async def search_products(
+        request: Request,
+        q: str = Query(..., min_length=1, max_length=search.MAX_QUERY_LENGTH),
+        limit: int = Query(50, ge=1, le=100),
+        offset: int = Query(0, ge=0, le=1000),
+        category_id: Optional[int] = None,
+        category: Optional[str] = None,  # カテゴリのslug
+        min_price: Optional[float] = Query(None, ge=0),
+        max_price: Optional[float] = Query(None, ge=0),
+        product_status: Optional[str] = Query(None, alias="status", pattern="^(available|sold)$"),
+        fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+        db: AsyncSession = Depends(get_db)
+):
+    """商品名・説明から商品を検索（関連度順、カテゴリ・価格で絞り込み可）"""
+    field_names = parse_fields(fields)
+    matches = search.search_matches(db, q)
+    if matches is None:
+        return card_response([]) if field_names else []
+
+    base_query = card_select(field_names) if field_names else _product_select()
+    query = _listing_filters(
+        base_query.join(matches, matches.c.product_id == models.Product.id),
+        category_id, category, min_price, max_price, product_status
+    ).order_by(matches.c.rank, models.Product.created_at.desc(), models.Product.id.desc())
+
+    result = await db.execute(query.offset(offset).limit(limit))
+    products = result.all() if field_names else result.scalars().all()
+    tag_response(request, CATALOG, *(product_tag(p.id) for p in products))
+    if field_names:
+        return card_response(card_rows(products, field_names))
+    return list_response(schemas.ProductResponse, products)
+
+#-------------------------------------
+# 商品エクスポート（NDJSON / CSV）
+#-------------------------------------
+@router.get("/products/export")
+async def export_products(
+        format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+        seller_id: Optional[int] = None,
+        include_deleted: bool = False,
+        current_user: auth.Principal = Depends(auth.get_current_user)
+):
+    """商品をストリーミングでエクスポート（出品者は自分の商品のみ、管理者は全商品）"""
+    if current_user.role != "admin":
+        if seller_id is not None and seller_id != current_user.id:
+            raise HTTPException(status_code=403, detail="権限がありません")
+        seller_id = current_user.id
+
+    media_type, filename = EXPORT_FORMATS[format]
+    return StreamingResponse(
+        stream_products(export_query(seller_id, include_deleted), format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 #-------------------------------------
 # 商品詳細取得
 #-------------------------------------
 @router.get("/products/{product_id}", response_model=schemas.ProductResponse)
-def get_product(product_id: int, db: Session = Depends(get_db)):
+async def get_product(product_id: int, request: Request, db: AsyncSession = Depends(get_db)):
     """商品詳細を取得"""
-    product = db.query(models.Product).options(
-        joinedload(models.Product.seller),  # sellerを明示的にロード
-        joinedload(models.Product.category)
-    ).filter(models.Product.id == product_id).first()
+    product = await _get_product(db, product_id)
 
     if not product:
         raise HTTPException(status_code=404, detail="商品が見つかりません")
 
+    tag_response(request, product_tag(product.id), seller_tag(product.seller_id))
     return product
 
 #-------------------------------------
 # 特定ユーザーの商品一覧取得
 #-------------------------------------
 @router.get("/{user_id}/products", response_model=List[schemas.ProductResponse])
-def get_user_products(user_id: int, db: Session = Depends(get_db)):
+async def get_user_products(
+        user_id: int,
+        request: Request,
+        fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+        db: AsyncSession = Depends(get_db)
+):
     """特定ユーザーの商品を取得（売却済みも含む）"""
-    from sqlalchemy.orm import joinedload
-
-    products = db.query(models.Product).options(
-        joinedload(models.Product.seller),
-        joinedload(models.Product.category)
-    ).filter(
-        models.Product.seller_id == user_id,
-        models.Product.status != "deleted",  # 削除済みのみ除外
-        models.Product.is_active == True
-    ).all()
-    return products
+    tag_response(request, seller_tag(user_id))
+    return await list_seller_products(db, user_id, parse_fields(fields))
+
+
+async def list_seller_products(db: AsyncSession, user_id: int, field_names: Optional[List[str]]):
+    """出品者の公開中の商品（ショップページ用、fields指定時はカード形式）"""
+    base_query = card_select(field_names) if field_names else _product_select()
+    result = await db.execute(
+        base_query.where(
+            models.Product.seller_id == user_id,
+            models.Product.status != "deleted",  # 削除済みのみ除外
+            models.Product.is_active == True
+        ).order_by(models.Product.created_at.desc(), models.Product.id.desc())
+    )
+    if field_names:
+        return card_response(card_rows(result.all(), field_names))
+    return list_response(schemas.ProductResponse, result.scalars().all())
 
 
 # 商品出品
 @router.post("/products", response_model=schemas.ProductResponse)
-def create_product(
+async def create_product(
         product: schemas.ProductCreate,
-        token: str,
-        db: Session = Depends(get_db)
+        current_user: auth.Principal = Depends(auth.get_current_user),
+        db: AsyncSession = Depends(get_db)
 ):
     """商品を出品"""
-    current_user = get_current_user(token, db)
+    product_data = product.dict()
+    # Base64画像はファイルに保存してURLに置き換える
+    product_data["image_url"] = await run_in_threadpool(ingest_image_url, product_data["image_url"])
 
     db_product = models.Product(
-        **product.dict(),
+        **product_data,
         seller_id=current_user.id,
         status="available",
         is_active=True
     )
     db.add(db_product)
-    db.commit()
-    db.refresh(db_product)
-
-    return db_product
+    await db.flush()  # IDを取得するためにflush
+    await search.index_product(db, db_product)
+    await facets.record(db, None, facets.facet_key(db_product))
+    await db.commit()
+    catalog_index.upsert(db_product)
+    await response_cache.invalidate(CATALOG, seller_tag(current_user.id))
+
+    return await _get_product(db, db_product.id)
+
+
+# 商品の一括出品
+@router.post("/products/bulk", response_model=schemas.ProductBulkResult)
+async def create_products_bulk(
+        bulk: schemas.ProductBulkCreate,
+        current_user: auth.Principal = Depends(auth.get_current_user),
+        db: AsyncSession = Depends(get_db)
+):
+    """商品をまとめて出品（正しい行だけ登録し、行ごとのエラーを返す）"""
+    result = await bulk_create_products(db, current_user.id, bulk.items)
+    if result["created"]:
+        await catalog_index.sync(db, result["product_ids"])
+        await response_cache.invalidate(CATALOG, seller_tag(current_user.id))
+    return result
 
 
 # 自分の出品商品一覧
 @router.get("/my-products", response_model=List[schemas.ProductResponse])
-def get_my_products(token: str, db: Session = Depends(get_db)):
+async def get_my_products(
+        current_user: auth.Principal = Depends(auth.get_current_user),
+        db: AsyncSession = Depends(get_db)
+):
     """自分が出品した商品一覧"""
-    current_user = get_current_user(token, db)
-
-    products = db.query(models.Product).filter(
-        models.Product.seller_id == current_user.id,
-        models.Product.status != "deleted"
-    ).order_by(models.Product.created_at.desc()).all()
-
-    return products
+    result = await db.execute(
+        _product_select().where(
+            models.Product.seller_id == current_user.id,
+            models.Product.status != "deleted"
+        ).order_by(models.Product.created_at.desc())
+    )
+    return list_response(schemas.ProductResponse, result.scalars().all())
 
 
 # 商品編集
 @router.put("/products/{product_id}", response_model=schemas.ProductResponse)
-def update_product(
+async def update_product(
         product_id: int,
         product_update: schemas.ProductUpdate,
-        token: str,
-        db: Session = Depends(get_db)
+        current_user: auth.Principal = Depends(auth.get_current_user),
+        db: AsyncSession = Depends(get_db)
 ):
     """商品情報を更新"""
-    current_user = get_current_user(token, db)
-
-    db_product = db.query(models.Product).filter(
-        models.Product.id == product_id
-    ).first()
+    db_product = await db.get(models.Product, product_id)
 
     if not db_product:
         raise HTTPException(status_code=404, detail="商品が見つかりません")
@@ -138,28 +406,32 @@ def update_product(
         raise HTTPException(status_code=403, detail="権限がありません")
 
     # 更新
-    for key, value in product_update.dict(exclude_unset=True).items():
+    update_data = product_update.dict(exclude_unset=True)
+    if "image_url" in update_data:
+        update_data["image_url"] = await run_in_threadpool(ingest_image_url, update_data["image_url"])
+
+    facet_before = facets.facet_key(db_product)
+    for key, value in update_data.items():
         setattr(db_product, key, value)
 
-    db.commit()
-    db.refresh(db_product)
+    await search.index_product(db, db_product)
+    await facets.record(db, facet_before, facets.facet_key(db_product))
+    await db.commit()
+    catalog_index.upsert(db_product)
+    await response_cache.invalidate(CATALOG, product_tag(product_id), seller_tag(db_product.seller_id))
 
-    return db_product
+    return await _get_product(db, product_id)
 
 
 # 商品削除
 @router.delete("/products/{product_id}")
-def delete_product(
+async def delete_product(
         product_id: int,
-        token: str,
-        db: Session = Depends(get_db)
+        current_user: auth.Principal = Depends(auth.get_current_user),
+        db: AsyncSession = Depends(get_db)
 ):
     """商品を削除"""
-    current_user = get_current_user(token, db)
-
-    db_product = db.query(models.Product).filter(
-        models.Product.id == product_id
-    ).first()
+    db_product = await db.get(models.Product, product_id)
 
     if not db_product:
         raise HTTPException(status_code=404, detail="商品が見つかりません")
@@ -168,9 +440,14 @@ def delete_product(
     if db_product.seller_id != current_user.id and current_user.role != "admin":
         raise HTTPException(status_code=403, detail="権限がありません")
 
+    facet_before = facets.facet_key(db_product)
     db_product.status = "deleted"
     db_product.is_active = False
-    db.commit()
+    await search.remove_product(db, product_id)
+    await facets.record(db, facet_before, None)
+    await db.commit()
+    catalog_index.remove(product_id)
+    await response_cache.invalidate(CATALOG, product_tag(product_id), seller_tag(db_product.seller_id))
 
     return {"message": "商品を削除しました"}
 
@@ -179,6 +456,10 @@ def delete_product(
 # カテゴリ一覧取得
 #-------------------------------------
 @router.get("/categories", response_model=List[schemas.Category])
-def get_categories(db: Session = Depends(get_db)):
-    categories = db.query(models.Category).all()
-    return categories
\ No newline at end of file
+async def get_categories(if_none_match: Optional[str] = Header(None)):
+    """カテゴリ一覧を取得（メモリ上のJSONをそのまま返す・ETag対応）"""
+    entry = await reference_data.get(CATEGORIES)
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, entry.etag):
+        return not_modified(headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
\ No newline at end of file
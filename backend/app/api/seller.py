@@ -0,0 +1,139 @@
+# 出品者向けAPIエンドポイント（自分の商品が含まれる注文の確認・対応状況の更新）
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import exists, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import models, schemas, auth
+from ..database import get_db
+from ..serialization import list_response
+from ..pagination import NEXT_CURSOR_HEADER, encode_cursor, decode_cursor
+
+router = APIRouter()
+
+# 明細の対応状況の順序（後ろほど進んでいる）
+ITEM_STATUSES = ["pending", "confirmed", "shipped"]
+
+# 変更後の状況 → 変更できる元の状況
+STATUS_TRANSITIONS = {
+    "confirmed": ("pending",),
+    "shipped": ("pending", "confirmed"),
+}
+
+SELLER_ORDER_COLUMNS = [
+    models.OrderItem.id,
+    models.OrderItem.order_id,
+    models.OrderItem.product_id,
+    models.Product.name.label("product_name"),
+    models.OrderItem.quantity,
+    models.OrderItem.price,
+    models.OrderItem.status,
+    models.Order.created_at.label("ordered_at"),
+    models.Order.shipping_name,
+    models.Order.shipping_phone,
+    models.Order.shipping_address,
+]
+
+
+#-------------------------------------
+# 受注一覧
+#-------------------------------------
+@router.get("/orders", response_model=List[schemas.SellerOrderItem])
+async def get_seller_orders(
+        response: Response,
+        limit: int = Query(50, ge=1, le=100),
+        cursor: Optional[str] = None,
+        item_status: Optional[str] = Query(None, alias="status", pattern="^(pending|confirmed|shipped)$"),
+        current_user: auth.Principal = Depends(auth.get_current_user),
+        db: AsyncSession = Depends(get_db)
+):
+    """自分の商品の注文明細を新しい順に取得（カーソルページネーション）
+
+    order_items の (seller_id, status, id) のインデックスで絞り込み、
+    取得する件数分だけ注文・商品を主キーで結合する。
+    次のページがある場合は X-Next-Cursor ヘッダーにカーソルを返す。
+    """
+    query = (
+        select(*SELLER_ORDER_COLUMNS)
+        .join(models.Order, models.Order.id == models.OrderItem.order_id)
+        .join(models.Product, models.Product.id == models.OrderItem.product_id)
+        .where(models.OrderItem.seller_id == current_user.id)
+    )
+    if item_status:
+        query = query.where(models.OrderItem.status == item_status)
+
+    if cursor:
+        data = decode_cursor(cursor)
+        try:
+            last_id = int(data["id"])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="カーソルが不正です")
+        query = query.where(models.OrderItem.id < last_id)
+
+    # 1件多く取得して次ページの有無を判定（明細IDは注文順に増えるため新しい順になる）
+    result = await db.execute(query.order_by(models.OrderItem.id.desc()).limit(limit + 1))
+    items = list(result.all())
+    if len(items) > limit:
+        items = items[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor({"id": items[-1].id})
+
+    return list_response(schemas.SellerOrderItem, items, dict(response.headers))
+
+
+#-------------------------------------
+# 対応状況の一括更新
+#-------------------------------------
+@router.post("/orders/status", response_model=schemas.SellerOrderStatusResult)
+async def update_seller_order_status(
+        update_request: schemas.SellerOrderStatusUpdate,
+        current_user: auth.Principal = Depends(auth.get_current_user),
+        db: AsyncSession = Depends(get_db)
+):
+    """自分の注文明細の対応状況をまとめて更新（確認済み・発送済み）
+
+    明細は1回のUPDATEで更新する（他の出品者の明細や、その状況に変更できない明細はスキップ）。
+    注文のすべての明細が同じ状況まで進んだら、注文の状況も更新する。
+    """
+    new_status = update_request.status
+    from_statuses = STATUS_TRANSITIONS[new_status]
+    item_ids = list(dict.fromkeys(update_request.item_ids))
+    now = datetime.utcnow()
+
+    result = await db.execute(
+        update(models.OrderItem)
+        .where(
+            models.OrderItem.id.in_(item_ids),
+            models.OrderItem.seller_id == current_user.id,
+            models.OrderItem.status.in_(from_statuses)
+        )
+        .values(status=new_status)
+        .returning(models.OrderItem.id, models.OrderItem.order_id)
+        .execution_options(synchronize_session=False)
+    )
+    updated = result.all()
+
+    order_ids = list({row.order_id for row in updated})
+    if order_ids:
+        # 他の出品者の明細も含めて、まだこの状況に達していない明細がない注文だけを進める
+        reached = ITEM_STATUSES[ITEM_STATUSES.index(new_status):]
+        pending_items = exists().where(
+            models.OrderItem.order_id == models.Order.id,
+            models.OrderItem.status.not_in(reached)
+        )
+        await db.execute(
+            update(models.Order)
+            .where(
+                models.Order.id.in_(order_ids),
+                models.Order.status.in_(from_statuses),
+                ~pending_items
+            )
+            .values(status=new_status, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+    await db.commit()
+
+    updated_ids = {row.id for row in updated}
+    return {
+        "updated": [item_id for item_id in item_ids if item_id in updated_ids],
+        "skipped": [item_id for item_id in item_ids if item_id not in updated_ids],
+    }
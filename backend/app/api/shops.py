@@ -0,0 +1,114 @@
+# ショップページ用APIエンドポイント（出品者のプロフィール・集計・商品をまとめて返す）
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from .. import models, schemas
+from ..database import get_db
+from ..http_cache import etag_matches, not_modified, version_etag
+from ..pagination import encode_cursor, decode_cursor, parse_cursor_datetime, keyset_after
+from ..reference_data import reference_data, CATEGORIES
+from ..response_cache import tag_response, seller_tag
+from ..serialization import model_response
+
+router = APIRouter()
+
+
+def _shop_summary_select(user_id: int):
+    """出品者の公開プロフィール・商品の集計・最終更新日時を1回で取得するクエリ
+
+    商品は (seller_id, created_at) のインデックスで出品者の行だけを集計する。
+    最終更新日時は削除済みの商品も含める（削除でページの内容が変わるため）。
+    """
+    listed = (models.Product.is_active == True) & (models.Product.status != "deleted")
+    stats = (
+        select(
+            models.Product.seller_id,
+            func.count().filter(listed & (models.Product.status == "available")).label("listing_count"),
+            func.count().filter(listed & (models.Product.status == "sold")).label("sold_count"),
+            func.max(models.Product.updated_at).label("products_updated_at"),
+        )
+        .where(models.Product.seller_id == user_id)
+        .group_by(models.Product.seller_id)
+        .subquery()
+    )
+    return (
+        select(
+            models.User.id,
+            models.User.username,
+            models.User.created_at,
+            models.User.updated_at,
+            func.coalesce(stats.c.listing_count, 0).label("listing_count"),
+            func.coalesce(stats.c.sold_count, 0).label("sold_count"),
+            stats.c.products_updated_at,
+        )
+        .outerjoin(stats, stats.c.seller_id == models.User.id)
+        .where(models.User.id == user_id)
+    )
+
+
+@router.get("/{user_id}", response_model=schemas.ShopPage)
+async def get_shop(
+        user_id: int,
+        request: Request,
+        limit: int = Query(48, ge=1, le=100),
+        cursor: Optional[str] = None,
+        if_none_match: Optional[str] = Header(None),
+        db: AsyncSession = Depends(get_db)
+):
+    """ショップページ（出品者の公開プロフィール・販売中/売却済みの件数・商品の新着順ページ）
+
+    出品者と商品の集計を1回のクエリで読み、出品者・商品の最終更新日時から作るETagが
+    If-None-Match と一致すれば商品を読まずに304を返す。
+    """
+    summary = (await db.execute(_shop_summary_select(user_id))).one_or_none()
+    if summary is None:
+        raise HTTPException(status_code=404, detail="ユーザーが見つかりません")
+
+    after = None
+    if cursor:
+        data = decode_cursor(cursor)
+        try:
+            after = (parse_cursor_datetime(data["v"]), int(data["id"]))
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="カーソルが不正です")
+
+    # 商品に埋め込むカテゴリ名も変わりうるため、カテゴリ一覧のETagも含める
+    categories = await reference_data.get(CATEGORIES)
+    updated_at = max(t for t in (summary.updated_at, summary.products_updated_at, datetime.min) if t)
+    etag = version_etag(user_id, updated_at.isoformat(), limit, cursor, categories.etag)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    tag_response(request, seller_tag(user_id))
+    if etag_matches(if_none_match, etag):
+        return not_modified(headers)
+
+    query = (
+        select(models.Product)
+        .options(joinedload(models.Product.category))
+        .where(
+            models.Product.seller_id == user_id,
+            models.Product.status != "deleted",
+            models.Product.is_active == True
+        )
+    )
+    if after:
+        query = query.where(keyset_after(models.Product.created_at, models.Product.id, *after))
+
+    # 1件多く取得して次ページの有無を判定
+    result = await db.execute(
+        query.order_by(models.Product.created_at.desc(), models.Product.id.desc()).limit(limit + 1)
+    )
+    products = list(result.scalars().all())
+    next_cursor = None
+    if len(products) > limit:
+        products = products[:limit]
+        next_cursor = encode_cursor({"v": products[-1].created_at, "id": products[-1].id})
+
+    return model_response(schemas.ShopPage, {
+        "seller": summary,
+        "stats": summary,
+        "products": products,
+        "next_cursor": next_cursor,
+    }, headers)
@@ -1,31 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
 from app import schemas, models
 from app.database import get_db
+from app.api.products import FIELDS_DESCRIPTION, list_seller_products
+from app.projections import parse_fields
+from app.response_cache import tag_response, seller_tag
 
 router = APIRouter()
 
 
 @router.get("/{user_id}", response_model=schemas.UserResponse)
-def get_user(user_id: int, db: Session = Depends(get_db)):
+async def get_user(user_id: int, db: AsyncSession = Depends(get_db)):
     """ユーザー情報を取得"""
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await db.get(models.User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="ユーザーが見つかりません")
     return user
 
 
 @router.get("/{user_id}/products", response_model=List[schemas.ProductResponse])
-def get_user_products(user_id: int, db: Session = Depends(get_db)):
+async def get_user_products(
+        user_id: int,
+        request: Request,
+        fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+        db: AsyncSession = Depends(get_db)
+):
     """特定ユーザーの商品を取得（売却済みも含む）"""
-    products = db.query(models.Product).options(
-        joinedload(models.Product.seller),
-        joinedload(models.Product.category)
-    ).filter(
-        models.Product.seller_id == user_id,
-        models.Product.status != "deleted",
-        models.Product.is_active == True
-    ).all()
-    return products
\ No newline at end of file
+    tag_response(request, seller_tag(user_id))
+    return await list_seller_products(db, user_id, parse_fields(fields))
\ No newline at end of file
@@ -1,56 +1,86 @@
 # 認証用のユーティリティ
+import logging
+import os
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
+from fastapi import Depends, HTTPException, Query, status
+from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from . import models, schemas
+from .cache import TTLCache
+from .database import get_db
+from . import hashing
+from .hashing import hashing_pool
 
-# パスワードハッシュ化の設定
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
 
 # JWT設定
 SECRET_KEY = "your-secret-key-change-this-in-production"  # 本番環境では環境変数に
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Authorizationヘッダー（Bearer）からトークンを取得
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login", auto_error=False)
+
+# 認証済みユーザー情報のキャッシュ（user_id -> Principal）
+principal_cache = TTLCache(
+    maxsize=int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+)
+
 def verify_password(plain_password, hashed_password):
     """パスワードの検証"""
-    return pwd_context.verify(plain_password[:72], hashed_password)
+    return hashing.verify_password(plain_password, hashed_password)
 
 def get_password_hash(password):
     """パスワードのハッシュ化"""
-    return pwd_context.hash(password[:72])
+    return hashing.hash_password(password)
 
-def get_user_by_email(db: Session, email: str):
+async def get_user_by_email(db: AsyncSession, email: str):
     """メールアドレスでユーザーを取得"""
-    return db.query(models.User).filter(models.User.email == email).first()
+    result = await db.execute(select(models.User).where(models.User.email == email))
+    return result.scalars().first()
 
-def get_user_by_username(db: Session, username: str):
+async def get_user_by_username(db: AsyncSession, username: str):
     """ユーザー名でユーザーを取得"""
-    return db.query(models.User).filter(models.User.username == username).first()
+    result = await db.execute(select(models.User).where(models.User.username == username))
+    return result.scalars().first()
 
-def authenticate_user(db: Session, username: str, password: str):
-    """ユーザー認証（usernameまたはemailで検索）"""
-    print(f"[DEBUG] ログイン試行: username/email={username}")
-    # usernameまたはemailで検索
-    user = db.query(models.User).filter(
-        (models.User.username == username) |
-        (models.User.email == username)
-    ).first()
+async def get_user_by_login(db: AsyncSession, login: str):
+    """usernameまたはemailでユーザーを取得"""
+    result = await db.execute(
+        select(models.User).where(
+            (models.User.username == login) |
+            (models.User.email == login)
+        )
+    )
+    return result.scalars().first()
 
-    print(f"[DEBUG] ユーザー検索結果: {user}")
-    print(f"[DEBUG] user.username={user.username if user else 'None'}")
-    print(f"[DEBUG] user.email={user.email if user else 'None'}")
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    """ユーザー認証（usernameまたはemailで検索）
+
+    bcryptの検証はハッシュ用プロセスプールで行う。
+    コスト設定が変わっていれば新しいハッシュに置き換える。
+    """
+    # usernameまたはemailで検索
+    user = await get_user_by_login(db, username)
 
     if not user:
-        print("[DEBUG] ユーザーが見つかりません")
+        logger.debug("ログイン失敗: ユーザーが見つかりません", extra={"login": username})
         return False
-    password_check = verify_password(password, user.hashed_password)
-    print(f"[DEBUG] パスワード検証結果: {password_check}")
+    password_check, new_hash = await hashing_pool.verify(password, user.hashed_password)
     if not password_check:
+        logger.debug("ログイン失敗: パスワードが一致しません", extra={"user_id": user.id})
         return False
-    print("[DEBUG] 認証成功")
+    if new_hash:
+        # コスト変更後の初回ログインで再ハッシュ
+        user.hashed_password = new_hash
+        await db.commit()
+        logger.info("パスワードを再ハッシュしました", extra={"user_id": user.id})
+    logger.debug("ログイン成功", extra={"user_id": user.id})
     return user
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
@@ -64,34 +94,117 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def create_user(db: Session, user: schemas.UserCreate):
-    """新規ユーザーの作成"""
-    hashed_password = get_password_hash(user.password)
+async def create_user(db: AsyncSession, user: schemas.UserCreate, hashed_password: str = None):
+    """新規ユーザーの作成（ハッシュ済みパスワードを渡した場合はそれを使う）"""
+    if hashed_password is None:
+        hashed_password = await hashing_pool.hash(user.password)
     db_user = models.User(
         email=user.email,
         username=user.username,
         hashed_password=hashed_password
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
-# ユーザー一覧を取得して表示
-def get_current_user(token: str, db: Session):
-    """トークンから現在のユーザーを取得"""
-    from jose import JWTError, jwt
+#-------------------------------------------------------
+# 認証済みユーザー（リクエストごとのDB検索を避けるためキャッシュする）
+#-------------------------------------------------------
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    username: str
+    email: str
+    role: str
+    is_active: bool
+    created_at: datetime
+
+
+def principal_from_user(user: models.User) -> Principal:
+    """UserモデルからPrincipalを作成"""
+    role = user.role.value if isinstance(user.role, models.UserRole) else user.role
+    return Principal(
+        id=user.id,
+        username=user.username,
+        email=user.email,
+        role=role,
+        is_active=user.is_active,
+        created_at=user.created_at
+    )
+
+
+def invalidate_user(user_id: int):
+    """ユーザー情報が変わったときにキャッシュを破棄"""
+    principal_cache.pop(user_id)
+
+
+def get_token(
+        token: Optional[str] = Query(None),
+        bearer_token: Optional[str] = Depends(oauth2_scheme)
+) -> str:
+    """クエリパラメータ(token)またはAuthorizationヘッダーからトークンを取得"""
+    if token:
+        return token
+    if bearer_token:
+        return bearer_token
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="認証が必要です",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+async def get_current_user(
+        token: str = Depends(get_token),
+        db: AsyncSession = Depends(get_db)
+) -> Principal:
+    """トークンから現在のユーザーを取得（キャッシュにない場合のみDBを参照）"""
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="認証情報を検証できませんでした",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
 
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise credentials_exception
+
+    user_id = payload.get("user_id")
+    if user_id is not None:
+        principal = principal_cache.get(user_id)
+        if principal is not None:
+            return principal
+        user = await db.get(models.User, user_id)
+    else:
+        # user_idを含まない古いトークン
         username: str = payload.get("sub")
         if username is None:
-            raise HTTPException(status_code=401, detail="認証情報が無効です")
-    except JWTError:
-        raise HTTPException(status_code=401, detail="認証情報が無効です")
+            raise credentials_exception
+        user = await get_user_by_username(db, username=username)
 
-    user = get_user_by_username(db, username=username)
     if user is None:
-        raise HTTPException(status_code=401, detail="ユーザーが見つかりません")
+        raise credentials_exception
+
+    principal = principal_from_user(user)
+    principal_cache.set(principal.id, principal)
+    return principal
+
+
+async def get_optional_user(
+        token: Optional[str] = Query(None),
+        bearer_token: Optional[str] = Depends(oauth2_scheme),
+        db: AsyncSession = Depends(get_db)
+) -> Optional[Principal]:
+    """ログイン中ならユーザーを返す（トークンがなければNone、不正なら401）"""
+    if not token and not bearer_token:
+        return None
+    return await get_current_user(token or bearer_token, db)
+
 
-    return user
\ No newline at end of file
+async def get_current_admin(current_user: Principal = Depends(get_current_user)) -> Principal:
+    """管理者のみ許可"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="権限がありません")
+    return current_user
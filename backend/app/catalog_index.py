@@ -0,0 +1,336 @@
+# 商品一覧用のメモリ上のカタログ索引（任意・numpyが必要）
+#
+# 公開中（is_active かつ 削除されていない）の商品の
+#   ID・価格・カテゴリ・出品者・販売状況・登録日時
+# だけを列ごとのnumpy配列に持ち、絞り込みは配列の一括比較、並び替えは
+# あらかじめ作っておいた並び順（登録日時順・価格順）で行う。
+# 一覧APIは索引で表示する商品のIDだけを決め、商品の中身は主キーでDBから読み込む。
+#
+# - 商品の登録・更新・削除、注文による在庫の変化はAPIから upsert / remove で反映する
+# - 別プロセス（ジョブワーカーなど）の更新にも追従するため CATALOG_INDEX_REFRESH_SECONDS ごとに作り直す
+# - 無効・numpy未インストール・作成前などで答えられないときは None を返し、呼び出し側はSQLで検索する
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models
+from .database import AsyncSessionLocal
+
+try:
+    import numpy as np
+except ImportError:  # numpyがなければ索引は使わない（SQLで検索する）
+    np = None
+
+logger = logging.getLogger(__name__)
+
+CATALOG_INDEX_ENABLED = os.getenv("CATALOG_INDEX_ENABLED", "false").lower() == "true"
+CATALOG_INDEX_REFRESH_SECONDS = float(os.getenv("CATALOG_INDEX_REFRESH_SECONDS", "300"))
+CATALOG_INDEX_BATCH_SIZE = int(os.getenv("CATALOG_INDEX_BATCH_SIZE", "10000"))
+
+STATUS_CODES = {"available": 0, "sold": 1}
+
+# 並び順の種類 → 並び替えに使う列
+SORT_KEYS = {
+    "newest": ("created", True),
+    "oldest": ("created", False),
+    "price_asc": ("price", False),
+    "price_desc": ("price", True),
+}
+
+INDEX_COLUMNS = [
+    models.Product.id,
+    models.Product.price,
+    models.Product.category_id,
+    models.Product.seller_id,
+    models.Product.status,
+    models.Product.created_at,
+    models.Product.is_active,
+]
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def to_micros(value: Optional[datetime]) -> int:
+    """日時（UTC・タイムゾーンなし）をエポックからのマイクロ秒に変換"""
+    if value is None:
+        return 0
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    delta = value - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def is_listed(row) -> bool:
+    """一覧に表示する商品か（get_products の絞り込み条件と同じ）"""
+    return bool(row.is_active) and row.status != "deleted"
+
+
+#-------------------------------------------------------
+# 列データ
+#-------------------------------------------------------
+class CatalogColumns:
+    """商品ごとの値を列ごとの配列で持つ（削除は alive を落とし、作り直すときに詰める）"""
+
+    def __init__(self, capacity: int = 1024):
+        capacity = max(capacity, 1024)
+        self.size = 0
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.price = np.zeros(capacity, dtype=np.float64)
+        self.category = np.full(capacity, -1, dtype=np.int64)
+        self.seller = np.zeros(capacity, dtype=np.int64)
+        self.status = np.zeros(capacity, dtype=np.int8)
+        self.created = np.zeros(capacity, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.rows: Dict[int, int] = {}  # 商品ID → 行番号
+        self._orders: Dict[str, object] = {}  # 列名 → (値, ID) の昇順の行番号
+
+    def _grow(self):
+        capacity = len(self.ids) * 2
+        for name in ("ids", "price", "category", "seller", "status", "created", "alive"):
+            old = getattr(self, name)
+            new = np.full(capacity, -1, dtype=old.dtype) if name == "category" else np.zeros(capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def upsert(self, row):
+        """商品を追加・更新（一覧に表示しない状態なら削除）"""
+        if not is_listed(row):
+            self.remove(row.id)
+            return
+        index = self.rows.get(row.id)
+        if index is None:
+            if self.size == len(self.ids):
+                self._grow()
+            index = self.size
+            self.size += 1
+            self.rows[row.id] = index
+            self.ids[index] = row.id
+            self.created[index] = to_micros(row.created_at)
+            self._orders.clear()
+        elif self.price[index] != row.price:
+            self._orders.pop("price", None)
+        self.price[index] = row.price
+        self.category[index] = row.category_id if row.category_id is not None else -1
+        self.seller[index] = row.seller_id
+        self.status[index] = STATUS_CODES.get(row.status, 0)
+        self.alive[index] = True
+
+    def remove(self, product_id: int):
+        index = self.rows.pop(product_id, None)
+        if index is not None:
+            self.alive[index] = False
+
+    def remove_seller(self, seller_id: int):
+        """出品者の商品をまとめて削除"""
+        n = self.size
+        targets = np.flatnonzero(self.alive[:n] & (self.seller[:n] == seller_id))
+        for index in targets:
+            self.rows.pop(int(self.ids[index]), None)
+        self.alive[targets] = False
+
+    def order(self, key: str):
+        """(列の値, ID) の昇順に並べた行番号（更新で崩れたら作り直す）"""
+        order = self._orders.get(key)
+        if order is None:
+            n = self.size
+            values = self.created[:n] if key == "created" else self.price[:n]
+            order = np.lexsort((self.ids[:n], values))
+            self._orders[key] = order
+        return order
+
+
+#-------------------------------------------------------
+# 索引
+#-------------------------------------------------------
+class CatalogIndex:
+    """一覧の絞り込み・並び替え・ページ分けを行い、表示する商品IDを返す"""
+
+    def __init__(self, enabled: bool, refresh_seconds: float):
+        self.enabled = enabled and np is not None
+        self.refresh_seconds = refresh_seconds
+        self.queries = 0
+        self.fallbacks = 0
+        self.built_at: Optional[float] = None
+        self.build_seconds: Optional[float] = None
+        self._columns: Optional[CatalogColumns] = None
+        self._category_ids: Dict[str, int] = {}
+        self._building = False
+        self._pending: List[tuple] = []  # 作り直し中に受け付けた更新（作り終えたら適用する）
+        self._task: Optional[asyncio.Task] = None
+        if enabled and np is None:
+            logger.warning("CATALOG_INDEX_ENABLED ですが numpy がないため商品一覧はSQLで検索します")
+
+    @property
+    def ready(self) -> bool:
+        return self.enabled and self._columns is not None
+
+    async def build(self):
+        """公開中の商品を読み込んで索引を作り直す"""
+        start = time.perf_counter()
+        self._building = True
+        self._pending = []
+        try:
+            async with AsyncSessionLocal() as db:
+                categories = await db.execute(select(models.Category.slug, models.Category.id))
+                category_ids = {slug: category_id for slug, category_id in categories.all()}
+                max_id = await db.scalar(select(models.Product.id).order_by(models.Product.id.desc()).limit(1))
+                columns = CatalogColumns(capacity=max_id or 0)
+                result = await db.stream(
+                    select(*INDEX_COLUMNS).where(
+                        models.Product.is_active == True,
+                        models.Product.status != "deleted"
+                    ).execution_options(yield_per=CATALOG_INDEX_BATCH_SIZE)
+                )
+                async for rows in result.partitions():
+                    for row in rows:
+                        columns.upsert(row)
+            # 読み込み中に反映された更新を新しい索引にも適用してから入れ替える
+            for method, args in self._pending:
+                getattr(columns, method)(*args)
+            columns.order("created")
+            columns.order("price")
+            self._columns = columns
+            self._category_ids = category_ids
+        finally:
+            self._building = False
+            self._pending = []
+        self.built_at = time.time()
+        self.build_seconds = round(time.perf_counter() - start, 3)
+        logger.info("カタログ索引を作成しました", extra={
+            "products": len(self._columns.rows), "seconds": self.build_seconds
+        })
+
+    def _apply(self, method: str, *args):
+        if not self.enabled:
+            return
+        if self._columns is not None:
+            getattr(self._columns, method)(*args)
+        if self._building:
+            self._pending.append((method, args))
+
+    def upsert(self, *products):
+        """商品の追加・更新を反映（DBのcommit後に呼ぶ。削除・非公開になった商品は外れる）"""
+        for product in products:
+            self._apply("upsert", product)
+
+    async def sync(self, db: AsyncSession, product_ids: List[int]):
+        """DBから読み直して反映（一括登録など、ORMオブジェクトがない更新の後に呼ぶ）"""
+        if not self.enabled or not product_ids:
+            return
+        result = await db.execute(select(*INDEX_COLUMNS).where(models.Product.id.in_(product_ids)))
+        self.upsert(*result.all())
+
+    def remove(self, product_id: int):
+        """商品を索引から外す"""
+        self._apply("remove", product_id)
+
+    def remove_seller(self, seller_id: int):
+        """出品者の商品をまとめて索引から外す"""
+        self._apply("remove_seller", seller_id)
+
+    def add_category(self, slug: str, category_id: int):
+        """追加されたカテゴリのslugを登録（slug指定の絞り込みに使う）"""
+        self._category_ids[slug] = category_id
+
+    def query(
+            self,
+            sort: str,
+            limit: Optional[int] = None,
+            after: Optional[tuple] = None,
+            offset: int = 0,
+            category_id: Optional[int] = None,
+            category: Optional[str] = None,
+            seller_id: Optional[int] = None,
+            min_price: Optional[float] = None,
+            max_price: Optional[float] = None,
+            status: Optional[str] = None,
+    ) -> Optional[List[int]]:
+        """条件に合う商品IDを並び順どおりに返す（索引で答えられない場合はNone）
+
+        after: カーソルの (並び替えの値, 商品ID)。登録日時はdatetimeで渡す。
+        """
+        columns = self._columns
+        if not self.enabled or columns is None:
+            self.fallbacks += 1
+            return None
+
+        n = columns.size
+        mask = columns.alive[:n].copy()
+        if category is not None:
+            if category not in self._category_ids:
+                self.fallbacks += 1
+                return None
+            mask &= columns.category[:n] == self._category_ids[category]
+        if category_id is not None:
+            mask &= columns.category[:n] == category_id
+        if seller_id is not None:
+            mask &= columns.seller[:n] == seller_id
+        if min_price is not None:
+            mask &= columns.price[:n] >= min_price
+        if max_price is not None:
+            mask &= columns.price[:n] <= max_price
+        if status is not None:
+            mask &= columns.status[:n] == STATUS_CODES[status]
+
+        key, descending = SORT_KEYS[sort]
+        if after is not None:
+            value, last_id = after
+            if key == "created":
+                value = to_micros(value)
+            values = columns.created[:n] if key == "created" else columns.price[:n]
+            ids = columns.ids[:n]
+            if descending:
+                mask &= (values < value) | ((values == value) & (ids < last_id))
+            else:
+                mask &= (values > value) | ((values == value) & (ids > last_id))
+
+        order = columns.order(key)
+        if descending:
+            order = order[::-1]
+        selected = order[mask[order]][offset:None if limit is None else offset + limit]
+        self.queries += 1
+        return columns.ids[selected].tolist()
+
+    #---------------------------------------------------
+    # 起動・定期的な作り直し
+    #---------------------------------------------------
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.build()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("カタログ索引の作成に失敗しました")
+            await asyncio.sleep(self.refresh_seconds)
+
+    def start(self):
+        """バックグラウンドで索引を作成し、定期的に作り直す（作成が終わるまではSQLで検索する）"""
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def shutdown(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict:
+        columns = self._columns
+        return {
+            "enabled": self.enabled,
+            "ready": self.ready,
+            "products": len(columns.rows) if columns is not None else 0,
+            "rows": columns.size if columns is not None else 0,
+            "built_at": self.built_at,
+            "build_seconds": self.build_seconds,
+            "queries": self.queries,
+            "fallbacks": self.fallbacks,
+        }
+
+
+catalog_index = CatalogIndex(enabled=CATALOG_INDEX_ENABLED, refresh_seconds=CATALOG_INDEX_REFRESH_SECONDS)
@@ -1,7 +1,11 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
+from .db_config import engine_options, configure_engine, pool_status
+from .metrics import instrument_engine
+from . import profiling
 
 # Render用DATABASE_URL
 DATABASE_URL = os.getenv(
@@ -13,17 +17,64 @@ DATABASE_URL = os.getenv(
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql+psycopg2://", 1)
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
-)
+
+def to_async_url(url: str) -> str:
+    """同期用のURLを非同期ドライバ（aiosqlite / asyncpg）のURLに変換"""
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    for prefix in ("postgresql+psycopg2://", "postgresql://"):
+        if url.startswith(prefix):
+            return url.replace(prefix, "postgresql+asyncpg://", 1)
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", to_async_url(DATABASE_URL))
+
+#-----------------------------------------------
+# 同期エンジン（テーブル作成・サンプルデータ作成などのスクリプト用）
+#-----------------------------------------------
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+engine_stats = configure_engine(engine, DATABASE_URL)
+instrument_engine(engine, "sync", engine_stats)
+profiling.instrument_engine(engine, engine_stats)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+#-----------------------------------------------
+# 非同期エンジン（APIのリクエスト処理用）
+#-----------------------------------------------
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, is_async=True)
+)
+async_engine_stats = configure_engine(async_engine, ASYNC_DATABASE_URL)
+instrument_engine(async_engine, "async", async_engine_stats)
+profiling.instrument_engine(async_engine, async_engine_stats)
+
+# commit後に属性を読み直さない（非同期では遅延ロードできないため）
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+def get_pool_stats() -> dict:
+    """同期・非同期エンジンのコネクションプール統計"""
+    return {
+        "sync": pool_status(engine, engine_stats),
+        "async": pool_status(async_engine, async_engine_stats),
+    }
+
+def run_migrations():
+    """Alembicで最新のスキーマまでマイグレーション"""
+    from alembic import command
+    from alembic.config import Config
+
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    config = Config(os.path.join(backend_dir, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(backend_dir, "migrations"))
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, "head")
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
@@ -0,0 +1,175 @@
+# DB接続の設定（コネクションプール・SQLiteのPRAGMA）と統計
+import os
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes")
+
+
+#-----------------------------------------------
+# 環境変数から読む設定値
+#-----------------------------------------------
+# コネクションプール（PostgreSQL）
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+
+# SQLiteのPRAGMA
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))  # 負の値はKiB単位（64MiB）
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def is_sqlite_memory(url: str) -> bool:
+    return is_sqlite(url) and (":memory:" in url or url.rstrip("/").endswith("sqlite:"))
+
+
+#-----------------------------------------------
+# プールの統計
+#-----------------------------------------------
+class PoolStats:
+    """コネクションの貸し出し回数と待ち時間を集計する"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.wait_count = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        # 待ち時間を受け取る関数（リクエストごとのプロファイルなど）
+        self.wait_listeners = []
+        self._lock = threading.Lock()
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.wait_count += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+        for listener in self.wait_listeners:
+            listener(seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "wait_count": self.wait_count,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+            }
+
+
+class _TimedPoolMixin:
+    """プールからコネクションを取り出すまでの待ち時間を計測"""
+    stats: PoolStats = None
+    # SQLAlchemyのログはこのモジュール名（app.～）ではなく本来のロガーに出す
+    _sqla_logger_namespace = "sqlalchemy.pool"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            if self.stats is not None:
+                self.stats.record_wait(time.perf_counter() - start)
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+#-----------------------------------------------
+# エンジン作成時の引数
+#-----------------------------------------------
+def engine_options(url: str, is_async: bool = False) -> dict:
+    """create_engine / create_async_engine に渡す引数"""
+    if is_sqlite(url):
+        options = {"connect_args": {"check_same_thread": False}}
+        if not is_sqlite_memory(url):
+            # busy_timeoutはPRAGMAでも設定するが、接続時の待ちにも効かせる
+            options["connect_args"]["timeout"] = SQLITE_BUSY_TIMEOUT_MS / 1000
+            options["poolclass"] = TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool
+            options["pool_size"] = DB_POOL_SIZE
+            options["max_overflow"] = DB_MAX_OVERFLOW
+            options["pool_timeout"] = DB_POOL_TIMEOUT
+        return options
+
+    return {
+        "poolclass": TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """SQLiteの接続ごとにPRAGMAを設定（WALで読み込みが書き込みを待たない）"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+def configure_engine(engine, url: str) -> PoolStats:
+    """PRAGMAとプール統計のイベントを登録して統計オブジェクトを返す"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    stats = PoolStats()
+
+    if isinstance(sync_engine.pool, _TimedPoolMixin):
+        sync_engine.pool.stats = stats
+
+    if is_sqlite(url) and not is_sqlite_memory(url):
+        event.listen(sync_engine, "connect", _apply_sqlite_pragmas)
+
+    @event.listens_for(sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        stats.connects += 1
+
+    @event.listens_for(sync_engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.checkouts += 1
+
+    @event.listens_for(sync_engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        stats.checkins += 1
+
+    return stats
+
+
+def pool_status(engine, stats: PoolStats) -> dict:
+    """プールの現在の状態と累計の統計"""
+    pool = getattr(engine, "sync_engine", engine).pool
+    status = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        })
+    status.update(stats.snapshot())
+    return status
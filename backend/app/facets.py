@@ -0,0 +1,194 @@
+# 商品の件数集計（カテゴリ・価格帯ごとの件数）
+#
+# 一覧に表示される商品（is_active かつ 削除されていない）の件数を
+# product_facet_counts テーブルに (カテゴリ, 価格帯, 販売状況) ごとに持つ。
+# - 商品の登録・更新・削除、注文での売り切れは、その変更と同じトランザクションで差分を反映する
+# - 反映漏れ（DBの直接更新など）は定期的な再集計ジョブ（app.tasks）で直す
+# /api/products/facets はこの表（カテゴリ数 × 価格帯 × 販売状況の行）を読むだけなので、
+# 商品数に関係なく一定の時間で返せる。
+import logging
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import case, delete, func, insert, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models
+
+logger = logging.getLogger(__name__)
+
+# 価格帯の上限（トップページの「¥3,000以下」などの価格フィルターと同じ）
+# 価格帯の番号は「上限が価格未満の数」: 3,000以下=0, 5,000以下=1, 10,000以下=2, それより上=3
+PRICE_BUCKETS = [3000, 5000, 10000]
+
+# カテゴリなしの商品の集計キー
+NO_CATEGORY = 0
+
+# (カテゴリID, 価格帯の番号, 販売状況)
+FacetKey = Tuple[int, int, str]
+
+
+def price_bucket(price: float) -> int:
+    return bisect_left(PRICE_BUCKETS, price)
+
+
+def price_bucket_expr():
+    """price_bucket() と同じ価格帯の番号をSQLで計算する式"""
+    return case(
+        *((models.Product.price <= bound, index) for index, bound in enumerate(PRICE_BUCKETS)),
+        else_=len(PRICE_BUCKETS)
+    )
+
+
+def listed_condition():
+    """一覧に表示される商品の条件（集計の対象）"""
+    return (models.Product.is_active == True) & (models.Product.status != "deleted")
+
+
+def facet_key(product) -> Optional[FacetKey]:
+    """商品の集計キー（一覧に表示されない商品はNone）"""
+    if not product.is_active or product.status == "deleted":
+        return None
+    return (product.category_id or NO_CATEGORY, price_bucket(product.price), product.status)
+
+
+def diff(changes: Counter, before: Optional[FacetKey], after: Optional[FacetKey]):
+    """商品1件の変更前後のキーから件数の差分を加える"""
+    if before == after:
+        return
+    if before is not None:
+        changes[before] -= 1
+    if after is not None:
+        changes[after] += 1
+
+
+#-------------------------------------------------------
+# 更新
+#-------------------------------------------------------
+async def apply(db: AsyncSession, changes: Counter):
+    """件数の差分を反映（呼び出し元のトランザクション内で実行し、commitは呼び出し側で行う）"""
+    insert_ = pg_insert if db.bind.dialect.name == "postgresql" else sqlite_insert
+    table = models.ProductFacetCount
+    # 同時に更新するトランザクション同士がデッドロックしないよう、常に同じ順で更新する
+    for (category_id, bucket, status), delta in sorted(changes.items()):
+        if not delta:
+            continue
+        stmt = insert_(table).values(
+            category_id=category_id, price_bucket=bucket, status=status, count=delta
+        )
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[table.category_id, table.price_bucket, table.status],
+            set_={"count": table.count + stmt.excluded.count}
+        ))
+
+
+async def record(db: AsyncSession, before: Optional[FacetKey], after: Optional[FacetKey]):
+    """商品1件の変更を反映"""
+    changes = Counter()
+    diff(changes, before, after)
+    await apply(db, changes)
+
+
+async def aggregate(db: AsyncSession, *conditions) -> Counter:
+    """商品テーブルから直接集計（conditions で対象を絞り込める）"""
+    category = func.coalesce(models.Product.category_id, NO_CATEGORY)
+    bucket = price_bucket_expr()
+    result = await db.execute(
+        select(category, bucket, models.Product.status, func.count())
+        .where(listed_condition(), *conditions)
+        .group_by(category, bucket, models.Product.status)
+    )
+    return Counter({(row[0], row[1], row[2]): row[3] for row in result.all()})
+
+
+async def reconcile(db: AsyncSession) -> int:
+    """商品テーブルから集計し直して置き換える（ずれていたキーの数を返す）"""
+    if db.bind.dialect.name == "postgresql":
+        # 集計中に差分の更新が入ると置き換えで失われるため、commitまで更新を待たせる
+        await db.execute(text("LOCK TABLE product_facet_counts IN EXCLUSIVE MODE"))
+    table = models.ProductFacetCount
+    # 先に削除して書き込みロックを取ってから集計する（SQLiteでも集計と置き換えの間に更新が入らない）
+    result = await db.execute(
+        delete(table).returning(table.category_id, table.price_bucket, table.status, table.count)
+    )
+    before = {(row[0], row[1], row[2]): row[3] for row in result.all()}
+    counts = await aggregate(db)
+    if counts:
+        await db.execute(insert(table), [
+            {"category_id": key[0], "price_bucket": key[1], "status": key[2], "count": count}
+            for key, count in counts.items()
+        ])
+
+    drift = sum(1 for key in set(before) | set(counts) if before.get(key, 0) != counts.get(key, 0))
+    if drift:
+        logger.warning("商品の件数集計のずれを修正しました", extra={"keys": drift})
+    return drift
+
+
+#-------------------------------------------------------
+# 読み込み
+#-------------------------------------------------------
+async def load(db: AsyncSession) -> Dict[FacetKey, int]:
+    result = await db.execute(
+        select(
+            models.ProductFacetCount.category_id,
+            models.ProductFacetCount.price_bucket,
+            models.ProductFacetCount.status,
+            models.ProductFacetCount.count,
+        ).where(models.ProductFacetCount.count > 0)
+    )
+    return {(row[0], row[1], row[2]): row[3] for row in result.all()}
+
+
+def summarize(
+        counts: Dict[FacetKey, int],
+        categories: Iterable[dict],
+        category_id: Optional[int] = None,
+        max_price: Optional[float] = None,
+        status: Optional[str] = None,
+) -> dict:
+    """件数を絞り込みごとにまとめる（max_price は PRICE_BUCKETS のいずれか）
+
+    カテゴリの件数は価格の絞り込みだけ、価格帯の件数はカテゴリの絞り込みだけを適用する
+    （選択中のタブ・フィルターを切り替えたときの件数を表示するため）。
+    """
+    max_bucket = None if max_price is None else price_bucket(max_price)
+
+    def matches(key: FacetKey, by_category=True, by_price=True) -> bool:
+        if status is not None and key[2] != status:
+            return False
+        if by_category and category_id is not None and key[0] != category_id:
+            return False
+        return not (by_price and max_bucket is not None and key[1] > max_bucket)
+
+    per_category = Counter()
+    per_bucket = Counter()
+    per_status = Counter()
+    total = 0
+    for key, count in counts.items():
+        if matches(key, by_category=False):
+            per_category[key[0]] += count
+        if matches(key, by_price=False):
+            per_bucket[key[1]] += count
+        if matches(key):
+            total += count
+        if category_id is None or key[0] == category_id:
+            if max_bucket is None or key[1] <= max_bucket:
+                per_status[key[2]] += count
+
+    price_ranges: List[dict] = []
+    cumulative = 0
+    for index, bound in enumerate(PRICE_BUCKETS):
+        cumulative += per_bucket[index]
+        price_ranges.append({"max_price": bound, "count": cumulative})
+
+    return {
+        "total": total,
+        "categories": [
+            {"id": c["id"], "name": c["name"], "slug": c["slug"], "count": per_category[c["id"]]}
+            for c in categories
+        ],
+        "price_ranges": price_ranges,
+        "status": {name: per_status[name] for name in ("available", "sold")},
+    }
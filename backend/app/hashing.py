@@ -0,0 +1,118 @@
+# パスワードハッシュ計算用のプロセスプール
+#
+# bcryptは1回あたり数百ミリ秒のCPUを使うため、リクエスト処理のスレッドで
+# 計算すると同じワーカーの他のAPIが待たされる。別プロセスで計算し、
+# 同時実行数と待ち行列の長さを制限する。
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+# bcryptのコスト（変更するとログイン時に自動で再ハッシュされる）
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# ハッシュ計算を行うプロセス数
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+# 待ち行列に積める最大件数（超えたら503を返す）
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", "64"))
+# ログイン時にコスト変更を反映して再ハッシュするか
+REHASH_ON_LOGIN = os.getenv("REHASH_ON_LOGIN", "true").lower() == "true"
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+
+def hash_password(password: str) -> str:
+    """パスワードをハッシュ化（同期）"""
+    return pwd_context.hash(password[:72])
+
+
+def verify_password(password: str, hashed_password: str) -> bool:
+    """パスワードを検証（同期）"""
+    return pwd_context.verify(password[:72], hashed_password)
+
+
+def verify_and_update(password: str, hashed_password: str):
+    """パスワードを検証し、コストが古ければ新しいハッシュも返す（同期）"""
+    return pwd_context.verify_and_update(password[:72], hashed_password)
+
+
+class HashingPool:
+    """ハッシュ計算をプロセスプールで行うサービス"""
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def start(self):
+        """起動時にワーカープロセスを立ち上げておく（初回ログインの待ちをなくす）"""
+        executor = self._get_executor()
+        for _ in range(self.workers):
+            executor.submit(int)
+
+    async def _run(self, func, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail="ただいま混み合っています。しばらくしてから再度お試しください"
+                )
+            self.pending += 1
+
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        """パスワードをハッシュ化"""
+        return await self._run(hash_password, password)
+
+    async def verify(self, password: str, hashed_password: str):
+        """パスワードを検証（戻り値: (一致したか, 新しいハッシュまたはNone)）"""
+        if REHASH_ON_LOGIN:
+            return await self._run(verify_and_update, password, hashed_password)
+        return await self._run(verify_password, password, hashed_password), None
+
+    def stats(self) -> dict:
+        """待ち行列の長さなどの統計"""
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "in_flight": min(self.pending, self.workers),
+            "queued": max(0, self.pending - self.workers),
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        """プロセスプールを停止"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+hashing_pool = HashingPool(workers=HASH_WORKERS, max_pending=HASH_MAX_PENDING)
@@ -0,0 +1,28 @@
+# 条件付きGET（ETag / If-None-Match）のユーティリティ
+import hashlib
+from typing import Optional
+from fastapi import Response
+
+
+def make_etag(body: bytes) -> str:
+    """レスポンス本文から強いETagを作成"""
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def version_etag(*parts) -> str:
+    """更新日時などの版情報から弱いETagを作成（本文を作る前に比較できる）"""
+    key = "|".join("" if part is None else str(part) for part in parts)
+    return f'W/"{hashlib.sha256(key.encode()).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-MatchヘッダーにETagが含まれるか"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+def not_modified(headers: dict) -> Response:
+    """304 Not Modified レスポンス"""
+    return Response(status_code=304, headers=headers)
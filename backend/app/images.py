@@ -0,0 +1,151 @@
+# 商品画像の保存（コンテンツアドレス方式）とサムネイル生成
+import base64
+import binascii
+import hashlib
+import io
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from PIL import Image
+
+# 画像の保存先ディレクトリ
+IMAGE_STORAGE_DIR = os.getenv("IMAGE_STORAGE_DIR", "./uploads/images")
+# 配信URLのプレフィックス（app/api/images.pyのルーターと合わせる）
+IMAGE_URL_PREFIX = "/api/images"
+# アップロード可能な最大サイズ（バイト）
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(10 * 1024 * 1024)))
+# サムネイルの最大サイズ（幅, 高さ）
+THUMBNAIL_SIZE = (400, 400)
+
+# data URIで受け付ける画像形式と保存時の拡張子
+IMAGE_EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/jpg": "jpg",
+    "image/png": "png",
+    "image/webp": "webp",
+    "image/gif": "gif",
+}
+
+# Pillowが判定した形式と保存時の拡張子（保存する拡張子は実際の形式から決める）
+FORMAT_EXTENSIONS = {
+    "JPEG": "jpg",
+    "PNG": "png",
+    "WEBP": "webp",
+    "GIF": "gif",
+}
+
+DATA_URI_PATTERN = re.compile(r"^data:(?P<mime>image/[\w.+-]+);base64,(?P<data>.*)$", re.DOTALL)
+IMAGE_NAME_PATTERN = re.compile(r"^[0-9a-f]{64}\.(jpg|png|webp|gif)$")
+
+# サムネイル生成用のワーカープール
+_thumbnail_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("THUMBNAIL_WORKERS", "2")),
+    thread_name_prefix="thumbnail"
+)
+
+
+def is_data_uri(value: str) -> bool:
+    """Base64のdata URIかどうか"""
+    return bool(value) and value.startswith("data:")
+
+
+def image_path(name: str) -> str:
+    """元画像の保存パス（ハッシュ先頭2文字でディレクトリを分ける）"""
+    return os.path.join(IMAGE_STORAGE_DIR, name[:2], name)
+
+
+def thumbnail_path(name: str) -> str:
+    """サムネイルの保存パス（常にJPEG）"""
+    digest = name.split(".")[0]
+    return os.path.join(IMAGE_STORAGE_DIR, "thumbs", digest[:2], f"{digest}.jpg")
+
+
+def thumbnail_url(image_url: str):
+    """画像URLに対応するサムネイルURL（保存済み画像以外はそのまま返す）"""
+    if not image_url or not image_url.startswith(IMAGE_URL_PREFIX + "/"):
+        return image_url
+    name = image_url.rsplit("/", 1)[-1]
+    return f"{IMAGE_URL_PREFIX}/thumbs/{name.split('.')[0]}.jpg"
+
+
+def _tmp_path(path: str) -> str:
+    """プロセス・スレッドごとに重ならない一時ファイル名"""
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def _write_atomic(path: str, data: bytes):
+    """一時ファイルに書いてから置き換える（同時書き込みでも壊れない）"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = _tmp_path(path)
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def generate_thumbnail(name: str) -> str:
+    """サムネイルを生成して保存パスを返す（生成済みならそのまま）"""
+    dest = thumbnail_path(name)
+    if os.path.exists(dest):
+        return dest
+
+    with Image.open(image_path(name)) as img:
+        img = img.convert("RGB")
+        img.thumbnail(THUMBNAIL_SIZE)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        tmp_path = _tmp_path(dest)
+        img.save(tmp_path, "JPEG", quality=85, optimize=True)
+    os.replace(tmp_path, dest)
+    return dest
+
+
+def store_image(data: bytes, mime: str) -> str:
+    """画像を保存して配信URLを返す（同じ内容は一度だけ保存）
+
+    拡張子は画像データから判定した形式で決め、宣言された形式（data URIのMIME）と違えば400。
+    """
+    declared_ext = IMAGE_EXTENSIONS.get(mime.lower())
+    if declared_ext is None:
+        raise HTTPException(status_code=400, detail="対応していない画像形式です")
+    if len(data) > MAX_IMAGE_BYTES:
+        raise HTTPException(status_code=413, detail="画像サイズが大きすぎます")
+
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.verify()
+            image_format = img.format
+    except Exception:
+        raise HTTPException(status_code=400, detail="画像データを読み込めません")
+
+    ext = FORMAT_EXTENSIONS.get(image_format)
+    if ext is None:
+        raise HTTPException(status_code=400, detail="対応していない画像形式です")
+    if ext != declared_ext:
+        raise HTTPException(status_code=400, detail="画像の形式が指定された形式と一致しません")
+
+    name = f"{hashlib.sha256(data).hexdigest()}.{ext}"
+    path = image_path(name)
+    if not os.path.exists(path):
+        _write_atomic(path, data)
+
+    if not os.path.exists(thumbnail_path(name)):
+        _thumbnail_pool.submit(generate_thumbnail, name)
+    return f"{IMAGE_URL_PREFIX}/{name}"
+
+
+def ingest_image_url(value):
+    """image_urlがdata URIなら保存して短いURLに置き換える"""
+    if not is_data_uri(value):
+        return value
+
+    match = DATA_URI_PATTERN.match(value)
+    if not match:
+        raise HTTPException(status_code=400, detail="画像データの形式が不正です")
+
+    try:
+        data = base64.b64decode(match.group("data"), validate=False)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="画像データの形式が不正です")
+
+    return store_image(data, match.group("mime"))
@@ -0,0 +1,296 @@
+# バックグラウンドジョブ（DBのjobsテーブルを使った永続キュー）
+#
+# リクエストの中でやらなくてよい後続処理（出品者の商品の一括削除、注文後の通知など）を
+# ジョブとして登録し、ワーカーが別のトランザクションで実行する。
+# - 登録は呼び出し元のトランザクションに含めるため、本体の処理がcommitされたときだけ実行される
+# - 同じ idempotency_key のジョブは1件しか登録されない
+# - 失敗したら指数バックオフで再実行し、max_attempts回失敗したら failed にする
+# - 実行中のままワーカーが落ちた場合は、ロックの期限（JOB_LEASE_SECONDS）を過ぎたら再実行する
+#
+# ワーカーはAPIのプロセス内で起動する（JOB_WORKERS=0 で無効）。
+# 別プロセスで動かす場合は backend ディレクトリで python -m app.worker を実行する（app.worker）。
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models
+from .database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# APIのプロセス内で動かすワーカー数（0で起動しない）
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# 実行できるジョブがないときの確認間隔（秒）
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+# 既定の最大試行回数
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+# 再実行までの待ち時間（base * 2^(試行回数-1)、上限あり）
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "2"))
+JOB_RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "300"))
+# 実行中ジョブのロック期限（これを過ぎたら落ちたワーカーのジョブとみなして再実行）
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+Handler = Callable[[AsyncSession, dict], Awaitable[None]]
+
+
+class PermanentJobError(Exception):
+    """再実行しても成功しないエラー（送出すると再実行せずに failed にする）"""
+
+
+# ジョブの種類 → 処理
+HANDLERS: Dict[str, Handler] = {}
+
+
+def job_handler(kind: str):
+    """ジョブの処理を登録するデコレータ
+
+    処理は (db, payload) を受け取るasync関数。最後のcommitはワーカーが
+    ジョブの完了と同じトランザクションで行う（途中でcommitしてもよい）。
+    再実行されることがあるため、何度実行しても同じ結果になるように書く。
+    """
+    def decorator(func: Handler) -> Handler:
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def retry_delay(attempts: int) -> float:
+    """再実行までの待ち時間（秒）。同時に失敗したジョブが一斉に再実行されないよう揺らぎを入れる"""
+    delay = min(JOB_RETRY_MAX_SECONDS, JOB_RETRY_BASE_SECONDS * (2 ** max(0, attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+#-------------------------------------------------------
+# 登録
+#-------------------------------------------------------
+async def enqueue(
+        db: AsyncSession,
+        kind: str,
+        payload: Optional[dict] = None,
+        idempotency_key: Optional[str] = None,
+        delay: float = 0,
+        max_attempts: Optional[int] = None,
+        created_by: Optional[int] = None
+) -> models.Job:
+    """ジョブを登録（呼び出し元のトランザクションでcommitされたときに実行される）
+
+    idempotency_key が同じジョブが既にある場合は登録せず、既存のジョブを返す。
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f"未登録のジョブです: {kind}")
+
+    now = datetime.utcnow()
+    values = {
+        "kind": kind,
+        "payload": json.dumps(payload or {}, ensure_ascii=False),
+        "status": QUEUED,
+        "attempts": 0,
+        "max_attempts": max_attempts or JOB_MAX_ATTEMPTS,
+        "run_at": now + timedelta(seconds=delay),
+        "idempotency_key": idempotency_key,
+        "created_by": created_by,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+    if idempotency_key is None:
+        job = models.Job(**values)
+        db.add(job)
+        await db.flush()
+        return job
+
+    # 同時に登録されても一意制約で1件だけになる（重複しても例外にしない）
+    insert = pg_insert if db.bind.dialect.name == "postgresql" else sqlite_insert
+    await db.execute(
+        insert(models.Job).values(**values).on_conflict_do_nothing(index_elements=["idempotency_key"])
+    )
+    result = await db.execute(
+        select(models.Job).where(models.Job.idempotency_key == idempotency_key)
+    )
+    return result.scalars().one()
+
+
+#-------------------------------------------------------
+# ワーカー
+#-------------------------------------------------------
+class JobQueue:
+    """jobsテーブルからジョブを取り出して実行するワーカー群"""
+
+    def __init__(self, workers: int, poll_interval: float):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.name = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+        self._tasks = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    def _ready(self, now: datetime):
+        """実行できるジョブ（待機中で実行時刻を過ぎたもの、またはロック期限切れの実行中のもの）"""
+        return or_(
+            and_(models.Job.status == QUEUED, models.Job.run_at <= now),
+            and_(models.Job.status == RUNNING, models.Job.locked_until < now),
+        )
+
+    async def claim(self, worker: str) -> Optional[models.Job]:
+        """次のジョブを1件取り出して実行中にする（他のワーカーと重複しない）"""
+        async with AsyncSessionLocal() as db:
+            now = datetime.utcnow()
+            candidate = select(models.Job.id).where(self._ready(now)).order_by(
+                models.Job.run_at, models.Job.id
+            ).limit(1)
+            if db.bind.dialect.name == "postgresql":
+                candidate = candidate.with_for_update(skip_locked=True)
+            job_id = (await db.execute(candidate)).scalar()
+            if job_id is None:
+                return None
+
+            # 条件付きUPDATEで取り合いを判定（SQLiteでも他のワーカーと重複しない）
+            result = await db.execute(
+                update(models.Job)
+                .where(models.Job.id == job_id, self._ready(now))
+                .values(
+                    status=RUNNING,
+                    attempts=models.Job.attempts + 1,
+                    locked_by=worker,
+                    locked_until=now + timedelta(seconds=JOB_LEASE_SECONDS),
+                    updated_at=now,
+                )
+                .returning(models.Job)
+                .execution_options(synchronize_session=False)
+            )
+            job = result.scalars().first()
+            await db.commit()
+            return job
+
+    async def _finish(self, db: AsyncSession, job: models.Job, worker: str, **values):
+        now = datetime.utcnow()
+        await db.execute(
+            update(models.Job)
+            .where(models.Job.id == job.id, models.Job.locked_by == worker)
+            .values(locked_by=None, locked_until=None, updated_at=now, **values)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def execute(self, job: models.Job, worker: str):
+        """取り出したジョブを実行し、結果を記録する"""
+        async with AsyncSessionLocal() as db:
+            try:
+                handler = HANDLERS.get(job.kind)
+                if handler is None:
+                    raise PermanentJobError(f"未登録のジョブです: {job.kind}")
+                await handler(db, json.loads(job.payload))
+                # 処理の変更とジョブの完了を同じトランザクションでcommitする
+                await self._finish(
+                    db, job, worker, status=SUCCEEDED, last_error=None, finished_at=datetime.utcnow()
+                )
+                await db.commit()
+                self.succeeded += 1
+                return
+            except Exception as e:
+                await db.rollback()
+                error = f"{type(e).__name__}: {e}"
+                permanent = isinstance(e, PermanentJobError)
+
+            if permanent or job.attempts >= job.max_attempts:
+                logger.error("ジョブ失敗 id=%s kind=%s attempts=%s %s", job.id, job.kind, job.attempts, error)
+                await self._finish(
+                    db, job, worker, status=FAILED, last_error=error, finished_at=datetime.utcnow()
+                )
+                self.failed += 1
+            else:
+                delay = retry_delay(job.attempts)
+                logger.warning(
+                    "ジョブ再実行予定 id=%s kind=%s attempts=%s delay=%.1fs %s",
+                    job.id, job.kind, job.attempts, delay, error
+                )
+                await self._finish(
+                    db, job, worker, status=QUEUED, last_error=error,
+                    run_at=datetime.utcnow() + timedelta(seconds=delay)
+                )
+                self.retried += 1
+            await db.commit()
+
+    async def run_once(self, worker: Optional[str] = None) -> bool:
+        """ジョブを1件実行（実行するジョブがなければFalse）"""
+        worker = worker or self.name
+        job = await self.claim(worker)
+        if job is None:
+            return False
+        await self.execute(job, worker)
+        return True
+
+    async def _worker(self, index: int):
+        worker = f"{self.name}#{index}"
+        while not self._stopping:
+            try:
+                if await self.run_once(worker):
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # DBに繋がらないなどの一時的なエラーでもワーカーは止めない
+                logger.exception("ジョブワーカーのエラー worker=%s", worker)
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def notify(self):
+        """ジョブを登録した直後に呼ぶと、待機中のワーカーがすぐに取り出す"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self, workers: Optional[int] = None):
+        """ワーカーを起動（イベントループ内で呼ぶ）"""
+        workers = self.workers if workers is None else workers
+        if workers <= 0 or self._tasks:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(workers)]
+
+    async def shutdown(self):
+        """ワーカーを停止（実行中のジョブはロック期限後に再実行される）"""
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeup = None
+
+    async def stats(self) -> dict:
+        """状態ごとのジョブ件数と、このプロセスのワーカーの実行回数"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(models.Job.status, func.count()).group_by(models.Job.status)
+            )
+            counts = {status: count for status, count in result.all()}
+        return {
+            "workers": len(self._tasks),
+            "jobs": {status: counts.get(status, 0) for status in (QUEUED, RUNNING, SUCCEEDED, FAILED)},
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
+
+
+job_queue = JobQueue(workers=JOB_WORKERS, poll_interval=JOB_POLL_INTERVAL)
@@ -0,0 +1,104 @@
+# ログ設定（1行1JSONの構造化ログ）
+#
+# ログの出力（標準出力への書き込み）はリクエストを処理するスレッドで行わず、
+# キューに積んで別スレッドで書き出す。
+# レベル未満のログは logger.debug(...) の呼び出し時点で捨てられ、文字列も組み立てない。
+import atexit
+import copy
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+import orjson
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# json: 1行1JSON / text: 人が読む形式（開発用）
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+
+# LogRecordの標準の属性（これ以外は extra= で渡された項目として出力する）
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """ログを1行のJSONに変換（extra= で渡した項目もそのまま含める）"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return orjson.dumps(entry, default=str).decode("utf-8")
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """ログをキューに積む（整形は書き出し側のスレッドで行う）"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 引数のオブジェクトが後から変わらないよう、メッセージと例外だけここで文字列にする
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging():
+    """appパッケージのロガーを設定（何度呼んでも1回だけ設定する）"""
+    global _listener
+    if _listener is not None:
+        return
+
+    handler = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    logger = logging.getLogger("app")
+    logger.setLevel(LOG_LEVEL)
+    logger.handlers = [_QueueHandler(log_queue)]
+    logger.propagate = False
+
+
+def rotating_file_logger(name: str, path: str, max_bytes: int, backup_count: int) -> logging.Logger:
+    """JSONで書き出すローテーション付きのファイルロガー（書き込みは別スレッドで行う）"""
+    logger = logging.getLogger(name)
+    if logger.handlers:
+        return logger
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    handler = logging.handlers.RotatingFileHandler(
+        path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+    )
+    handler.setFormatter(JsonFormatter())
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    listener.start()
+    atexit.register(listener.stop)
+
+    logger.setLevel(logging.INFO)
+    logger.handlers = [_QueueHandler(log_queue)]
+    logger.propagate = False
+    return logger
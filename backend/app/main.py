@@ -1,15 +1,50 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, Header, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import engine, Base
-from app.api import products, orders, auth, users, admin
+from fastapi.responses import ORJSONResponse
+from app.logs import setup_logging
+from app.database import AsyncSessionLocal, run_migrations
+from app.api import products, orders, auth, users, admin, images, jobs, cart, seller, shops
+from app.pagination import NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER, TOTAL_COUNT_EXACT_HEADER
+from app.hashing import hashing_pool
+from app.jobs import job_queue
+from app.catalog_index import catalog_index
+from app import tasks  # ジョブの処理を登録する
+from app.response_cache import ResponseCacheMiddleware, response_cache
+from app import metrics, profiling
 import os
 
+setup_logging()
+
+
+#-----------------------------------------------
+# データベースのマイグレーション（AUTO_MIGRATE=falseで無効）
+#-----------------------------------------------
+if os.getenv("AUTO_MIGRATE", "true").lower() == "true":
+    run_migrations()
+
 
 #-----------------------------------------------
-# データベーステーブル作成
+# 起動・終了時の処理
 #-----------------------------------------------
-Base.metadata.create_all(bind=engine)
-app = FastAPI(title="Fashion EC API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    hashing_pool.start()
+    # 定期的な再集計を登録（登録済みなら何もしない）
+    async with AsyncSessionLocal() as db:
+        await tasks.schedule_facets_reconcile(db)
+        await db.commit()
+    job_queue.start()
+    catalog_index.start()
+    yield
+    await catalog_index.shutdown()
+    await job_queue.shutdown()
+    hashing_pool.shutdown()
+
+
+# 既定のレスポンスはorjsonでエンコード（標準のjsonより高速）
+app = FastAPI(title="Fashion EC API", lifespan=lifespan, default_response_class=ORJSONResponse)
 #-----------------------------------------------
 # CORS設定（Next.jsからアクセスできるように）
 #-----------------------------------------------
@@ -19,13 +54,29 @@ origins = [
     os.getenv("FRONTEND_URL", "http://localhost:3000")
 ]
 
+# 未ログインの商品閲覧のレスポンスキャッシュ（CORSより内側に置く）
+if response_cache.enabled:
+    app.add_middleware(ResponseCacheMiddleware, cache=response_cache)
+
+# SQLのプロファイル（SQL_PROFILE_ENABLED / SQL_PROFILE_TOKEN を設定したときだけ）
+if profiling.SQL_PROFILE_ENABLED or profiling.SQL_PROFILE_TOKEN:
+    app.add_middleware(profiling.ProfilingMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER, TOTAL_COUNT_EXACT_HEADER,
+        profiling.SERVER_TIMING_HEADER,
+    ],
 )
+
+# レイテンシ・SQLの数の計測（キャッシュのヒットやCORSの応答も含めるため一番外側に置く）
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
 #-----------------------------------------------
 # ルーター登録
 #-----------------------------------------------
@@ -34,10 +85,24 @@ app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(orders.router, prefix="/api/orders", tags=["orders"])
 
 # app.include_router(categories.router, prefix="/api/categories", tags=["categories"])
-# app.include_router(cart.router, prefix="/api/cart", tags=["cart"])
+app.include_router(cart.router, prefix="/api/cart", tags=["cart"])
 app.include_router(users.router, prefix="/api/users", tags=["users"])
+app.include_router(shops.router, prefix="/api/shops", tags=["shops"])
 app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
+app.include_router(images.router, prefix="/api/images", tags=["images"])
+app.include_router(jobs.router, prefix="/api/jobs", tags=["jobs"])
+app.include_router(seller.router, prefix="/api/seller", tags=["seller"])
 
 @app.get("/")
 def read_root():
-    return {"message": "Fashion EC API"}
\ No newline at end of file
+    return {"message": "Fashion EC API"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics(authorization: Optional[str] = Header(None)):
+    """Prometheus用のメトリクス（METRICS_TOKENを設定した場合はBearerトークンが必要）"""
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if metrics.METRICS_TOKEN and authorization != f"Bearer {metrics.METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="認証が必要です")
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
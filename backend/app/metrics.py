@@ -0,0 +1,308 @@
+# 実行時のメトリクス（Prometheusのテキスト形式で /metrics から返す）
+#
+# - HTTP: ルートごとのリクエスト数・レイテンシのヒストグラム・処理中の件数
+# - DB: クエリ数・クエリ時間（全体と1リクエストあたり）
+# - コネクションプール: 貸し出し中の数・待ち時間など（db_configの統計を収集時に読む）
+#
+# 値の更新はロックを1回取るだけなので、リクエストごとに記録しても負荷はほとんどない。
+import contextvars
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import event
+from starlette.routing import Match
+from .db_config import pool_status
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# 設定するとBearerトークンが一致しないと /metrics を返さない
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+QUERY_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+# ルートに一致しなかったリクエスト（ラベルの種類が無制限に増えないようにまとめる）
+UNMATCHED_ROUTE = "unmatched"
+
+INF_LABEL = 'le="+Inf"'
+
+
+#-------------------------------------------------------
+# メトリクスの種類
+#-------------------------------------------------------
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = self._header()
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """増えるだけの値"""
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    """増減する値"""
+    kind = "gauge"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    """値の分布（バケットごとの件数・合計・件数）"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            counts = state[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def totals(self) -> Tuple[float, int]:
+        """全ラベルを合わせた (合計, 件数)"""
+        with self._lock:
+            return sum(s[1] for s in self._values.values()), sum(s[2] for s in self._values.values())
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((labels, (list(s[0]), s[1], s[2])) for labels, s in self._values.items())
+        lines = self._header()
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, INF_LABEL)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+registry: List[_Metric] = []
+# 収集時に値を読む関数（戻り値: (名前, 種類, 説明, [(ラベル, 値), ...]) の並び）
+collectors: List[Callable[[], Iterable[Tuple[str, str, str, List[Tuple[dict, float]]]]]] = []
+
+
+def render() -> bytes:
+    """全メトリクスをPrometheusのテキスト形式で返す"""
+    lines: List[str] = []
+    for metric in list(registry):
+        lines.extend(metric.render())
+
+    # 同じ名前のメトリクス（エンジンごとなど）はまとめて1つのHELP/TYPEの下に並べる
+    collected: Dict[str, Tuple[str, str, List[Tuple[dict, float]]]] = {}
+    for collect in list(collectors):
+        for name, kind, documentation, samples in collect():
+            collected.setdefault(name, (kind, documentation, []))[2].extend(samples)
+    for name, (kind, documentation, samples) in collected.items():
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            names = tuple(labels)
+            lines.append(f"{name}{_format_labels(names, tuple(labels[n] for n in names))} {_format_value(value)}")
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+#-------------------------------------------------------
+# メトリクス定義
+#-------------------------------------------------------
+http_requests = Counter(
+    "http_requests_total", "HTTPリクエスト数", ("method", "route", "status")
+)
+http_latency = Histogram(
+    "http_request_duration_seconds", "HTTPリクエストの処理時間（秒）", ("method", "route")
+)
+http_in_progress = Gauge(
+    "http_requests_in_progress", "処理中のHTTPリクエスト数", ("method",)
+)
+db_queries = Counter(
+    "db_queries_total", "実行したSQLの数", ("engine",)
+)
+db_query_latency = Histogram(
+    "db_query_duration_seconds", "SQL1件あたりの実行時間（秒）", ("engine",),
+    buckets=QUERY_LATENCY_BUCKETS
+)
+request_queries = Histogram(
+    "http_request_db_queries", "1リクエストあたりのSQLの数", ("route",),
+    buckets=QUERY_COUNT_BUCKETS
+)
+request_db_time = Histogram(
+    "http_request_db_duration_seconds", "1リクエストあたりのSQLの実行時間の合計（秒）", ("route",)
+)
+
+
+#-------------------------------------------------------
+# リクエストごとのDB統計
+#-------------------------------------------------------
+@dataclass
+class RequestStats:
+    queries: int = 0
+    db_seconds: float = 0.0
+
+
+# 処理中のリクエストのDB統計（リクエスト外のクエリではNone）
+current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "current_request", default=None
+)
+
+
+def instrument_engine(engine, name: str, stats) -> None:
+    """エンジンにクエリ計測のイベントを登録し、プールの統計を収集対象にする"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        db_queries.inc(name)
+        db_query_latency.observe(elapsed, name)
+        request = current_request.get()
+        if request is not None:
+            request.queries += 1
+            request.db_seconds += elapsed
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        # 失敗したクエリの開始時刻を捨てる
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+
+    def collect():
+        status = pool_status(engine, stats)
+        labels = {"engine": name}
+        samples = []
+        for key, kind, documentation in (
+            ("size", "gauge", "プールの大きさ"),
+            ("checked_out", "gauge", "貸し出し中のコネクション数"),
+            ("overflow", "gauge", "プールの大きさを超えて作成したコネクション数"),
+            ("checkouts", "counter", "コネクションの貸し出し回数"),
+            ("connects", "counter", "新しく作成したコネクション数"),
+            ("wait_seconds_total", "counter", "コネクションの取得待ち時間の合計（秒）"),
+            ("wait_seconds_max", "gauge", "コネクションの取得待ち時間の最大（秒）"),
+        ):
+            if key in status:
+                metric = f"db_pool_{key}" + ("_total" if kind == "counter" and not key.endswith("_total") else "")
+                samples.append((metric, kind, documentation, [(labels, status[key])]))
+        return samples
+
+    collectors.append(collect)
+
+
+#-------------------------------------------------------
+# ASGIミドルウェア
+#-------------------------------------------------------
+def _route_template(scope) -> str:
+    """メトリクスのラベルにするルートのパス（/api/products/{product_id} など）"""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    app = scope.get("app")
+    if app is None:
+        return UNMATCHED_ROUTE
+    # ルーティング前にレスポンスを返した場合（キャッシュのヒットなど）はパスから探す
+    for candidate in app.router.routes:
+        match, _ = candidate.matches(scope)
+        if match == Match.FULL:
+            return getattr(candidate, "path", UNMATCHED_ROUTE)
+    return UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """リクエストごとのレイテンシ・ステータス・SQLの数を記録する"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        stats = RequestStats()
+        token = current_request.set(stats)
+        http_in_progress.inc(method)
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_in_progress.dec(method)
+            current_request.reset(token)
+            route = _route_template(scope)
+            http_requests.inc(method, route, str(status_code))
+            http_latency.observe(elapsed, method, route)
+            request_queries.observe(stats.queries, route)
+            request_db_time.observe(stats.db_seconds, route)
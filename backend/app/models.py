@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, Enum
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, Enum, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -42,6 +42,17 @@ class Product(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # -------------------------------------------------------
+    # インデックス（商品一覧のキーセットページネーション用）
+    # -------------------------------------------------------
+    __table_args__ = (
+        Index("ix_products_active_created", "is_active", "created_at", "id"),
+        Index("ix_products_active_price", "is_active", "price", "id"),
+        Index("ix_products_category_active_created", "category_id", "is_active", "created_at", "id"),
+        # 出品者ごとの商品一覧用
+        Index("ix_products_seller_created", "seller_id", "created_at"),
+    )
+
     # -------------------------------------------------------
     # リレーション
     # -------------------------------------------------------
@@ -63,6 +74,11 @@ class User(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        # 管理画面のユーザー一覧（権限・有効状態で絞り込んでID順）
+        Index("ix_users_role_active_id", "role", "is_active", "id"),
+    )
+
 # -------------------------------------------------------
 # 注文テーブル
 # ------------------------------------------------------
@@ -76,9 +92,17 @@ class Order(Base):
     shipping_address = Column(Text, nullable=False)
     shipping_name = Column(String(100), nullable=False)
     shipping_phone = Column(String(20), nullable=False)
+    quote_id = Column(String(32))  # 注文に使った見積もり（POST /api/cart/quote）のID
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        # 注文履歴（ユーザーごとの新しい順）用
+        Index("ix_orders_user_created", "user_id", "created_at", "id"),
+        # 同じ見積もりでは1回だけ注文できる
+        Index("ix_orders_quote_id", "quote_id", unique=True),
+    )
+
     user = relationship("User")
     order_items = relationship("OrderItem", back_populates="order")
 
@@ -89,10 +113,61 @@ class OrderItem(Base):
     __tablename__ = "order_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    # 出品者（商品から複製。出品者の受注一覧で products と結合せずに絞り込むため）
+    seller_id = Column(Integer, ForeignKey("users.id"))
     quantity = Column(Integer, nullable=False)
     price = Column(Float, nullable=False)  # 注文時の価格を保存
+    # 出品者ごとの対応状況（1つの注文に複数の出品者の商品が含まれるため明細ごとに持つ）
+    status = Column(String(50), nullable=False, default="pending", server_default="pending")  # pending, confirmed, shipped
+
+    __table_args__ = (
+        # 出品者の受注一覧（新しい順、状況での絞り込み）
+        Index("ix_order_items_seller_id", "seller_id", "id"),
+        Index("ix_order_items_seller_status_id", "seller_id", "status", "id"),
+        # 商品ごとの注文明細
+        Index("ix_order_items_product_id", "product_id"),
+    )
 
     order = relationship("Order", back_populates="order_items")
-    product = relationship("Product")
\ No newline at end of file
+    product = relationship("Product")
+
+# -------------------------------------------------------
+# バックグラウンドジョブテーブル
+# ------------------------------------------------------
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(100), nullable=False)  # 処理の種類（app.jobs のハンドラ名）
+    payload = Column(Text, nullable=False, default="{}")  # JSON
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, succeeded, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # 次に実行できる時刻
+    idempotency_key = Column(String(255), unique=True)  # 同じキーのジョブは1件だけ登録される
+    locked_by = Column(String(100))  # 実行中のワーカー
+    locked_until = Column(DateTime)  # これを過ぎても終わらなければ再実行する
+    last_error = Column(Text)
+    created_by = Column(Integer, ForeignKey("users.id"))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime)
+
+    __table_args__ = (
+        # ワーカーが次に実行するジョブを探す用
+        Index("ix_jobs_status_run_at", "status", "run_at", "id"),
+    )
+
+# -------------------------------------------------------
+# 商品の件数集計テーブル（絞り込みの件数表示用）
+# ------------------------------------------------------
+class ProductFacetCount(Base):
+    __tablename__ = "product_facet_counts"
+
+    # 一覧に表示される商品の件数を (カテゴリ, 価格帯, 販売状況) ごとに持つ（app.facets が更新する）
+    category_id = Column(Integer, primary_key=True, autoincrement=False)  # カテゴリなしは0
+    price_bucket = Column(Integer, primary_key=True, autoincrement=False)  # app.facets.PRICE_BUCKETS の番号
+    status = Column(String(50), primary_key=True)  # available, sold
+    count = Column(Integer, nullable=False, default=0)
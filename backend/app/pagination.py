@@ -0,0 +1,100 @@
+# カーソル（キーセット）ページネーション用のユーティリティ
+import base64
+import json
+import os
+from datetime import datetime
+from typing import Tuple
+from fastapi import HTTPException
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+# 次ページのカーソルを返すレスポンスヘッダー名
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# 件数（概算の場合は X-Total-Count-Exact: false）
+TOTAL_COUNT_HEADER = "X-Total-Count"
+TOTAL_COUNT_EXACT_HEADER = "X-Total-Count-Exact"
+
+# この件数までは正確に数え、超える場合は概算にする
+COUNT_ESTIMATE_THRESHOLD = int(os.getenv("COUNT_ESTIMATE_THRESHOLD", "10000"))
+
+
+def encode_cursor(payload: dict) -> str:
+    """ページ境界の値を不透明なカーソル文字列に変換"""
+    data = {
+        key: value.isoformat() if isinstance(value, datetime) else value
+        for key, value in payload.items()
+    }
+    raw = json.dumps(data, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    """カーソル文字列を元の値に戻す（不正な場合は400）"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(data, dict):
+            raise ValueError
+        return data
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="カーソルが不正です")
+
+
+def parse_cursor_datetime(value) -> datetime:
+    """カーソル内の日時文字列をdatetimeに変換"""
+    try:
+        return datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="カーソルが不正です")
+
+
+def keyset_after(column, id_column, value, last_id: int, descending: bool = True):
+    """(column, id) の並びで境界より後ろの行だけを残す条件"""
+    if descending:
+        return or_(column < value, and_(column == value, id_column < last_id))
+    return or_(column > value, and_(column == value, id_column > last_id))
+
+
+def prefix_range(column, prefix: str):
+    """前方一致をインデックスの範囲検索で表す条件（LIKEはインデックスを使えない場合があるため）"""
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return and_(column >= prefix, column < upper)
+
+
+class Explain(Executable, ClauseElement):
+    """クエリの実行計画（EXPLAIN）を取得する文
+
+    元のクエリのパラメータはそのままバインドされる（値をSQL文字列に埋め込まない）。
+    """
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain_postgresql(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+async def estimate_count(db: AsyncSession, query) -> Tuple[int, bool]:
+    """クエリの件数と正確かどうか
+
+    COUNT_ESTIMATE_THRESHOLD件までは上限付きのCOUNTで正確に数える。
+    それを超える場合、PostgreSQLは実行計画の見積もり行数を使い、
+    それ以外は上限の件数を返す（いずれも概算）。
+    """
+    limited = query.order_by(None).limit(COUNT_ESTIMATE_THRESHOLD + 1).subquery()
+    count = (await db.execute(select(func.count()).select_from(limited))).scalar_one()
+    if count <= COUNT_ESTIMATE_THRESHOLD:
+        return count, True
+
+    if db.bind.dialect.name == "postgresql":
+        plan = (await db.execute(Explain(query.order_by(None)))).scalar_one()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return max(int(plan[0]["Plan"]["Plan Rows"]), COUNT_ESTIMATE_THRESHOLD), False
+
+    return COUNT_ESTIMATE_THRESHOLD, False
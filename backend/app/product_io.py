@@ -0,0 +1,193 @@
+# 商品の一括登録とエクスポート
+#
+# 一括登録: 行ごとに検証し、正しい行だけをチャンク単位のトランザクションで
+#           まとめてINSERTする（1件ずつcommit・refreshしない）。
+# エクスポート: サーバー側カーソル（yield_per）で少しずつ読みながら
+#           NDJSON / CSV を返すため、件数が多くてもメモリ使用量は一定。
+import csv
+import io
+import os
+from collections import Counter
+from typing import AsyncIterator, List, Optional, Tuple
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import facets, models, schemas, search
+from .database import AsyncSessionLocal
+from .images import ingest_image_url
+from .serialization import NDJSON_MEDIA_TYPE, stream_ndjson
+
+BULK_IMPORT_MAX_ITEMS = int(os.getenv("BULK_IMPORT_MAX_ITEMS", "1000"))
+BULK_IMPORT_CHUNK_SIZE = int(os.getenv("BULK_IMPORT_CHUNK_SIZE", "200"))
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# エクスポートする項目（CSVの列順）
+EXPORT_COLUMNS = [
+    models.Product.id,
+    models.Product.name,
+    models.Product.description,
+    models.Product.price,
+    models.Product.category_id,
+    models.Product.seller_id,
+    models.Product.image_url,
+    models.Product.stock,
+    models.Product.is_active,
+    models.Product.status,
+    models.Product.created_at,
+    models.Product.updated_at,
+]
+EXPORT_FIELDS = [column.key for column in EXPORT_COLUMNS]
+
+EXPORT_FORMATS = {
+    "ndjson": (NDJSON_MEDIA_TYPE, "products.ndjson"),
+    "csv": ("text/csv; charset=utf-8", "products.csv"),
+}
+
+
+#-------------------------------------------------------
+# 一括登録
+#-------------------------------------------------------
+def _validation_message(error: ValidationError) -> str:
+    return " / ".join(
+        f"{'.'.join(str(loc) for loc in e['loc'])}: {e['msg']}" for e in error.errors()
+    )
+
+
+async def _validate_items(db: AsyncSession, items: List[dict]) -> Tuple[List[Tuple[int, dict]], List[dict]]:
+    """行ごとに検証して (行番号, 登録する値) の一覧とエラーの一覧を返す"""
+    valid: List[Tuple[int, schemas.ProductCreate]] = []
+    errors = []
+    for index, item in enumerate(items):
+        try:
+            product = schemas.ProductCreate.model_validate(item)
+        except ValidationError as e:
+            errors.append({"index": index, "message": _validation_message(e)})
+            continue
+        if product.price < 0:
+            errors.append({"index": index, "message": "価格は0以上で指定してください"})
+        elif product.stock < 0:
+            errors.append({"index": index, "message": "在庫数は0以上で指定してください"})
+        else:
+            valid.append((index, product))
+
+    # カテゴリの存在はまとめて1回で確認
+    category_ids = {product.category_id for _, product in valid}
+    existing = set()
+    if category_ids:
+        result = await db.execute(
+            select(models.Category.id).where(models.Category.id.in_(category_ids))
+        )
+        existing = set(result.scalars().all())
+
+    rows = []
+    for index, product in valid:
+        if product.category_id not in existing:
+            errors.append({"index": index, "message": "カテゴリが存在しません"})
+            continue
+        values = product.model_dump()
+        if values["image_url"]:
+            try:
+                values["image_url"] = await run_in_threadpool(ingest_image_url, values["image_url"])
+            except HTTPException as e:
+                errors.append({"index": index, "message": e.detail})
+                continue
+        rows.append((index, values))
+    return rows, errors
+
+
+async def bulk_create_products(db: AsyncSession, seller_id: int, items: List[dict]) -> dict:
+    """商品をまとめて登録（チャンクごとにcommit、失敗したチャンクの行はエラーとして返す）"""
+    if len(items) > BULK_IMPORT_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400, detail=f"一度に登録できる商品は{BULK_IMPORT_MAX_ITEMS}件までです"
+        )
+
+    rows, errors = await _validate_items(db, items)
+    # 検証のSELECTで始まったトランザクションを閉じてからチャンクごとに登録する
+    await db.commit()
+
+    created_ids: List[int] = []
+    for start in range(0, len(rows), BULK_IMPORT_CHUNK_SIZE):
+        chunk = rows[start:start + BULK_IMPORT_CHUNK_SIZE]
+        params = [
+            {**values, "seller_id": seller_id, "status": "available", "is_active": True}
+            for _, values in chunk
+        ]
+        try:
+            result = await db.execute(
+                insert(models.Product).returning(
+                    models.Product.id, models.Product.name, models.Product.description,
+                    sort_by_parameter_order=True
+                ),
+                params
+            )
+            inserted = result.all()
+            await search.index_new_products(db, inserted)
+            await facets.apply(db, Counter(
+                (values.get("category_id") or facets.NO_CATEGORY, facets.price_bucket(values["price"]), "available")
+                for values in params
+            ))
+            await db.commit()
+        except SQLAlchemyError:
+            await db.rollback()
+            errors.extend(
+                {"index": index, "message": "登録に失敗しました"} for index, _ in chunk
+            )
+            continue
+        created_ids.extend(row.id for row in inserted)
+
+    errors.sort(key=lambda e: e["index"])
+    return {"created": len(created_ids), "product_ids": created_ids, "errors": errors}
+
+
+#-------------------------------------------------------
+# エクスポート
+#-------------------------------------------------------
+def export_query(seller_id: Optional[int], include_deleted: bool):
+    """エクスポート対象の商品（ID順）"""
+    query = select(*EXPORT_COLUMNS).order_by(models.Product.id)
+    if seller_id is not None:
+        query = query.where(models.Product.seller_id == seller_id)
+    if not include_deleted:
+        query = query.where(models.Product.status != "deleted")
+    return query
+
+
+def _csv_chunk(rows, header: bool) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        writer.writerow(
+            value.isoformat() if hasattr(value, "isoformat") else value for value in row
+        )
+    return buffer.getvalue().encode("utf-8")
+
+
+async def stream_products(query, fmt: str) -> AsyncIterator[bytes]:
+    """商品を少しずつ読み込みながらNDJSON / CSVのチャンクを返す
+
+    レスポンスの送信中もDBを読むため、リクエストのセッションではなく専用のセッションを使う。
+    """
+    if fmt == "ndjson":
+        async for chunk in stream_ndjson(query, EXPORT_BATCH_SIZE):
+            yield chunk
+        return
+
+    # Excelで文字化けしないようにBOMを付ける
+    yield "\ufeff".encode("utf-8")
+
+    header = True
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for rows in result.partitions():
+            yield _csv_chunk(rows, header)
+            header = False
+
+    if header:
+        # 0件でも見出し行は返す
+        yield _csv_chunk([], True)
@@ -0,0 +1,297 @@
+# リクエストごとのSQLプロファイル（任意で有効化）とスロークエリログ
+#
+# プロファイル対象のリクエストでは、実行したSQLを文・実行時間・行数ごとにすべて記録し、
+# - 同じSQLを何度も実行している箇所（N+1）を検出する
+# - 遅いSELECTは実行後に EXPLAIN QUERY PLAN（SQLite）/ EXPLAIN ANALYZE（PostgreSQL）を取得する
+# - 結果を Server-Timing ヘッダーで返し、遅いもの・N+1があるものはスロークエリログに書き出す
+#
+# 有効にする方法:
+#   SQL_PROFILE_ENABLED=true  … すべてのリクエストをプロファイル（検証環境向け）
+#   SQL_PROFILE_TOKEN=xxx     … X-SQL-Profile: xxx ヘッダーを付けたリクエストだけプロファイル
+# プロファイルしないリクエストでも、SQL_SLOW_QUERY_MS を超えたSQLはスロークエリログに記録する。
+#
+# パラメータには個人情報やパスワードのハッシュなどが含まれるため、ログには件数と型だけを書き出す。
+# 値はプロファイル対象のリクエストで SQL_PROFILE_LOG_PARAMETERS=true の場合だけ記録する。
+import contextvars
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from .logs import rotating_file_logger
+
+SQL_PROFILE_ENABLED = os.getenv("SQL_PROFILE_ENABLED", "false").lower() == "true"
+SQL_PROFILE_TOKEN = os.getenv("SQL_PROFILE_TOKEN", "")
+SQL_PROFILE_LOG_PARAMETERS = os.getenv("SQL_PROFILE_LOG_PARAMETERS", "false").lower() == "true"
+PROFILE_HEADER = "X-SQL-Profile"
+SERVER_TIMING_HEADER = "Server-Timing"
+
+# これ以上かかったSQLをスロークエリログに記録（0で無効）
+SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "200"))
+# プロファイル中、これ以上かかったSELECTの実行計画を取得
+SQL_EXPLAIN_MS = float(os.getenv("SQL_EXPLAIN_MS", "50"))
+# 1リクエストで同じSQLをこの回数以上実行したらN+1として報告
+SQL_DUPLICATE_THRESHOLD = int(os.getenv("SQL_DUPLICATE_THRESHOLD", "3"))
+# 1リクエストで記録するSQLの上限（大量の一括処理でメモリを使いすぎないように）
+SQL_PROFILE_MAX_STATEMENTS = int(os.getenv("SQL_PROFILE_MAX_STATEMENTS", "1000"))
+
+SLOW_QUERY_LOG_PATH = os.getenv("SLOW_QUERY_LOG_PATH", "logs/slow_queries.log")
+SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv("SLOW_QUERY_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+SLOW_QUERY_LOG_BACKUPS = int(os.getenv("SLOW_QUERY_LOG_BACKUPS", "5"))
+
+# ログに残すSQL・パラメータの最大長
+_MAX_SQL_LENGTH = 2000
+_MAX_PARAMS_LENGTH = 500
+
+_slow_logger = None
+
+
+def slow_query_logger():
+    """スロークエリログ（初回の書き込み時にファイルを開く）"""
+    global _slow_logger
+    if _slow_logger is None:
+        _slow_logger = rotating_file_logger(
+            "app.slow_queries", SLOW_QUERY_LOG_PATH, SLOW_QUERY_LOG_MAX_BYTES, SLOW_QUERY_LOG_BACKUPS
+        )
+    return _slow_logger
+
+
+#-------------------------------------------------------
+# プロファイル
+#-------------------------------------------------------
+@dataclass
+class Statement:
+    sql: str
+    parameters: object
+    duration_ms: float
+    rows: Optional[int]
+    executemany: bool
+    engine: object = None
+    plan: Optional[List[str]] = None
+
+
+@dataclass
+class Profile:
+    started: float = field(default_factory=time.perf_counter)
+    statements: List[Statement] = field(default_factory=list)
+    dropped: int = 0
+    pool_wait_ms: float = 0.0
+
+    @property
+    def db_ms(self) -> float:
+        return sum(s.duration_ms for s in self.statements)
+
+    def duplicates(self) -> List[dict]:
+        """同じSQLを SQL_DUPLICATE_THRESHOLD 回以上実行した箇所（N+1の候補）"""
+        counts = Counter(s.sql for s in self.statements if not s.executemany)
+        result = []
+        for sql, count in counts.most_common():
+            if count < SQL_DUPLICATE_THRESHOLD:
+                break
+            total = sum(s.duration_ms for s in self.statements if s.sql == sql)
+            result.append({"sql": sql[:_MAX_SQL_LENGTH], "count": count, "total_ms": round(total, 3)})
+        return result
+
+    def server_timing(self, total_ms: float) -> str:
+        """Server-Timingヘッダーの値"""
+        metrics = [
+            f'db;dur={self.db_ms:.3f};desc="{len(self.statements) + self.dropped} queries"',
+            f"db-pool;dur={self.pool_wait_ms:.3f}",
+            f"app;dur={max(0.0, total_ms - self.db_ms):.3f}",
+        ]
+        if self.statements:
+            slowest = max(s.duration_ms for s in self.statements)
+            metrics.append(f"db-max;dur={slowest:.3f}")
+        duplicates = self.duplicates()
+        if duplicates:
+            metrics.append(f'db-dup;desc="{len(duplicates)} repeated statements"')
+        return ", ".join(metrics)
+
+
+# 処理中のリクエストのプロファイル（プロファイルしないリクエストではNone）
+current_profile: contextvars.ContextVar[Optional[Profile]] = contextvars.ContextVar(
+    "current_profile", default=None
+)
+
+
+def _row_count(cursor) -> Optional[int]:
+    if cursor.rowcount is not None and cursor.rowcount >= 0:
+        return cursor.rowcount
+    # SELECTの行数はDBAPIでは取れないため、非同期ドライバのアダプタが読み込み済みの行を数える
+    rows = getattr(cursor, "_rows", None)
+    return len(rows) if rows is not None else None
+
+
+def _short(value, limit: int) -> str:
+    text = repr(value)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+def _parameter_types(parameters) -> List[str]:
+    values = parameters.values() if isinstance(parameters, dict) else parameters or ()
+    return [type(value).__name__ for value in values]
+
+
+def _redact(parameters, executemany: bool) -> dict:
+    """パラメータの値を除き、件数と型だけにする"""
+    if executemany:
+        rows = list(parameters or ())
+        return {"rows": len(rows), "types": _parameter_types(rows[0]) if rows else []}
+    return {"count": len(parameters or ()), "types": _parameter_types(parameters)}
+
+
+# 同期エンジン → 非同期エンジン（EXPLAINは非同期エンジンで実行する）
+_async_engines: Dict[object, object] = {}
+
+
+def instrument_engine(engine, stats) -> None:
+    """エンジンにプロファイル・スロークエリ記録のイベントを登録"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if sync_engine is not engine:
+        _async_engines[sync_engine] = engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("profile_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration_ms = (time.perf_counter() - conn.info["profile_start"].pop()) * 1000
+        profile = current_profile.get()
+        if profile is not None:
+            if len(profile.statements) >= SQL_PROFILE_MAX_STATEMENTS:
+                profile.dropped += 1
+            else:
+                profile.statements.append(Statement(
+                    sql=statement, parameters=parameters, duration_ms=duration_ms,
+                    rows=_row_count(cursor), executemany=executemany, engine=sync_engine
+                ))
+        elif SQL_SLOW_QUERY_MS and duration_ms >= SQL_SLOW_QUERY_MS:
+            slow_query_logger().warning("slow query", extra={
+                "duration_ms": round(duration_ms, 3),
+                "sql": statement[:_MAX_SQL_LENGTH],
+                "parameters": _redact(parameters, executemany),
+            })
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("profile_start"):
+            conn.info["profile_start"].pop()
+
+    def _on_wait(seconds: float):
+        profile = current_profile.get()
+        if profile is not None:
+            profile.pool_wait_ms += seconds * 1000
+
+    stats.wait_listeners.append(_on_wait)
+
+
+#-------------------------------------------------------
+# 実行計画
+#-------------------------------------------------------
+async def explain(statement: Statement) -> Optional[List[str]]:
+    """遅かったSELECTの実行計画を取得（同じSQL・パラメータでもう一度実行する）"""
+    engine = _async_engines.get(statement.engine)
+    if engine is None or statement.executemany:
+        return None
+    if not statement.sql.lstrip().upper().startswith("SELECT"):
+        # EXPLAIN ANALYZEは実際に実行されるため、更新系のSQLには使わない
+        return None
+
+    parameters = statement.parameters
+    if isinstance(parameters, list):
+        parameters = tuple(parameters)
+    async with engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            result = await conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {statement.sql}", parameters)
+            return [row[0] for row in result]
+        result = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement.sql}", parameters)
+        return [row[-1] for row in result]
+
+
+async def report(profile: Profile, method: str, path: str, status_code: int, total_ms: float):
+    """遅いSQLの実行計画を取ってから、遅い・N+1のあるリクエストをスロークエリログに記録"""
+    slow = [s for s in profile.statements if s.duration_ms >= SQL_EXPLAIN_MS]
+    duplicates = profile.duplicates()
+    if not slow and not duplicates and not (SQL_SLOW_QUERY_MS and total_ms >= SQL_SLOW_QUERY_MS):
+        return
+
+    for statement in slow:
+        try:
+            statement.plan = await explain(statement)
+        except Exception as e:
+            statement.plan = [f"EXPLAINに失敗しました: {type(e).__name__}: {e}"]
+
+    slow_query_logger().warning("request profile", extra={
+        "method": method,
+        "path": path,
+        "status": status_code,
+        "total_ms": round(total_ms, 3),
+        "db_ms": round(profile.db_ms, 3),
+        "pool_wait_ms": round(profile.pool_wait_ms, 3),
+        "queries": len(profile.statements) + profile.dropped,
+        "duplicates": duplicates,
+        "statements": [
+            {
+                "sql": s.sql[:_MAX_SQL_LENGTH],
+                "parameters": (
+                    _short(s.parameters, _MAX_PARAMS_LENGTH) if SQL_PROFILE_LOG_PARAMETERS
+                    else _redact(s.parameters, s.executemany)
+                ),
+                "duration_ms": round(s.duration_ms, 3),
+                "rows": s.rows,
+                "plan": s.plan,
+            }
+            for s in profile.statements
+        ],
+    })
+
+
+#-------------------------------------------------------
+# ASGIミドルウェア
+#-------------------------------------------------------
+def profiling_requested(scope) -> bool:
+    if SQL_PROFILE_ENABLED:
+        return True
+    if not SQL_PROFILE_TOKEN:
+        return False
+    for name, value in scope.get("headers", ()):
+        if name == b"x-sql-profile":
+            return value.decode("latin-1") == SQL_PROFILE_TOKEN
+    return False
+
+
+class ProfilingMiddleware:
+    """対象のリクエストのSQLを記録し、Server-Timingヘッダーを付ける"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profiling_requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile()
+        token = current_profile.set(profile)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # ストリーミングの場合はヘッダー送信までに実行したSQLだけが対象になる
+                total_ms = (time.perf_counter() - profile.started) * 1000
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", profile.server_timing(total_ms).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_profile.reset(token)
+            total_ms = (time.perf_counter() - profile.started) * 1000
+            await report(profile, scope["method"], scope["path"], status_code, total_ms)
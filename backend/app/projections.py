@@ -0,0 +1,76 @@
+# 商品一覧のカード表示用の軽量な取得（必要なカラムだけをSELECTする）
+#
+# 一覧のグリッドに必要なのは名前・価格・サムネイルなど一部の項目だけなので、
+# ORMオブジェクト（出品者・カテゴリの行全体や説明文）を作らずに
+# カラム単位で取得し、辞書のまま返す。
+from typing import List, Optional
+from fastapi import HTTPException, Response
+from sqlalchemy import select
+from . import models, schemas
+from .images import thumbnail_url
+from .serialization import list_response
+
+# fields= に "card" を指定するとカードの全項目を返す
+CARD = "card"
+
+# カードの項目 → 取得するカラム
+CARD_COLUMNS = {
+    "id": models.Product.id,
+    "name": models.Product.name,
+    "price": models.Product.price,
+    "status": models.Product.status,
+    "stock": models.Product.stock,
+    "thumbnail_url": models.Product.image_url,  # 取得後にサムネイルのURLに変換
+    "seller_id": models.Product.seller_id,
+    "seller_username": models.User.username,
+    "category_id": models.Product.category_id,
+    "category_slug": models.Category.slug,
+}
+CARD_FIELDS = list(CARD_COLUMNS)
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """fields= を項目名のリストに変換（未指定ならNone = 従来の全項目）"""
+    if fields is None:
+        return None
+
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    if names == [CARD]:
+        return CARD_FIELDS
+
+    unknown = [name for name in names if name not in CARD_COLUMNS]
+    if unknown or not names:
+        raise HTTPException(
+            status_code=400,
+            detail=f"fieldsに指定できるのは {CARD} または {', '.join(CARD_FIELDS)} です"
+        )
+    # idは常に返す（一覧のキーに使うため）
+    return ["id"] + [name for name in CARD_FIELDS if name in names and name != "id"]
+
+
+def card_select(field_names: List[str], *extra_columns):
+    """指定項目のカラムだけを取得する商品クエリ（出品者・カテゴリは必要な時だけJOIN）"""
+    query = select(
+        *(CARD_COLUMNS[name].label(name) for name in field_names), *extra_columns
+    ).select_from(models.Product)
+    if "seller_username" in field_names:
+        query = query.join(models.User, models.User.id == models.Product.seller_id)
+    if "category_slug" in field_names:
+        query = query.outerjoin(models.Category, models.Category.id == models.Product.category_id)
+    return query
+
+
+def card_rows(rows, field_names: List[str]) -> List[dict]:
+    """取得した行をカードの辞書に変換"""
+    cards = []
+    for row in rows:
+        card = {name: row._mapping[name] for name in field_names}
+        if "thumbnail_url" in card:
+            card["thumbnail_url"] = thumbnail_url(card["thumbnail_url"])
+        cards.append(card)
+    return cards
+
+
+def card_response(cards: List[dict], headers: dict = None) -> Response:
+    """カードの一覧をJSONで返す（指定されなかった項目は含めない）"""
+    return list_response(schemas.ProductCard, cards, headers=headers, exclude_unset=True)
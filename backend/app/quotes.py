@@ -0,0 +1,116 @@
+# カートの見積もり（サーバー側の価格・在庫で明細を確定し、署名付きで返す）
+#
+# カートの全明細の商品を1回のクエリで読み込み、現在の価格・在庫・販売状況と
+# カートに表示していた価格との違いを明細ごとに返す。
+# ログイン中にすべて購入できる場合は (商品ID, 数量, 価格) を署名したトークン（JWT）を返し、
+# 注文時にそれを渡すと、有効期限内は見積もりの価格で注文できる（価格を読み直さない）。
+# 見積もりは発行したユーザーだけが1回だけ使える（見積もりIDを注文に保存し、一意制約で重複を防ぐ）。
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from fastapi import HTTPException
+from jose import ExpiredSignatureError, JWTError, jwt
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models
+from .auth import ALGORITHM, SECRET_KEY
+from .stock import aggregate_quantities, check_stock, load_products
+
+# 見積もりの有効期限（秒）
+CART_QUOTE_TTL_SECONDS = int(os.getenv("CART_QUOTE_TTL_SECONDS", "900"))
+
+# アクセストークンを見積もりとして使えないようにするための種類
+QUOTE_TOKEN_TYPE = "cart_quote"
+
+QUOTE_USED_MESSAGE = "この見積もりは使用済みです。カートを更新してください"
+
+
+def sign_quote(items: List[Tuple[int, int, float]], user_id: int, expires_at: datetime) -> str:
+    """(商品ID, 数量, 価格) の一覧に、見積もりIDと発行先のユーザーを付けて署名する"""
+    return jwt.encode(
+        {
+            "type": QUOTE_TOKEN_TYPE,
+            "jti": uuid.uuid4().hex,
+            "user_id": user_id,
+            "items": [list(item) for item in items],
+            "exp": expires_at,
+        },
+        SECRET_KEY, algorithm=ALGORITHM
+    )
+
+
+def verify_quote(token: str, user_id: int) -> Tuple[str, Dict[int, Tuple[int, float]]]:
+    """見積もりを検証して (見積もりID, 商品ID → (数量, 価格)) を返す
+
+    不正・期限切れは400、別のユーザーに発行した見積もりは403。
+    """
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except ExpiredSignatureError:
+        raise HTTPException(status_code=400, detail="見積もりの有効期限が切れています。カートを更新してください")
+    except JWTError:
+        raise HTTPException(status_code=400, detail="見積もりが不正です")
+    if payload.get("type") != QUOTE_TOKEN_TYPE or not payload.get("jti"):
+        raise HTTPException(status_code=400, detail="見積もりが不正です")
+    if payload.get("user_id") != user_id:
+        raise HTTPException(status_code=403, detail="この見積もりは使用できません")
+    items = {int(product_id): (int(quantity), float(price)) for product_id, quantity, price in payload["items"]}
+    return payload["jti"], items
+
+
+async def quote_used(db: AsyncSession, quote_id: str) -> bool:
+    """見積もりが既に注文に使われたか"""
+    result = await db.execute(select(models.Order.id).where(models.Order.quote_id == quote_id).limit(1))
+    return result.first() is not None
+
+
+async def build_quote(db: AsyncSession, items, user_id: Optional[int] = None) -> dict:
+    """カートの明細を現在の価格・在庫で確認し、購入できれば署名付きの見積もりを作る
+
+    見積もり（注文に使うトークン）はログイン中のユーザーにだけ発行する。
+    """
+    quantities = aggregate_quantities(items)
+    products = await load_products(db, list(quantities))
+    failures = {failure["product_id"]: failure for failure in check_stock(products, quantities)}
+
+    lines = []
+    total_amount = 0.0
+    for item in items:
+        product = products.get(item.product_id)
+        failure = failures.get(item.product_id)
+        line = {
+            "product_id": item.product_id,
+            "quantity": item.quantity,
+            "requested_price": item.price,
+            "available": failure is None,
+        }
+        if product is not None:
+            line.update(
+                name=product.name,
+                price=product.price,
+                price_changed=item.price is not None and item.price != product.price,
+                stock=product.stock,
+                status=product.status,
+            )
+        if failure is not None:
+            line.update(reason=failure["reason"], message=failure["message"])
+        else:
+            total_amount += product.price * item.quantity
+        lines.append(line)
+
+    quote = None
+    expires_at = None
+    if not failures and user_id is not None:
+        expires_at = datetime.utcnow() + timedelta(seconds=CART_QUOTE_TTL_SECONDS)
+        quote = sign_quote(
+            [(product_id, quantity, products[product_id].price) for product_id, quantity in quantities.items()],
+            user_id, expires_at
+        )
+    return {
+        "items": lines,
+        "total_amount": total_amount,
+        "purchasable": not failures,
+        "quote": quote,
+        "expires_at": expires_at,
+    }
@@ -0,0 +1,86 @@
+# 参照データ（カテゴリなど、ほとんど変わらない一覧）のプロセス内キャッシュ
+#
+# 一覧をDBから読み込んだらJSONに変換した本文とETagを一緒に保持し、
+# 以降のリクエストはDBアクセスもPydanticの検証もせずに本文を返す。
+# 書き込み時は invalidate() で破棄する。別プロセスでの更新にも追従できるよう
+# REFERENCE_DATA_TTL 秒で自動的に読み直す。
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from . import models, schemas
+from .database import AsyncSessionLocal
+from .http_cache import make_etag
+
+REFERENCE_DATA_TTL = float(os.getenv("REFERENCE_DATA_TTL", "300"))
+
+
+@dataclass(frozen=True)
+class ReferenceEntry:
+    body: bytes  # JSONに変換済みの本文
+    etag: str
+    loaded_at: float
+
+
+class ReferenceDataCache:
+    """名前ごとにローダーを登録し、結果をJSON本文ごとキャッシュする"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._loaders: Dict[str, Callable[[], Awaitable[bytes]]] = {}
+        self._entries: Dict[str, ReferenceEntry] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def register(self, name: str, loader: Callable[[], Awaitable[bytes]]):
+        """ローダー（JSON本文を返すコルーチン関数）を登録"""
+        self._loaders[name] = loader
+        self._locks[name] = asyncio.Lock()
+
+    def _is_fresh(self, entry: ReferenceEntry) -> bool:
+        return entry is not None and time.monotonic() - entry.loaded_at < self.ttl
+
+    async def get(self, name: str) -> ReferenceEntry:
+        """キャッシュ済みの本文を取得（なければ読み込む）"""
+        entry = self._entries.get(name)
+        if self._is_fresh(entry):
+            return entry
+
+        # 同時に来たリクエストで何度も読み込まないようにする
+        async with self._locks[name]:
+            entry = self._entries.get(name)
+            if self._is_fresh(entry):
+                return entry
+            body = await self._loaders[name]()
+            entry = ReferenceEntry(body=body, etag=make_etag(body), loaded_at=time.monotonic())
+            self._entries[name] = entry
+            return entry
+
+    def invalidate(self, name: str = None):
+        """キャッシュを破棄（nameを省略するとすべて）"""
+        if name is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(name, None)
+
+
+reference_data = ReferenceDataCache(ttl=REFERENCE_DATA_TTL)
+
+
+#-----------------------------------------------
+# カテゴリ一覧
+#-----------------------------------------------
+CATEGORIES = "categories"
+_category_list = TypeAdapter(List[schemas.Category])
+
+
+async def _load_categories() -> bytes:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(models.Category).order_by(models.Category.id))
+        categories = _category_list.validate_python(result.scalars().all(), from_attributes=True)
+    return _category_list.dump_json(categories)
+
+
+reference_data.register(CATEGORIES, _load_categories)
@@ -0,0 +1,456 @@
+# 未ログインの閲覧（商品一覧・商品詳細・ショップページ）のレスポンスキャッシュ
+#
+# 対象パスへの未ログインのGETは、パス＋正規化したクエリをキーにレスポンスを保存する。
+# 保存するのはエンドポイントが tag_response() でタグを付けたレスポンスのみで、
+# 商品の作成・更新・削除や注文（在庫の変化）のあとに該当タグのエントリだけを破棄する。
+#
+#   product:{id}  その商品を含むレスポンス（商品詳細・その商品が載っている一覧）
+#   seller:{id}   その出品者の商品を含むレスポンス（商品詳細・ショップページ）
+#   catalog       商品一覧・検索・件数集計（新規出品や価格変更で並び・件数が変わるもの）
+#
+# 期限（RESPONSE_CACHE_TTL）を過ぎても RESPONSE_CACHE_STALE_TTL 秒の間は古いレスポンスを
+# 返しつつ、裏で1回だけ取り直す（stale-while-revalidate）。
+# 保存先は既定でプロセス内のLRU。RESPONSE_CACHE_REDIS_URL を設定すると
+# 複数プロセスで共有するRedisに保存する（redisパッケージが必要）。
+import asyncio
+import base64
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode
+import orjson
+from fastapi import Request
+from .http_cache import etag_matches
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "30"))
+RESPONSE_CACHE_STALE_TTL = float(os.getenv("RESPONSE_CACHE_STALE_TTL", "60"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESPONSE_CACHE_REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL")
+
+# 1件あたりの上限（これより大きいレスポンスは保存しない）
+MAX_ENTRY_BYTES = 1024 * 1024
+
+# キャッシュの対象にするパス
+CACHEABLE_PATHS = [
+    re.compile(r"^/api/products$"),
+    re.compile(r"^/api/products/search$"),
+    re.compile(r"^/api/products/facets$"),
+    re.compile(r"^/api/products/\d+$"),
+    re.compile(r"^/api/users/\d+/products$"),
+    re.compile(r"^/api/\d+/products$"),
+    re.compile(r"^/api/shops/\d+$"),
+]
+
+CACHE_STATUS_HEADER = b"x-cache"
+
+CATALOG = "catalog"
+
+
+def product_tag(product_id: int) -> str:
+    return f"product:{product_id}"
+
+
+def seller_tag(seller_id: int) -> str:
+    return f"seller:{seller_id}"
+
+
+def tag_response(request: Request, *tags: str):
+    """レスポンスをキャッシュ可能にしてタグを付ける（エンドポイントから呼ぶ）"""
+    current = getattr(request.state, "cache_tags", None) or set()
+    current.update(tags)
+    request.state.cache_tags = current
+
+
+@dataclass
+class CachedResponse:
+    status: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+    tags: Tuple[str, ...]
+    fresh_until: float  # time.time() 基準（プロセス間で共有できるように）
+    stale_until: float
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(k) + len(v) for k, v in self.headers)
+
+
+#-------------------------------------------------------
+# 保存先（プロセス内）
+#-------------------------------------------------------
+class MemoryBackend:
+    """件数とバイト数の上限付きLRU（タグからキーを引く索引を持つ）"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evictions = 0
+        self._data: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry.stale_until <= time.time():
+                self._remove(key)
+                return None
+            self._data.move_to_end(key)
+            return entry
+
+    async def set(self, key: str, entry: CachedResponse):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = entry
+            self.bytes += entry.size
+            for tag in entry.tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while self._data and (len(self._data) > self.max_entries or self.bytes > self.max_bytes):
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys.update(self._tags.get(tag, ()))
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    async def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._tags.clear()
+            self.bytes = 0
+
+    def _remove(self, key: str):
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return
+        self.bytes -= entry.size
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": self.name,
+                "entries": len(self._data),
+                "bytes": self.bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
+
+
+#-------------------------------------------------------
+# 保存先（Redis、複数プロセスで共有）
+#-------------------------------------------------------
+class RedisBackend:
+    """Redisに保存する（エントリはJSON、タグはキーの集合）"""
+
+    name = "redis"
+
+    def __init__(self, url: Optional[str] = None, prefix: str = "fashion_ec:response_cache:", client=None):
+        """url からクライアントを作成する（client を渡した場合はそれを使う）"""
+        if client is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError:
+                raise RuntimeError("RESPONSE_CACHE_REDIS_URL を使うには redis パッケージが必要です")
+            client = redis.from_url(url)
+        self._redis = client
+        self.prefix = prefix
+
+    def _entry_key(self, key: str) -> str:
+        return f"{self.prefix}entry:{key}"
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.prefix}tag:{tag}"
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        data = await self._redis.get(self._entry_key(key))
+        if data is None:
+            return None
+        raw = orjson.loads(data)
+        return CachedResponse(
+            status=raw["status"],
+            headers=[(k.encode("latin-1"), v.encode("latin-1")) for k, v in raw["headers"]],
+            body=base64.b64decode(raw["body"]),
+            tags=tuple(raw["tags"]),
+            fresh_until=raw["fresh_until"],
+            stale_until=raw["stale_until"],
+        )
+
+    async def set(self, key: str, entry: CachedResponse):
+        ttl = max(1, math.ceil(entry.stale_until - time.time()))
+        data = orjson.dumps({
+            "status": entry.status,
+            "headers": [(k.decode("latin-1"), v.decode("latin-1")) for k, v in entry.headers],
+            "body": base64.b64encode(entry.body).decode("ascii"),
+            "tags": list(entry.tags),
+            "fresh_until": entry.fresh_until,
+            "stale_until": entry.stale_until,
+        })
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.set(self._entry_key(key), data, ex=ttl)
+            for tag in entry.tags:
+                pipe.sadd(self._tag_key(tag), key)
+                pipe.expire(self._tag_key(tag), ttl, gt=True)
+                pipe.expire(self._tag_key(tag), ttl, nx=True)
+            await pipe.execute()
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        tag_keys = [self._tag_key(tag) for tag in tags]
+        if not tag_keys:
+            return 0
+        keys = await self._redis.sunion(tag_keys)
+        await self._redis.delete(*[self._entry_key(k.decode()) for k in keys], *tag_keys)
+        return len(keys)
+
+    async def clear(self):
+        async for key in self._redis.scan_iter(match=f"{self.prefix}*"):
+            await self._redis.delete(key)
+
+    def stats(self) -> dict:
+        return {"backend": self.name}
+
+
+#-------------------------------------------------------
+# キャッシュ本体
+#-------------------------------------------------------
+class ResponseCache:
+    """キーの作成・期限の判定・無効化と統計"""
+
+    def __init__(self, backend, ttl: float, stale_ttl: float, enabled: bool = True):
+        self.backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidations = 0
+        # 無効化の履歴（取得中に無効化されたレスポンスを保存しないため）
+        self._clock = 0
+        self._recent: "deque[Tuple[int, frozenset]]" = deque(maxlen=1024)
+        self._revalidating: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def key_for(self, scope) -> Optional[str]:
+        """キャッシュのキー（対象外のリクエストはNone）"""
+        if scope["method"] != "GET":
+            return None
+        path = scope["path"]
+        if not any(pattern.match(path) for pattern in CACHEABLE_PATHS):
+            return None
+        if any(name == b"authorization" for name, _ in scope["headers"]):
+            return None
+
+        params = parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)
+        if any(name == "token" for name, _ in params):
+            return None
+        return f"{path}?{urlencode(sorted(params))}"
+
+    def begin(self) -> int:
+        """取得開始時点（store()に渡す）"""
+        return self._clock
+
+    def _invalidated_since(self, started_at: int, tags: Iterable[str]) -> bool:
+        if self._clock == started_at:
+            return False
+        if not self._recent or self._recent[0][0] > started_at + 1:
+            return True  # 履歴からあふれた場合は安全側に倒す
+        tags = set(tags)
+        return any(clock > started_at and tags & invalidated for clock, invalidated in self._recent)
+
+    async def store(self, key: str, started_at: int, status: int, headers, body: bytes, tags):
+        """取得したレスポンスを保存（取得中に対象のタグが無効化されていれば保存しない）"""
+        if status != 200 or not tags or len(body) > MAX_ENTRY_BYTES:
+            return
+        if any(name.lower() == b"set-cookie" for name, _ in headers):
+            return
+        if self._invalidated_since(started_at, tags):
+            return
+
+        now = time.time()
+        await self.backend.set(key, CachedResponse(
+            status=status,
+            headers=[(name, value) for name, value in headers if name.lower() != CACHE_STATUS_HEADER],
+            body=body,
+            tags=tuple(sorted(tags)),
+            fresh_until=now + self.ttl,
+            stale_until=now + self.ttl + self.stale_ttl,
+        ))
+        self.stores += 1
+
+    async def invalidate(self, *tags: str):
+        """タグの付いたエントリを破棄（DBのcommit後に呼ぶ）"""
+        if not self.enabled or not tags:
+            return
+        self._clock += 1
+        self._recent.append((self._clock, frozenset(tags)))
+        self.invalidations += await self.backend.invalidate_tags(tags)
+
+    async def clear(self):
+        self._clock += 1
+        self._recent.clear()
+        await self.backend.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "invalidated_entries": self.invalidations,
+            **self.backend.stats(),
+        }
+
+
+def _create_backend():
+    if RESPONSE_CACHE_REDIS_URL:
+        return RedisBackend(RESPONSE_CACHE_REDIS_URL)
+    return MemoryBackend(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_BYTES)
+
+
+response_cache = ResponseCache(
+    _create_backend(),
+    ttl=RESPONSE_CACHE_TTL,
+    stale_ttl=RESPONSE_CACHE_STALE_TTL,
+    enabled=RESPONSE_CACHE_ENABLED,
+)
+
+
+#-------------------------------------------------------
+# ミドルウェア
+#-------------------------------------------------------
+class ResponseCacheMiddleware:
+    """対象のGETをキャッシュから返し、ミスした場合はレスポンスを保存する
+
+    CORSのヘッダーはリクエストごとに変わるため、CORSMiddlewareより内側に置く。
+    """
+
+    def __init__(self, app, cache: ResponseCache = response_cache):
+        self.app = app
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.cache.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        key = self.cache.key_for(scope)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+
+        entry = await self.cache.backend.get(key)
+        now = time.time()
+        if entry is not None and now < entry.fresh_until:
+            self.cache.hits += 1
+            await self._send_cached(entry, b"HIT", send, scope)
+            return
+        if entry is not None and now < entry.stale_until:
+            self.cache.stale_hits += 1
+            self._revalidate(dict(scope), key)
+            await self._send_cached(entry, b"STALE", send, scope)
+            return
+
+        self.cache.misses += 1
+        await self._fetch(scope, receive, send, key)
+
+    async def _send_cached(self, entry: CachedResponse, status: bytes, send, scope=None):
+        if scope is not None and self._not_modified(entry, scope):
+            # 保存したレスポンスのETagがIf-None-Matchと一致すれば本文を送らない
+            headers = [(name, value) for name, value in entry.headers if name in (b"etag", b"cache-control")]
+            await send({
+                "type": "http.response.start",
+                "status": 304,
+                "headers": headers + [(CACHE_STATUS_HEADER, status)],
+            })
+            await send({"type": "http.response.body", "body": b""})
+            return
+        await send({
+            "type": "http.response.start",
+            "status": entry.status,
+            "headers": entry.headers + [(CACHE_STATUS_HEADER, status)],
+        })
+        await send({"type": "http.response.body", "body": entry.body})
+
+    @staticmethod
+    def _not_modified(entry: CachedResponse, scope) -> bool:
+        etag = next((value for name, value in entry.headers if name == b"etag"), None)
+        if_none_match = next((value for name, value in scope["headers"] if name == b"if-none-match"), None)
+        if etag is None or if_none_match is None:
+            return False
+        return etag_matches(if_none_match.decode("latin-1"), etag.decode("latin-1"))
+
+    async def _fetch(self, scope, receive, send, key: str):
+        """アプリを呼び出してレスポンスを返しつつ、保存できるものは保存する"""
+        started_at = self.cache.begin()
+        scope.setdefault("state", {})
+        start_message = {}
+        chunks = []
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                start_message.update(message)
+                message["headers"] = list(message.get("headers", [])) + [(CACHE_STATUS_HEADER, b"MISS")]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            if send is not None:
+                await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+        tags = scope["state"].get("cache_tags")
+        if start_message and tags:
+            await self.cache.store(
+                key, started_at, start_message["status"],
+                list(start_message.get("headers", [])), b"".join(chunks), tags
+            )
+
+    def _revalidate(self, scope, key: str):
+        """古いエントリを裏で取り直す（同じキーは同時に1回だけ）"""
+        if key in self.cache._revalidating:
+            return
+        self.cache._revalidating.add(key)
+        scope["state"] = {}
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def run():
+            try:
+                await self._fetch(scope, receive, None, key)
+            finally:
+                self.cache._revalidating.discard(key)
+
+        task = asyncio.create_task(run())
+        self.cache._tasks.add(task)
+        task.add_done_callback(self.cache._tasks.discard)
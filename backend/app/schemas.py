@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List, TYPE_CHECKING
+from pydantic import BaseModel, EmailStr, Field
+from typing import Dict, Optional, List, TYPE_CHECKING
 from datetime import datetime
 
 #-------------------------------------------------------
@@ -88,9 +88,24 @@ class ProductCreate(BaseModel):
     description: Optional[str] = None
     price: float
     category_id: int
-    image_url: Optional[str] = None #Base64も可
+    image_url: Optional[str] = None #Base64も可（保存時にファイル化してURLに置き換える）
     stock: int = 1
 
+# 一括出品用（行ごとに検証してエラーを返すため、各行は辞書のまま受け取る）
+class ProductBulkCreate(BaseModel):
+    items: List[dict] = Field(..., min_length=1)
+
+
+class BulkRowError(BaseModel):
+    index: int  # itemsの何番目か（0始まり）
+    message: str
+
+
+class ProductBulkResult(BaseModel):
+    created: int
+    product_ids: List[int]
+    errors: List[BulkRowError]
+
 class ProductUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
@@ -102,6 +117,15 @@ class ProductUpdate(BaseModel):
     status: Optional[str] = None
 
 
+# 商品に埋め込む出品者（公開してよい項目のみ）
+class SellerSummary(BaseModel):
+    id: int
+    username: str
+
+    class Config:
+        from_attributes = True
+
+
 class ProductResponse(BaseModel):
     id: int
     name: str
@@ -116,11 +140,45 @@ class ProductResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
     category: Optional[Category] = None
-    seller: Optional[UserResponse]
+    seller: Optional[SellerSummary]
 
     class Config:
         from_attributes = True
 
+
+# 一覧のグリッド表示用（fields= で項目を絞った場合はidと指定項目のみ返す）
+class ProductCard(BaseModel):
+    id: int
+    name: Optional[str] = None
+    price: Optional[float] = None
+    status: Optional[str] = None
+    stock: Optional[int] = None
+    thumbnail_url: Optional[str] = None
+    seller_id: Optional[int] = None
+    seller_username: Optional[str] = None
+    category_id: Optional[int] = None
+    category_slug: Optional[str] = None
+
+
+# 絞り込みごとの件数（トップページのカテゴリタブ・価格フィルター用）
+class CategoryFacet(BaseModel):
+    id: int
+    name: str
+    slug: str
+    count: int
+
+
+class PriceRangeFacet(BaseModel):
+    max_price: float  # この金額以下（max_price= の絞り込みと同じ）
+    count: int
+
+
+class ProductFacets(BaseModel):
+    total: int
+    categories: List[CategoryFacet]
+    price_ranges: List[PriceRangeFacet]
+    status: Dict[str, int]
+
 # -------------------------------------------------------
 # トークン
 # ------------------------------------------------------
@@ -145,12 +203,14 @@ class LoginResponse(BaseModel):
 # -------------------------------------------------------
 class OrderItemCreate(BaseModel):
     product_id: int
-    quantity: int
-    price: float
+    quantity: int = Field(..., gt=0)
+    # カートに表示していた価格（現在の価格と違う場合は注文しない。省略時は現在の価格）
+    price: Optional[float] = None
 
 
 class OrderItemResponse(OrderItemCreate):
     id: int
+    price: float
     product: Optional[Product] = None
 
     class Config:
@@ -164,6 +224,8 @@ class OrderCreate(BaseModel):
     shipping_phone: str
     shipping_address: str
     items: List[OrderItemCreate]
+    # POST /api/cart/quote の見積もり（指定すると見積もりの価格で注文する。同じ見積もりは1回だけ）
+    quote: Optional[str] = None
 
 
 class OrderResponse(BaseModel):
@@ -178,4 +240,114 @@ class OrderResponse(BaseModel):
     order_items: List[OrderItemResponse]
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+# -------------------------------------------------------
+# 出品者の受注
+# -------------------------------------------------------
+class SellerOrderItem(BaseModel):
+    id: int  # 注文明細ID（状況の更新に使う）
+    order_id: int
+    product_id: int
+    product_name: Optional[str] = None
+    quantity: int
+    price: float
+    status: str  # pending, confirmed, shipped
+    ordered_at: datetime
+    shipping_name: str
+    shipping_phone: str
+    shipping_address: str
+
+
+class SellerOrderStatusUpdate(BaseModel):
+    item_ids: List[int] = Field(..., min_length=1, max_length=500)
+    status: str = Field(..., pattern="^(confirmed|shipped)$")
+
+
+class SellerOrderStatusResult(BaseModel):
+    updated: List[int]
+    skipped: List[int]  # 見つからない・他の出品者の明細・その状況に変更できない明細
+
+# -------------------------------------------------------
+# ショップページ
+# -------------------------------------------------------
+# 出品者の公開プロフィール（メールアドレス・パスワードなどは含めない）
+class ShopProfile(BaseModel):
+    id: int
+    username: str
+    created_at: datetime
+
+
+class ShopStats(BaseModel):
+    listing_count: int  # 販売中の商品数
+    sold_count: int  # 売却済みの商品数
+
+
+# ショップの商品（出品者はページの持ち主なので含めない）
+class ShopProduct(BaseModel):
+    id: int
+    name: str
+    description: Optional[str] = None
+    price: float
+    category_id: Optional[int] = None
+    image_url: Optional[str] = None
+    stock: int
+    status: str
+    created_at: datetime
+    updated_at: datetime
+    category: Optional[Category] = None
+
+    class Config:
+        from_attributes = True
+
+
+class ShopPage(BaseModel):
+    seller: ShopProfile
+    stats: ShopStats
+    products: List[ShopProduct]
+    next_cursor: Optional[str] = None  # 次ページがある場合のみ（cursor= に渡す）
+
+# -------------------------------------------------------
+# カートの見積もり
+# -------------------------------------------------------
+class CartQuoteRequest(BaseModel):
+    items: List[OrderItemCreate] = Field(..., min_length=1, max_length=100)
+
+
+class CartQuoteLine(BaseModel):
+    product_id: int
+    quantity: int
+    name: Optional[str] = None
+    price: Optional[float] = None  # 現在の価格（商品がない場合はNone）
+    requested_price: Optional[float] = None  # カートに表示していた価格
+    price_changed: bool = False
+    stock: Optional[int] = None
+    status: Optional[str] = None
+    available: bool
+    reason: Optional[str] = None  # not_found, unavailable, insufficient_stock
+    message: Optional[str] = None
+
+
+class CartQuote(BaseModel):
+    items: List[CartQuoteLine]
+    total_amount: float  # 購入できる明細の合計
+    purchasable: bool  # すべての明細が購入できるか
+    quote: Optional[str] = None  # ログイン中で購入できる場合のみ。注文時に OrderCreate.quote に渡す（1回だけ使える）
+    expires_at: Optional[datetime] = None
+
+# -------------------------------------------------------
+# バックグラウンドジョブ
+# -------------------------------------------------------
+class JobStatus(BaseModel):
+    id: int
+    kind: str
+    status: str  # queued, running, succeeded, failed
+    attempts: int
+    max_attempts: int
+    run_at: datetime
+    last_error: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,164 @@
+# 商品の全文検索（SQLite: FTS5 / PostgreSQL: tsvector + GIN）
+#
+# 商品名・説明はほとんど日本語で単語の区切りがないため、文字のbi-gram
+# （2文字ずつずらした並び）に分割してから索引に登録する。
+# 検索語も同じように分割し、bi-gramが連続して並ぶもの（＝部分一致）を探す。
+# 1文字の検索語はその文字で始まる語の前方一致で探すため、各単語の最後の文字
+# （どのbi-gramの先頭にもならない文字）は1文字のまま追加で登録する。
+import re
+import unicodedata
+from typing import List
+from sqlalchemy import column, delete, func, insert, literal_column, select, table, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models
+
+# 検索語の最大長（長すぎるクエリで索引検索が重くならないように）
+MAX_QUERY_LENGTH = 100
+
+_WORD_SPLIT = re.compile(r"[^\w]+|_+")
+
+# SQLite: FTS5の仮想テーブル（rowid = 商品ID）
+products_fts = table("products_fts", column("rowid"), column("name"), column("description"))
+# PostgreSQL: 商品ごとのtsvector
+product_search = table("product_search", column("product_id"), column("document"))
+_PG_UPSERT = text(
+    "INSERT INTO product_search (product_id, document) VALUES (:id, "
+    "setweight(to_tsvector('simple', :name), 'A') || "
+    "setweight(to_tsvector('simple', :description), 'B')) "
+    "ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document"
+)
+
+
+#-------------------------------------------------------
+# bi-gram分割
+#-------------------------------------------------------
+def normalize(text_value: str) -> List[str]:
+    """全角・半角や大文字小文字をそろえて単語（記号・空白区切り）に分ける"""
+    if not text_value:
+        return []
+    normalized = unicodedata.normalize("NFKC", text_value).lower()
+    return [word for word in _WORD_SPLIT.split(normalized) if word]
+
+
+def word_bigrams(word: str) -> List[str]:
+    """1単語をbi-gramに分割（1文字の単語はそのまま）"""
+    if len(word) == 1:
+        return [word]
+    return [word[i:i + 2] for i in range(len(word) - 1)]
+
+
+def index_grams(word: str) -> List[str]:
+    """1単語の索引に登録するgram（bi-gramと、1文字検索用に最後の文字）"""
+    grams = word_bigrams(word)
+    if len(word) > 1:
+        grams.append(word[-1])
+    return grams
+
+
+def ngram_text(text_value: str) -> str:
+    """索引に登録する文字列（gramを空白区切りで並べたもの）"""
+    return " ".join(gram for word in normalize(text_value) for gram in index_grams(word))
+
+
+def _fts5_query(words: List[str]) -> str:
+    """FTS5のMATCH式（単語ごとにbi-gramのフレーズ、1文字はbi-gram・最後の文字の前方一致）"""
+    terms = []
+    for word in words:
+        if len(word) == 1:
+            terms.append(f'"{word}"*')
+        else:
+            terms.append('"' + " ".join(word_bigrams(word)) + '"')
+    return " AND ".join(terms)
+
+
+def _tsquery(words: List[str]) -> str:
+    """PostgreSQLのto_tsquery式（bi-gramを<->で連結、1文字はbi-gram・最後の文字の前方一致）"""
+    terms = []
+    for word in words:
+        if len(word) == 1:
+            terms.append(f"'{word}':*")
+        else:
+            terms.append("(" + " <-> ".join(f"'{gram}'" for gram in word_bigrams(word)) + ")")
+    return " & ".join(terms)
+
+
+def is_postgresql(db: AsyncSession) -> bool:
+    return db.bind.dialect.name == "postgresql"
+
+
+#-------------------------------------------------------
+# 索引の更新（商品の作成・更新・削除と同じトランザクションで行う）
+#-------------------------------------------------------
+async def index_product(db: AsyncSession, product: models.Product):
+    """商品を索引に登録（既にあれば置き換え）"""
+    if not product.is_active or product.status == "deleted":
+        await remove_product(db, product.id)
+        return
+
+    name = ngram_text(product.name)
+    description = ngram_text(product.description)
+    if is_postgresql(db):
+        await db.execute(_PG_UPSERT, {"id": product.id, "name": name, "description": description})
+    else:
+        await db.execute(delete(products_fts).where(products_fts.c.rowid == product.id))
+        await db.execute(
+            insert(products_fts).values(rowid=product.id, name=name, description=description)
+        )
+
+
+async def index_new_products(db: AsyncSession, rows):
+    """一括登録した商品をまとめて索引に登録（rows: (id, name, description) の並び）"""
+    params = [
+        {"id": product_id, "name": ngram_text(name), "description": ngram_text(description)}
+        for product_id, name, description in rows
+    ]
+    if not params:
+        return
+    if is_postgresql(db):
+        await db.execute(_PG_UPSERT, params)
+    else:
+        await db.execute(insert(products_fts), [
+            {"rowid": p["id"], "name": p["name"], "description": p["description"]} for p in params
+        ])
+
+
+async def remove_product(db: AsyncSession, product_id: int):
+    """商品を索引から削除"""
+    if is_postgresql(db):
+        await db.execute(delete(product_search).where(product_search.c.product_id == product_id))
+    else:
+        await db.execute(delete(products_fts).where(products_fts.c.rowid == product_id))
+
+
+async def remove_products(db: AsyncSession, product_ids):
+    """複数の商品をまとめて索引から削除"""
+    if is_postgresql(db):
+        await db.execute(delete(product_search).where(product_search.c.product_id.in_(product_ids)))
+    else:
+        await db.execute(delete(products_fts).where(products_fts.c.rowid.in_(product_ids)))
+
+
+#-------------------------------------------------------
+# 検索
+#-------------------------------------------------------
+def search_matches(db: AsyncSession, q: str):
+    """検索語に一致する商品IDと関連度のサブクエリ（一致なしならNone）
+
+    関連度 rank は小さいほど上位。商品名の一致を説明より重く扱う。
+    """
+    words = normalize(q[:MAX_QUERY_LENGTH])
+    if not words:
+        return None
+
+    if is_postgresql(db):
+        tsquery = func.to_tsquery("simple", _tsquery(words))
+        return select(
+            product_search.c.product_id.label("product_id"),
+            (-func.ts_rank(product_search.c.document, tsquery)).label("rank")
+        ).where(product_search.c.document.op("@@")(tsquery)).subquery()
+
+    fts = literal_column("products_fts")
+    return select(
+        products_fts.c.rowid.label("product_id"),
+        func.bm25(fts, 10.0, 1.0).label("rank")
+    ).where(fts.op("MATCH")(_fts5_query(words))).subquery()
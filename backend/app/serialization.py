@@ -0,0 +1,69 @@
+# レスポンスのJSON変換
+#
+# FastAPIは response_model を指定したエンドポイントの戻り値を
+# 検証 → dictに変換 → JSONエンコード と何段階も処理する。
+# 一覧系のエンドポイントではスキーマのTypeAdapterで1回だけ検証し、
+# Pydantic（Rust実装）で直接JSONのバイト列にしてそのまま返す。
+# 件数の多いエクスポートなどはNDJSONで少しずつ返す（stream_ndjson）。
+from functools import lru_cache
+from typing import Any, AsyncIterator, Iterable, List
+import orjson
+from fastapi import Response
+from pydantic import TypeAdapter
+from .database import AsyncSessionLocal
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+@lru_cache(maxsize=None)
+def list_adapter(schema) -> TypeAdapter:
+    """スキーマの一覧用TypeAdapter（スキーマごとに1回だけ作成）"""
+    return TypeAdapter(List[schema])
+
+
+def dump_list(schema, items: Iterable[Any], exclude_unset: bool = False) -> bytes:
+    """ORMオブジェクトや行・辞書の一覧をスキーマで検証してJSONのバイト列に変換"""
+    adapter = list_adapter(schema)
+    models = adapter.validate_python(list(items), from_attributes=True)
+    return adapter.dump_json(models, exclude_unset=exclude_unset)
+
+
+@lru_cache(maxsize=None)
+def model_adapter(schema) -> TypeAdapter:
+    """スキーマ単体のTypeAdapter（スキーマごとに1回だけ作成）"""
+    return TypeAdapter(schema)
+
+
+def model_response(schema, value: Any, headers: dict = None) -> Response:
+    """1件のレスポンスを検証してJSONで返す（list_response の単体版）"""
+    adapter = model_adapter(schema)
+    return Response(
+        content=adapter.dump_json(adapter.validate_python(value, from_attributes=True)),
+        media_type="application/json",
+        headers=headers,
+    )
+
+
+def list_response(schema, items: Iterable[Any], headers: dict = None, exclude_unset: bool = False) -> Response:
+    """検証済みのJSON本文を返すレスポンス（FastAPIの再検証・再エンコードを通らない）"""
+    return Response(
+        content=dump_list(schema, items, exclude_unset=exclude_unset),
+        media_type="application/json",
+        headers=headers,
+    )
+
+
+def ndjson_rows(rows) -> bytes:
+    """行（カラム名 → 値）をNDJSONに変換"""
+    return b"".join(orjson.dumps(dict(row._mapping)) + b"\n" for row in rows)
+
+
+async def stream_ndjson(query, batch_size: int = 1000) -> AsyncIterator[bytes]:
+    """クエリ結果をサーバー側カーソルで少しずつ読みながらNDJSONで返す
+
+    レスポンスの送信中もDBを読むため、リクエストのセッションではなく専用のセッションを使う。
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=batch_size))
+        async for rows in result.partitions():
+            yield ndjson_rows(rows)
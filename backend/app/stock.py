@@ -0,0 +1,135 @@
+# 注文時の在庫引当（一括・競合に強い在庫減算）
+from collections import Counter, OrderedDict
+from typing import Dict, List
+from sqlalchemy import case, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+from . import facets, models
+
+
+class StockError(Exception):
+    """在庫引当に失敗した商品の一覧を持つ例外"""
+
+    def __init__(self, failures: List[dict]):
+        self.failures = failures
+        super().__init__(self.message)
+
+    @property
+    def message(self) -> str:
+        return " / ".join(failure["message"] for failure in self.failures)
+
+    @property
+    def status_code(self) -> int:
+        # すべて存在しない商品なら404、それ以外は400
+        if all(failure["reason"] == "not_found" for failure in self.failures):
+            return 404
+        return 400
+
+
+def aggregate_quantities(items) -> Dict[int, int]:
+    """同じ商品の明細をまとめて商品IDごとの数量にする"""
+    quantities = OrderedDict()
+    for item in items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    return quantities
+
+
+async def load_products(db: AsyncSession, product_ids, lock: bool = False) -> Dict[int, models.Product]:
+    """対象商品を1回のクエリで取得（PostgreSQLでは行ロックを取る）"""
+    query = select(models.Product).where(
+        models.Product.id.in_(product_ids)
+    ).order_by(models.Product.id).execution_options(populate_existing=True)
+    if lock and db.bind.dialect.name == "postgresql":
+        query = query.with_for_update()
+    result = await db.execute(query)
+    return {product.id: product for product in result.scalars().all()}
+
+
+def check_stock(products: Dict[int, models.Product], quantities: Dict[int, int]) -> List[dict]:
+    """在庫不足・販売停止の商品をすべて洗い出す"""
+    failures = []
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if product is None:
+            failures.append({
+                "product_id": product_id,
+                "reason": "not_found",
+                "message": f"商品ID {product_id} が見つかりません",
+            })
+        elif not product.is_active or product.status == "deleted":
+            failures.append({
+                "product_id": product_id,
+                "reason": "unavailable",
+                "message": f"{product.name}は現在購入できません",
+            })
+        elif product.stock < quantity:
+            failures.append({
+                "product_id": product_id,
+                "reason": "insufficient_stock",
+                "stock": product.stock,
+                "message": f"{product.name}の在庫が不足しています（在庫: {product.stock}個）",
+            })
+    return failures
+
+
+async def reserve_stock(db: AsyncSession, items) -> Dict[int, models.Product]:
+    """注文明細の在庫をまとめて引き当てる
+
+    在庫の減算は「在庫が足りる行だけ」を対象にした1回のUPDATEで行うため、
+    同時に購入されても在庫がマイナスになることはない。
+    1件でも失敗した場合は StockError を送出する。
+    呼び出し側のトランザクション内で実行し、commit・rollbackは呼び出し側で行う
+    （StockError の場合は一部の商品だけ減算されているため、呼び出し側で必ずrollbackする）。
+    """
+    quantities = aggregate_quantities(items)
+    products = await load_products(db, list(quantities), lock=True)
+
+    failures = check_stock(products, quantities)
+    if failures:
+        raise StockError(failures)
+
+    quantity_expr = case(quantities, value=models.Product.id)
+    result = await db.execute(
+        update(models.Product)
+        .where(
+            models.Product.id.in_(list(quantities)),
+            models.Product.stock >= quantity_expr
+        )
+        .values(
+            stock=models.Product.stock - quantity_expr,
+            # 右辺は更新前の値で評価される
+            status=case(
+                (models.Product.stock - quantity_expr == 0, "sold"),
+                else_=models.Product.status
+            )
+        )
+        .returning(models.Product.id)
+        .execution_options(synchronize_session=False)
+    )
+    reserved = set(result.scalars().all())
+
+    if len(reserved) != len(quantities):
+        # 取得後に他の注文が在庫を減らした。減算できなかった商品だけを読み直して理由を返す
+        # （このトランザクションでは更新していないため、他の注文の結果が読める）
+        conflicted = {product_id: quantity for product_id, quantity in quantities.items() if product_id not in reserved}
+        products = await load_products(db, list(conflicted))
+        failures = check_stock(products, conflicted) or [{
+            "product_id": None,
+            "reason": "conflict",
+            "message": "在庫が変更されました。もう一度お試しください",
+        }]
+        raise StockError(failures)
+
+    # 取得済みの商品にも減算後の値を反映（変更扱いにはしない）
+    facet_changes = Counter()
+    for product_id, quantity in quantities.items():
+        product = products[product_id]
+        facet_before = facets.facet_key(product)
+        set_committed_value(product, "stock", product.stock - quantity)
+        if product.stock == 0:
+            set_committed_value(product, "status", "sold")
+        facets.diff(facet_changes, facet_before, facets.facet_key(product))
+
+    # 売り切れになった商品の件数集計を同じトランザクションで更新する
+    await facets.apply(db, facet_changes)
+    return products
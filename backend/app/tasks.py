@@ -0,0 +1,112 @@
+# バックグラウンドジョブの処理（app.jobs のワーカーが実行する）
+import logging
+import os
+import time
+from collections import Counter
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import facets, models, search
+from .catalog_index import catalog_index
+from .jobs import enqueue, job_handler
+from .response_cache import response_cache, seller_tag, CATALOG
+
+logger = logging.getLogger(__name__)
+
+SELLER_PRODUCTS_DELETE = "seller.products.delete"
+ORDER_PLACED = "order.placed"
+FACETS_RECONCILE = "facets.reconcile"
+
+# 出品者の商品を論理削除するときの1回のトランザクションの件数
+SELLER_CLEANUP_BATCH_SIZE = int(os.getenv("SELLER_CLEANUP_BATCH_SIZE", "500"))
+# 商品の件数集計を商品テーブルから集計し直す間隔（秒）
+FACETS_RECONCILE_INTERVAL = float(os.getenv("FACETS_RECONCILE_INTERVAL", "3600"))
+
+
+#-------------------------------------------------------
+# 削除されたユーザーの商品の後片付け
+#-------------------------------------------------------
+async def enqueue_seller_cleanup(db: AsyncSession, seller_id: int, created_by: int) -> models.Job:
+    """ユーザー削除と同じトランザクションで商品の後片付けを登録"""
+    return await enqueue(db, SELLER_PRODUCTS_DELETE, {"seller_id": seller_id}, created_by=created_by)
+
+
+@job_handler(SELLER_PRODUCTS_DELETE)
+async def delete_seller_products(db: AsyncSession, payload: dict):
+    """出品者の商品を一定件数ずつ論理削除して索引から外す"""
+    seller_id = payload["seller_id"]
+    while True:
+        result = await db.execute(
+            select(models.Product.id).where(
+                models.Product.seller_id == seller_id,
+                models.Product.status != "deleted"
+            ).order_by(models.Product.id).limit(SELLER_CLEANUP_BATCH_SIZE)
+        )
+        product_ids = result.scalars().all()
+        if not product_ids:
+            break
+        await search.remove_products(db, product_ids)
+        removed = await facets.aggregate(db, models.Product.id.in_(product_ids))
+        await facets.apply(db, Counter({key: -count for key, count in removed.items()}))
+        await db.execute(
+            update(models.Product)
+            .where(models.Product.id.in_(product_ids))
+            .values(status="deleted", is_active=False)
+        )
+        # 商品の多い出品者でも書き込みロックを長く持たないよう、件数ごとにcommitする
+        await db.commit()
+
+    # API側でも登録時に外している。ここでは論理削除の完了後に、共有の保存先（Redis）と
+    # ジョブを実行したプロセスのキャッシュ・索引から残りを外す
+    catalog_index.remove_seller(seller_id)
+    await response_cache.invalidate(CATALOG, seller_tag(seller_id))
+
+
+#-------------------------------------------------------
+# 注文後の処理
+#-------------------------------------------------------
+async def enqueue_order_placed(db: AsyncSession, order_id: int, created_by: int) -> models.Job:
+    """注文と同じトランザクションで注文後の処理を登録"""
+    return await enqueue(
+        db, ORDER_PLACED, {"order_id": order_id},
+        idempotency_key=f"{ORDER_PLACED}:{order_id}", created_by=created_by
+    )
+
+
+@job_handler(ORDER_PLACED)
+async def notify_sellers(db: AsyncSession, payload: dict):
+    """注文が入ったことを出品者ごとに通知（通知手段ができるまではログに記録する）"""
+    order_id = payload["order_id"]
+    result = await db.execute(
+        select(
+            models.OrderItem.seller_id,
+            func.count(models.OrderItem.id),
+            func.sum(models.OrderItem.quantity)
+        )
+        .where(models.OrderItem.order_id == order_id)
+        .group_by(models.OrderItem.seller_id)
+    )
+    for seller_id, items, quantity in result.all():
+        logger.info(
+            "注文通知 order_id=%s seller_id=%s items=%s quantity=%s",
+            order_id, seller_id, items, quantity
+        )
+
+
+#-------------------------------------------------------
+# 商品の件数集計の定期的な再集計
+#-------------------------------------------------------
+async def schedule_facets_reconcile(db: AsyncSession) -> models.Job:
+    """次の時間枠の再集計を登録（時間枠ごとのキーで、複数プロセスから呼んでも1件になる）"""
+    slot = int(time.time() // FACETS_RECONCILE_INTERVAL) + 1
+    return await enqueue(
+        db, FACETS_RECONCILE, {"slot": slot},
+        idempotency_key=f"{FACETS_RECONCILE}:{slot}",
+        delay=max(0.0, slot * FACETS_RECONCILE_INTERVAL - time.time())
+    )
+
+
+@job_handler(FACETS_RECONCILE)
+async def reconcile_facets(db: AsyncSession, payload: dict):
+    """商品テーブルから件数を集計し直し、次の再集計を登録する"""
+    await facets.reconcile(db)
+    await schedule_facets_reconcile(db)
@@ -0,0 +1,46 @@
+# バックグラウンドジョブを別プロセスで実行するワーカー
+#
+# backend ディレクトリで python -m app.worker を実行する（ワーカー数は JOB_WORKERS、最低1）。
+# app.jobs を直接 python -m で実行すると、モジュールが __main__ と app.jobs の2つとして
+# 読み込まれ、ハンドラの登録先と実行するキューが別々になるため、起動はこのモジュールから行う。
+import asyncio
+import logging
+import signal
+from app import tasks  # noqa: F401  ハンドラを登録する
+from app.database import async_engine
+from app.jobs import JOB_WORKERS, job_queue
+from app.logs import setup_logging
+
+# python -m で実行すると __name__ は __main__ になるため、appのロガーの下に名前を固定する
+logger = logging.getLogger("app.worker")
+
+
+async def run(workers: int):
+    """ワーカーを起動し、SIGINT / SIGTERM を受けたら停止する"""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            # Windowsではシグナルハンドラを登録できない（Ctrl+CはKeyboardInterruptで止まる）
+            pass
+
+    job_queue.start(workers)
+    logger.info("ジョブワーカー起動 workers=%s", workers)
+    try:
+        await stop.wait()
+    finally:
+        await job_queue.shutdown()
+        # コネクションを閉じる（aiosqliteの接続スレッドが残るとプロセスが終了しない）
+        await async_engine.dispose()
+        logger.info("ジョブワーカー停止")
+
+
+def main():
+    setup_logging()
+    asyncio.run(run(max(1, JOB_WORKERS)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+# ベンチマーク用のダミーデータ生成（数百万件規模・SQLite）
+#
+# 使い方（backendディレクトリで実行）:
+#   python -m benchmarks.datagen --db /tmp/bench.db --users 100000 --products 1000000 --orders 1000000
+#
+# create_sample_data.py と同じカテゴリ・ログインできるユーザーを作り、
+# 商品（全文検索の索引を含む）と注文を sqlite3 の executemany で一括投入する。
+# 1件ずつORMで登録すると数百万件では終わらないため、マイグレーション後のテーブルに直接書き込む。
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.query_plans import migrate
+from benchmarks.search import ADJECTIVES, COLORS, ITEMS
+
+# 全ユーザー共通のパスワード（ログインのシナリオで使う）
+PASSWORD = "password123"
+ADMIN_USERNAME = "admin"
+
+# create_sample_data.py と同じカテゴリ
+CATEGORIES = [
+    ("トップス", "tops"),
+    ("アウター", "outerwear"),
+    ("パーカー", "hoodies"),
+    ("パンツ", "pants"),
+    ("スカート", "skirts"),
+    ("シューズ", "shoes"),
+    ("アクセサリー", "accessories"),
+    ("その他", "other"),
+]
+
+# 注文が集中する人気商品の数（在庫の取り合いのシナリオで使う、ID 1〜HOT_PRODUCTS）
+HOT_PRODUCTS = 10
+
+BATCH_SIZE = 10_000
+
+
+def _batches(rows, size: int = BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def generate(path: str, users: int, products: int, orders: int, seed: int = 0) -> dict:
+    """マイグレーション済みのSQLiteファイルにダミーデータを一括投入して件数を返す
+
+    ユーザーID 1 は管理者、2以降は一般ユーザー（user{ID}）。パスワードはすべて PASSWORD。
+    """
+    from app.hashing import hash_password
+    from app.search import ngram_text
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    # bcryptは1件ずつ計算すると遅すぎるため、全員同じハッシュを使う（ログイン時の検証コストは同じ）
+    hashed = hash_password(PASSWORD)
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+
+    conn.executemany(
+        "INSERT INTO categories (id, name, slug, created_at) VALUES (?, ?, ?, ?)",
+        [(i, name, slug, now) for i, (name, slug) in enumerate(CATEGORIES, start=1)]
+    )
+
+    def user_rows():
+        yield (1, "admin@example.com", ADMIN_USERNAME, hashed, "ADMIN", now, now)
+        for i in range(2, users + 1):
+            created = now - timedelta(seconds=rng.randint(0, 3 * 365 * 24 * 3600))
+            yield (i, f"user{i}@example.com", f"user{i}", hashed, "USER", created, created)
+
+    for batch in _batches(user_rows()):
+        conn.executemany(
+            "INSERT INTO users (id, email, username, hashed_password, role, is_active, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, 1, ?, ?)",
+            batch
+        )
+
+    def product_rows():
+        for i in range(1, products + 1):
+            name = f"{rng.choice(ADJECTIVES)}{rng.choice(ITEMS)}"
+            description = f"{rng.choice(COLORS)}の{name}です。サイズ{rng.choice('SML')}"
+            created = now - timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+            if i <= HOT_PRODUCTS:
+                # 人気商品は在庫を多めにして、売り切れより行の取り合いを計測する
+                status, stock = "available", 1_000_000
+            else:
+                status = rng.choices(["available", "sold", "deleted"], [80, 15, 5])[0]
+                stock = 0 if status == "sold" else rng.randint(1, 20)
+            yield (
+                i, name, description, rng.randint(5, 300) * 100, rng.randint(1, len(CATEGORIES)),
+                rng.randint(2, max(2, users)), stock, int(status != "deleted"), status, created, created
+            )
+
+    for batch in _batches(product_rows()):
+        conn.executemany(
+            "INSERT INTO products (id, name, description, price, category_id, seller_id, stock, "
+            "is_active, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            batch
+        )
+        conn.executemany(
+            "INSERT INTO products_fts (rowid, name, description) VALUES (?, ?, ?)",
+            ((row[0], ngram_text(row[1]), ngram_text(row[2])) for row in batch if row[8] != "deleted")
+        )
+
+    item_count = 0
+
+    def order_rows():
+        for i in range(1, orders + 1):
+            created = now - timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+            yield (i, rng.randint(2, max(2, users)), 0, "pending", "東京都渋谷区1-2-3", "山田 太郎",
+                   "090-0000-0000", created, created)
+
+    for batch in _batches(order_rows()):
+        conn.executemany(
+            "INSERT INTO orders (id, user_id, total_amount, status, shipping_address, shipping_name, "
+            "shipping_phone, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            batch
+        )
+        items = [
+            (order[0], rng.randint(1, products), rng.randint(1, 3), rng.randint(5, 300) * 100)
+            for order in batch for _ in range(rng.randint(1, 3))
+        ]
+        conn.executemany(
+            "INSERT INTO order_items (order_id, product_id, quantity, price) VALUES (?, ?, ?, ?)", items
+        )
+        item_count += len(items)
+
+    # 商品の件数集計（アプリでは登録時に差分で更新するが、一括投入ではまとめて集計する）
+    conn.execute(
+        "INSERT INTO product_facet_counts (category_id, price_bucket, status, count) "
+        "SELECT COALESCE(category_id, 0), "
+        "CASE WHEN price <= 3000 THEN 0 WHEN price <= 5000 THEN 1 WHEN price <= 10000 THEN 2 ELSE 3 END, "
+        "status, COUNT(*) FROM products WHERE is_active AND status != 'deleted' GROUP BY 1, 2, 3"
+    )
+
+    # 明細の出品者（アプリでは注文時に商品から複製する）
+    conn.execute(
+        "UPDATE order_items SET seller_id = "
+        "(SELECT seller_id FROM products WHERE products.id = order_items.product_id)"
+    )
+
+    # 合計金額は明細からまとめて計算する
+    conn.execute(
+        "UPDATE orders SET total_amount = "
+        "(SELECT COALESCE(SUM(quantity * price), 0) FROM order_items WHERE order_id = orders.id)"
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+    return {"users": users, "products": products, "orders": orders, "order_items": item_count}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ベンチマーク用のダミーデータを一括投入")
+    parser.add_argument("--db", required=True, help="作成するSQLiteファイルのパス（既存のファイルは不可）")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        parser.error(f"{args.db} は既に存在します")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(args.db)}"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    migrate("head")
+    print(f"データ投入中: ユーザー{args.users:,}人 / 商品{args.products:,}件 / 注文{args.orders:,}件")
+    start = time.perf_counter()
+    counts = generate(args.db, args.users, args.products, args.orders, args.seed)
+    print(f"完了: {counts}（{time.perf_counter() - start:.1f}秒）")
+    print(f"ログイン: {ADMIN_USERNAME} または user2〜user{args.users} / パスワード {PASSWORD}")
+
+
+if __name__ == "__main__":
+    main()
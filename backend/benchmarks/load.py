@@ -0,0 +1,288 @@
+# 負荷シナリオのベンチマーク（商品閲覧・検索・購入・ログイン）
+#
+# 使い方（backendディレクトリで実行、httpxが必要）:
+#   python -m benchmarks.load --products 100000 --output results/load.json
+#   python -m benchmarks.load --db /tmp/bench.db --scenario browse --scenario checkout
+#   python -m benchmarks.load --products 100000 --compare results/load.json
+#
+# ダミーデータ（benchmarks.datagen）を投入したSQLiteに対して、アプリをASGIで直接呼び出し、
+# 同時実行数を指定してシナリオごとに p50 / p95 / p99 と1リクエストあたりのSQLの数を記録する。
+# 結果はJSONで保存し、--compare で前回の結果と比べてp95が悪化したシナリオを報告する。
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from benchmarks.datagen import CATEGORIES, HOT_PRODUCTS, PASSWORD, generate
+from benchmarks.query_plans import migrate
+from benchmarks.search import SEARCH_TERMS
+
+SORTS = ["newest", "oldest", "price_asc", "price_desc"]
+
+
+class Recorder:
+    """1シナリオ分のレイテンシとステータスコード"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.statuses = Counter()
+        self.errors = 0
+
+    async def request(self, client, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except Exception:
+            self.errors += 1
+            return None
+        self.latencies.append((time.perf_counter() - start) * 1000)
+        self.statuses[response.status_code] += 1
+        if response.status_code >= 500:
+            self.errors += 1
+        return response
+
+
+#-------------------------------------------------------
+# シナリオ（1回分の操作）
+#-------------------------------------------------------
+async def browse(client, rec: Recorder, rng: random.Random, ctx: dict):
+    """一覧 → 次のページ → 商品詳細"""
+    params = {"sort": rng.choice(SORTS), "limit": 24}
+    if rng.random() < 0.5:
+        params["category"] = rng.choice(CATEGORIES)[1]
+    response = await rec.request(client, "GET", "/api/products", params=params)
+    if response is None or response.status_code != 200:
+        return
+    cursor = response.headers.get("X-Next-Cursor")
+    if cursor:
+        response = await rec.request(client, "GET", "/api/products", params={**params, "cursor": cursor})
+    items = response.json() if response is not None and response.status_code == 200 else []
+    if items:
+        await rec.request(client, "GET", f"/api/products/{rng.choice(items)['id']}")
+
+
+async def search(client, rec: Recorder, rng: random.Random, ctx: dict):
+    """キーワード検索"""
+    await rec.request(client, "GET", "/api/products/search", params={"q": rng.choice(SEARCH_TERMS)})
+
+
+async def checkout(client, rec: Recorder, rng: random.Random, ctx: dict):
+    """人気商品の購入（同じ行の在庫を取り合う）"""
+    product = rng.choice(ctx["hot_products"])
+    await rec.request(client, "POST", "/api/orders/", headers=rng.choice(ctx["auth_headers"]), json={
+        "shipping_name": "山田 太郎",
+        "shipping_phone": "090-0000-0000",
+        "shipping_address": "東京都渋谷区1-2-3",
+        "items": [{"product_id": product["id"], "quantity": 1, "price": product["price"]}],
+    })
+
+
+async def login(client, rec: Recorder, rng: random.Random, ctx: dict):
+    """ログインの集中（bcryptの検証）"""
+    await rec.request(client, "POST", "/api/auth/login", data={
+        "username": f"user{rng.randint(2, ctx['users'])}", "password": PASSWORD
+    })
+
+
+SCENARIOS = {
+    "browse": browse,
+    "search": search,
+    "checkout": checkout,
+    "login": login,
+}
+
+
+#-------------------------------------------------------
+# 実行・集計
+#-------------------------------------------------------
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return round(sorted_values[index], 3)
+
+
+async def prepare(users: int) -> dict:
+    """購入シナリオ用の認証ヘッダーと人気商品（ログインのbcryptを通さずにトークンを作る）"""
+    from sqlalchemy import select
+    from app import auth, models
+    from app.database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(models.Product.id, models.Product.price).where(models.Product.id <= HOT_PRODUCTS)
+        )
+        hot_products = [{"id": row.id, "price": row.price} for row in result.all()]
+
+    auth_headers = []
+    for user_id in range(2, min(users, 101) + 1):
+        token = auth.create_access_token({"sub": f"user{user_id}", "user_id": user_id, "role": "user"})
+        auth_headers.append({"Authorization": f"Bearer {token}"})
+    return {"users": users, "hot_products": hot_products, "auth_headers": auth_headers}
+
+
+async def run_scenario(app, name: str, ctx: dict, iterations: int, concurrency: int, seed: int) -> dict:
+    """シナリオを同時実行数 concurrency で合計 iterations 回実行"""
+    import httpx
+    from app.metrics import request_queries
+
+    rec = Recorder()
+    remaining = iterations
+    scenario = SCENARIOS[name]
+
+    async def virtual_user(index: int):
+        nonlocal remaining
+        rng = random.Random(seed * 1000 + index)
+        while remaining > 0:
+            remaining -= 1
+            await scenario(client, rec, rng, ctx)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        query_sum, query_count = request_queries.totals()
+        start = time.perf_counter()
+        await asyncio.gather(*(virtual_user(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        query_sum_after, query_count_after = request_queries.totals()
+
+    latencies = sorted(rec.latencies)
+    requests = len(latencies)
+    measured = query_count_after - query_count
+    return {
+        "iterations": iterations,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": rec.errors,
+        "statuses": {str(code): count for code, count in sorted(rec.statuses.items())},
+        "rps": round(requests / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": round(latencies[-1], 3) if latencies else 0.0,
+        "queries_per_request": round((query_sum_after - query_sum) / measured, 2) if measured else None,
+    }
+
+
+async def run_all(app, scenarios: List[str], users: int, iterations: int, concurrency: int, seed: int) -> dict:
+    """アプリの起動処理（ワーカーなど）を行ってから各シナリオを順に実行"""
+    from app.database import async_engine
+
+    results = {}
+    try:
+        async with app.router.lifespan_context(app):
+            ctx = await prepare(users)
+            for name in scenarios:
+                print(f"実行中: {name}（{iterations}回 / 同時{concurrency}）")
+                results[name] = await run_scenario(app, name, ctx, iterations, concurrency, seed)
+    finally:
+        # aiosqliteの接続（ワーカースレッド）を閉じないとプロセスが終了しない
+        await async_engine.dispose()
+    return results
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline: dict, results: Dict[str, dict], threshold: float) -> List[str]:
+    """前回の結果と比べてp95が threshold（割合）以上悪化したシナリオ"""
+    regressions = []
+    print(f"\n■ 比較（基準: {baseline.get('meta', {}).get('git_revision')}）")
+    for name, result in results.items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before or not before.get("p95_ms"):
+            continue
+        change = result["p95_ms"] / before["p95_ms"] - 1
+        mark = ""
+        if change > threshold:
+            regressions.append(name)
+            mark = "  ← 悪化"
+        print(f"  {name:<10} p95 {before['p95_ms']:>9.3f} → {result['p95_ms']:>9.3f} ms ({change:+.1%}){mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="商品閲覧・検索・購入・ログインの負荷シナリオを計測")
+    parser.add_argument("--db", help="benchmarks.datagen で作成済みのSQLiteファイル（省略時は一時ファイルに生成）")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS),
+                        help="実行するシナリオ（複数指定可、省略時はすべて）")
+    parser.add_argument("--iterations", type=int, default=500, help="シナリオごとの実行回数")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-response-cache", action="store_true", help="未ログインのレスポンスキャッシュを無効にする")
+    parser.add_argument("--output", help="結果をJSONで保存するパス")
+    parser.add_argument("--compare", help="比較する前回の結果（JSON）")
+    parser.add_argument("--threshold", type=float, default=0.2, help="悪化とみなすp95の増加率")
+    args = parser.parse_args()
+    scenarios = args.scenario or list(SCENARIOS)
+
+    if args.db:
+        path = os.path.abspath(args.db)
+    else:
+        path = os.path.join(tempfile.mkdtemp(prefix="fashion_ec_load_bench_"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ["AUTO_MIGRATE"] = "false"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    if args.no_response_cache:
+        os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    migrate("head")
+    if args.db:
+        dataset = {"db": path}
+    else:
+        print(f"データ投入中: ユーザー{args.users:,}人 / 商品{args.products:,}件 / 注文{args.orders:,}件")
+        dataset = generate(path, args.users, args.products, args.orders, args.seed)
+
+    from app.main import app
+    results = asyncio.run(run_all(app, scenarios, args.users, args.iterations, args.concurrency, args.seed))
+
+    for name, r in results.items():
+        print(
+            f"\n■ {name}: {r['requests']:,}リクエスト {r['rps']:,.1f} req/s エラー{r['errors']}件 {r['statuses']}\n"
+            f"  p50 {r['p50_ms']:.3f} ms / p95 {r['p95_ms']:.3f} ms / p99 {r['p99_ms']:.3f} ms"
+            f" / 最大 {r['max_ms']:.3f} ms / SQL {r['queries_per_request']}件/リクエスト"
+        )
+
+    report = {
+        "meta": {
+            "git_revision": git_revision(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+            "dataset": dataset,
+        },
+        "scenarios": results,
+    }
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.threshold)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
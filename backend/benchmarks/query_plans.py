@@ -0,0 +1,159 @@
+# 主要クエリの実行計画と実行時間をインデックス追加前後で比較するベンチマーク
+#
+# 使い方（backendディレクトリで実行）:
+#   python -m benchmarks.query_plans --products 1000000
+#
+# 一時的なSQLiteファイルに初期スキーマ(0001)を作成して大量データを投入し、
+# インデックス追加前 → alembic upgrade head 後の順にクエリを実行する。
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# 計測対象のクエリ（APIと同じ絞り込み・並び順）
+QUERIES = {
+    "get_products (新着順)": (
+        "SELECT id FROM products WHERE is_active = 1 AND status != 'deleted' "
+        "ORDER BY created_at DESC, id DESC LIMIT 100"
+    ),
+    "get_products (価格の安い順)": (
+        "SELECT id FROM products WHERE is_active = 1 AND status != 'deleted' "
+        "ORDER BY price ASC, id ASC LIMIT 100"
+    ),
+    "get_products (カテゴリ絞り込み)": (
+        "SELECT id FROM products WHERE is_active = 1 AND status != 'deleted' AND category_id = 3 "
+        "ORDER BY created_at DESC, id DESC LIMIT 100"
+    ),
+    "get_my_products (出品者)": (
+        "SELECT id FROM products WHERE seller_id = 42 AND status != 'deleted' "
+        "ORDER BY created_at DESC"
+    ),
+    "get_user_orders (注文履歴)": (
+        "SELECT id FROM orders WHERE user_id = 42 ORDER BY created_at DESC, id DESC LIMIT 50"
+    ),
+    "注文明細の読み込み": (
+        "SELECT id FROM order_items WHERE order_id IN (1, 500, 1000, 5000, 10000)"
+    ),
+}
+
+
+def migrate(revision: str):
+    """指定のリビジョンまでマイグレーション"""
+    from alembic import command
+    from alembic.config import Config
+
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    config = Config(os.path.join(backend_dir, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(backend_dir, "migrations"))
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, revision)
+
+
+def seed(path: str, products: int, users: int, orders: int):
+    """ダミーデータを一括投入"""
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+
+    conn.executemany(
+        "INSERT INTO categories (id, name, slug, created_at) VALUES (?, ?, ?, ?)",
+        [(i, f"category-{i}", f"category-{i}", now) for i in range(1, 9)]
+    )
+    conn.executemany(
+        "INSERT INTO users (id, email, username, hashed_password, role, is_active, created_at, updated_at) "
+        "VALUES (?, ?, ?, 'x', 'USER', 1, ?, ?)",
+        ((i, f"user{i}@example.com", f"user{i}", now, now) for i in range(1, users + 1))
+    )
+
+    def product_rows():
+        for i in range(1, products + 1):
+            created = now - timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+            status = rng.choices(["available", "sold", "deleted"], [80, 15, 5])[0]
+            yield (
+                i, f"product {i}", rng.randint(5, 300) * 100, rng.randint(1, 8),
+                rng.randint(1, users), 1, int(status != "deleted"), status, created, created
+            )
+
+    conn.executemany(
+        "INSERT INTO products (id, name, price, category_id, seller_id, stock, is_active, status, "
+        "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        product_rows()
+    )
+
+    def order_rows():
+        for i in range(1, orders + 1):
+            created = now - timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+            yield (i, rng.randint(1, users), 1000, "pending", "address", "name", "000", created, created)
+
+    conn.executemany(
+        "INSERT INTO orders (id, user_id, total_amount, status, shipping_address, shipping_name, "
+        "shipping_phone, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        order_rows()
+    )
+    conn.executemany(
+        "INSERT INTO order_items (order_id, product_id, quantity, price) VALUES (?, ?, 1, 1000)",
+        ((rng.randint(1, orders), rng.randint(1, products)) for _ in range(orders * 2))
+    )
+    conn.commit()
+    conn.close()
+
+
+def measure(path: str, repeat: int) -> dict:
+    """各クエリの実行計画と実行時間（中央値, ミリ秒）"""
+    conn = sqlite3.connect(path)
+    conn.execute("ANALYZE")
+    results = {}
+    for name, sql in QUERIES.items():
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            conn.execute(sql).fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        results[name] = {"plan": plan, "median_ms": round(timings[len(timings) // 2], 3)}
+    conn.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="インデックス追加前後のクエリ実行計画を比較")
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--orders", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="結果をJSONで保存するパス")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="fashion_ec_bench_")
+    path = os.path.join(workdir, "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    migrate("0001")
+    print(f"データ投入中: 商品{args.products:,}件 / ユーザー{args.users:,}人 / 注文{args.orders:,}件")
+    seed(path, args.products, args.users, args.orders)
+
+    before = measure(path, args.repeat)
+    migrate("head")
+    after = measure(path, args.repeat)
+
+    for name in QUERIES:
+        print(f"\n■ {name}")
+        print(f"  インデックスなし: {before[name]['median_ms']:>9.3f} ms  {' / '.join(before[name]['plan'])}")
+        print(f"  インデックスあり: {after[name]['median_ms']:>9.3f} ms  {' / '.join(after[name]['plan'])}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "before": before, "after": after}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
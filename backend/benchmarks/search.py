@@ -0,0 +1,155 @@
+# 商品検索のベンチマーク（全文検索の索引 と LIKE による部分一致の比較）
+#
+# 使い方（backendディレクトリで実行）:
+#   python -m benchmarks.search --products 100000 --products 1000000
+#
+# 最新スキーマまでマイグレーションしたSQLiteファイルを件数ごとに複製し、
+# 商品と索引を一括投入して、同じ検索語でFTS5とLIKEの実行時間を計測する。
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.query_plans import migrate
+
+# 商品名・説明を組み立てる語彙
+ADJECTIVES = ["オーバーサイズ", "ベーシック", "ヴィンテージ", "スリム", "ワイド", "リネン", "ウール", "コットン", "レザー", "デニム"]
+ITEMS = ["パーカー", "Tシャツ", "ジャケット", "スカート", "パンツ", "ワンピース", "スニーカー", "ニット帽", "コート", "シャツ"]
+COLORS = ["黒", "白", "ネイビー", "ベージュ", "グレー", "カーキ", "ブラウン", "赤"]
+
+# 計測する検索語（ヒット件数の多いもの・少ないもの・1文字）
+SEARCH_TERMS = ["パーカー", "ヴィンテージ レザー", "ネイビー", "ワンピース 赤", "帽", "存在しない商品"]
+
+
+def seed(path: str, products: int):
+    """ダミー商品と全文検索の索引を一括投入"""
+    from app.search import ngram_text
+
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.executemany(
+        "INSERT INTO categories (id, name, slug, created_at) VALUES (?, ?, ?, ?)",
+        [(i, f"category-{i}", f"category-{i}", now) for i in range(1, 9)]
+    )
+    conn.execute(
+        "INSERT INTO users (id, email, username, hashed_password, role, is_active, created_at, updated_at) "
+        "VALUES (1, 'seller@example.com', 'seller', 'x', 'USER', 1, ?, ?)",
+        (now, now)
+    )
+
+    rows = []
+    for i in range(1, products + 1):
+        name = f"{rng.choice(ADJECTIVES)}{rng.choice(ITEMS)}"
+        description = f"{rng.choice(COLORS)}の{name}です。サイズ{rng.choice('SML')}"
+        created = now - timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+        rows.append((i, name, description, rng.randint(5, 300) * 100, rng.randint(1, 8), created))
+        if len(rows) == 10_000 or i == products:
+            conn.executemany(
+                "INSERT INTO products (id, name, description, price, category_id, seller_id, stock, "
+                "is_active, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, 1, 1, 1, 'available', ?, ?)",
+                ((*row, row[-1]) for row in rows)
+            )
+            conn.executemany(
+                "INSERT INTO products_fts (rowid, name, description) VALUES (?, ?, ?)",
+                ((row[0], ngram_text(row[1]), ngram_text(row[2])) for row in rows)
+            )
+            rows = []
+    conn.commit()
+    conn.close()
+
+
+def _timed(conn, sql: str, params, repeat: int):
+    """クエリの実行時間（中央値, ミリ秒）とヒット件数"""
+    timings = []
+    rows = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = conn.execute(sql, params).fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return round(timings[len(timings) // 2], 3), len(rows)
+
+
+def measure(path: str, repeat: int, limit: int) -> dict:
+    """検索語ごとにFTS5（関連度順）とLIKE（新着順）を計測"""
+    from app.search import normalize, _fts5_query
+
+    conn = sqlite3.connect(path)
+    results = {}
+    for term in SEARCH_TERMS:
+        words = normalize(term)
+        fts_sql = (
+            "SELECT p.id FROM products p "
+            "JOIN (SELECT rowid AS product_id, bm25(products_fts, 10.0, 1.0) AS rank "
+            "FROM products_fts WHERE products_fts MATCH ?) m ON m.product_id = p.id "
+            "WHERE p.is_active = 1 AND p.status != 'deleted' "
+            "ORDER BY m.rank, p.created_at DESC, p.id DESC LIMIT ?"
+        )
+        like_sql = (
+            "SELECT id FROM products WHERE is_active = 1 AND status != 'deleted' AND "
+            + " AND ".join("(name LIKE ? OR description LIKE ?)" for _ in words)
+            + " ORDER BY created_at DESC, id DESC LIMIT ?"
+        )
+        like_params = [f"%{word}%" for word in words for _ in range(2)] + [limit]
+
+        fts_ms, fts_hits = _timed(conn, fts_sql, (_fts5_query(words), limit), repeat)
+        like_ms, like_hits = _timed(conn, like_sql, like_params, repeat)
+        results[term] = {
+            "fts_median_ms": fts_ms, "fts_hits": fts_hits,
+            "like_median_ms": like_ms, "like_hits": like_hits,
+        }
+    conn.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="全文検索とLIKE検索の実行時間を比較")
+    parser.add_argument("--products", type=int, action="append",
+                        help="商品件数（複数指定可、省略時は10万件と100万件）")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--output", help="結果をJSONで保存するパス")
+    args = parser.parse_args()
+    sizes = args.products or [100_000, 1_000_000]
+
+    workdir = tempfile.mkdtemp(prefix="fashion_ec_search_bench_")
+    template = os.path.join(workdir, "schema.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{template}"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    # エンジンはインポート時に作られるため、マイグレーションは1回だけ行って複製する
+    migrate("head")
+    from app.database import engine
+    engine.dispose()  # 接続を閉じてWALの内容をファイルに反映させてから複製する
+
+    report = {}
+    for size in sizes:
+        path = os.path.join(workdir, f"bench_{size}.db")
+        shutil.copyfile(template, path)
+        print(f"\nデータ投入中: 商品{size:,}件")
+        seed(path, size)
+
+        results = measure(path, args.repeat, args.limit)
+        report[size] = results
+        for term, r in results.items():
+            print(
+                f"  「{term}」 FTS: {r['fts_median_ms']:>9.3f} ms ({r['fts_hits']}件)"
+                f"  LIKE: {r['like_median_ms']:>9.3f} ms ({r['like_hits']}件)"
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "results": report}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# 一覧APIのJSON変換のベンチマーク（1リクエストあたりのCPU時間）
+#
+# 使い方（backendディレクトリで実行、httpxが必要）:
+#   python -m benchmarks.serialization --limit 100 --requests 200
+#
+# 同じクエリ結果を
+#   従来: response_model で検証 → jsonable_encoder → 標準のjson（JSONResponse）
+#   現在: TypeAdapterで1回だけ検証してPydanticで直接JSONに変換
+# の2通りで返し、アプリをASGIで直接呼び出してCPU時間を比較する。
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import List
+
+from benchmarks.query_plans import migrate, seed
+
+
+def add_legacy_routes(app):
+    """比較用に従来の方式で返すエンドポイントを追加"""
+    from fastapi import Depends
+    from fastapi.responses import JSONResponse
+    from sqlalchemy import select
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from app import models, schemas
+    from app.api.products import _product_select
+    from app.database import get_db
+
+    @app.get("/bench/legacy/products", response_model=List[schemas.ProductResponse],
+             response_class=JSONResponse)
+    async def legacy_products(limit: int = 100, db: AsyncSession = Depends(get_db)):
+        result = await db.execute(
+            _product_select().where(
+                models.Product.is_active == True,
+                models.Product.status != "deleted"
+            ).order_by(models.Product.created_at.desc(), models.Product.id.desc()).limit(limit)
+        )
+        return result.scalars().all()
+
+    @app.get("/bench/legacy/users", response_model=List[schemas.UserResponse],
+             response_class=JSONResponse)
+    async def legacy_users(limit: int = 100, db: AsyncSession = Depends(get_db)):
+        result = await db.execute(select(models.User).order_by(models.User.id).limit(limit))
+        return result.scalars().all()
+
+    @app.get("/bench/current/users")
+    async def current_users(limit: int = 100, db: AsyncSession = Depends(get_db)):
+        from app.serialization import list_response
+        result = await db.execute(select(models.User).order_by(models.User.id).limit(limit))
+        return list_response(schemas.UserResponse, result.scalars().all())
+
+
+async def measure(app, url: str, requests: int) -> dict:
+    """1リクエストあたりのCPU時間・経過時間（ミリ秒）とレスポンスサイズ"""
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(10):  # ウォームアップ
+            response = await client.get(url)
+            response.raise_for_status()
+
+        cpu_start = time.process_time()
+        wall = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            response = await client.get(url)
+            wall.append((time.perf_counter() - start) * 1000)
+        cpu_ms = (time.process_time() - cpu_start) * 1000 / requests
+
+    wall.sort()
+    return {
+        "cpu_ms_per_request": round(cpu_ms, 3),
+        "wall_ms_p50": round(wall[len(wall) // 2], 3),
+        "bytes": len(response.content),
+    }
+
+
+async def run_cases(app, cases: dict, requests: int) -> dict:
+    """従来・現在の順に各ケースを計測"""
+    from app.database import async_engine
+
+    results = {}
+    try:
+        for name, (legacy_url, current_url) in cases.items():
+            results[name] = {
+                "legacy": await measure(app, legacy_url, requests),
+                "current": await measure(app, current_url, requests),
+            }
+    finally:
+        # aiosqliteの接続（ワーカースレッド）を閉じないとプロセスが終了しない
+        await async_engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="一覧APIのJSON変換のCPU時間を比較")
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--output", help="結果をJSONで保存するパス")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="fashion_ec_serialization_bench_")
+    path = os.path.join(workdir, "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ["AUTO_MIGRATE"] = "false"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    migrate("head")
+    print(f"データ投入中: 商品{args.products:,}件 / ユーザー{args.users:,}人")
+    seed(path, args.products, args.users, orders=1)
+
+    from app.main import app
+    add_legacy_routes(app)
+
+    cases = {
+        f"商品一覧 {args.limit}件": (
+            f"/bench/legacy/products?limit={args.limit}", f"/api/products?limit={args.limit}"
+        ),
+        f"ユーザー一覧 {args.limit}件": (
+            f"/bench/legacy/users?limit={args.limit}", f"/bench/current/users?limit={args.limit}"
+        ),
+    }
+    results = asyncio.run(run_cases(app, cases, args.requests))
+    for name, result in results.items():
+        print(f"\n■ {name}")
+        for label, r in (("従来", result["legacy"]), ("現在", result["current"])):
+            print(
+                f"  {label}: CPU {r['cpu_ms_per_request']:>8.3f} ms/req"
+                f"  p50 {r['wall_ms_p50']:>8.3f} ms  {r['bytes']:,} bytes"
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
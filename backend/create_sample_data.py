@@ -1,14 +1,15 @@
-from app.database import SessionLocal, engine
-from app.models import Base, Category, Product, User
+from app.database import SessionLocal, run_migrations
+from app.models import Category, Product, ProductFacetCount, User
 from app.auth import get_password_hash
 
-# テーブル作成
-Base.metadata.create_all(bind=engine)
+# テーブル作成（マイグレーション）
+run_migrations()
 
 db = SessionLocal()
 
 # 既存データをクリア（開発環境のみ）
 db.query(Product).delete()
+db.query(ProductFacetCount).delete()
 db.query(Category).delete()
 db.query(User).delete()
 db.commit()
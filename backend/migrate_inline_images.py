@@ -0,0 +1,32 @@
+# 既存商品のBase64画像をファイルに移して image_url を短いURLに置き換える
+from app.database import SessionLocal
+from app.models import Product
+from app.images import ingest_image_url
+
+BATCH_SIZE = 100
+
+db = SessionLocal()
+
+migrated = 0
+last_id = 0
+while True:
+    products = db.query(Product).filter(
+        Product.id > last_id,
+        Product.image_url.like("data:%")
+    ).order_by(Product.id).limit(BATCH_SIZE).all()
+    if not products:
+        break
+
+    for product in products:
+        try:
+            product.image_url = ingest_image_url(product.image_url)
+            migrated += 1
+        except Exception as e:
+            print(f"商品ID {product.id} の画像を変換できませんでした: {e}")
+        last_id = product.id
+
+    db.commit()
+
+db.close()
+
+print(f"✅ {migrated}件の画像を移行しました")
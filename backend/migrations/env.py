@@ -0,0 +1,54 @@
+# Alembicの実行環境
+from logging.config import fileConfig
+from alembic import context
+from app.database import DATABASE_URL, engine, Base
+from app import models  # noqa: F401  モデルをBase.metadataに登録
+
+config = context.config
+
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+# モデルで管理していないテーブル（全文検索の索引、FTS5の内部テーブル）
+UNMANAGED_TABLE_PREFIXES = ("products_fts", "product_search")
+
+
+def include_name(name, type_, parent_names):
+    """autogenerateの比較対象から管理外のテーブルを除く"""
+    if type_ == "table":
+        return not name.startswith(UNMANAGED_TABLE_PREFIXES)
+    return True
+
+
+def run_migrations_offline():
+    """SQLを出力するだけのモード（alembic upgrade --sql）"""
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        include_name=include_name,
+        render_as_batch=DATABASE_URL.startswith("sqlite"),
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    """DBに接続してマイグレーションを実行"""
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_name=include_name,
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
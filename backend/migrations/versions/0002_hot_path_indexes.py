@@ -0,0 +1,42 @@
+"""商品一覧・出品者ページ・注文履歴のインデックス
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+# (インデックス名, テーブル, カラム)
+INDEXES = [
+    # 商品一覧（get_products）の新着順・価格順・カテゴリ絞り込み
+    ("ix_products_active_created", "products", ["is_active", "created_at", "id"]),
+    ("ix_products_active_price", "products", ["is_active", "price", "id"]),
+    ("ix_products_category_active_created", "products", ["category_id", "is_active", "created_at", "id"]),
+    # 出品者ごとの商品（get_user_products / get_my_products）
+    ("ix_products_seller_created", "products", ["seller_id", "created_at"]),
+    # 注文履歴（get_user_orders）
+    ("ix_orders_user_created", "orders", ["user_id", "created_at", "id"]),
+    # 注文明細の読み込み（注文IDで取得）
+    ("ix_order_items_order_id", "order_items", ["order_id"]),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        # create_allで既に作成されている場合はスキップ
+        existing = {index["name"] for index in inspector.get_indexes(table)}
+        if name not in existing:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
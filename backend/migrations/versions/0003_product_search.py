@@ -0,0 +1,88 @@
+"""商品の全文検索用の索引（SQLite: FTS5 / PostgreSQL: tsvector + GIN）
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+import re
+import unicodedata
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+#-------------------------------------------------------
+# このリビジョン時点のbi-gram分割（app.search の変更の影響を受けないよう固定したコピー）
+#-------------------------------------------------------
+_WORD_SPLIT = re.compile(r"[^\w]+|_+")
+
+
+def _normalize(text_value):
+    if not text_value:
+        return []
+    normalized = unicodedata.normalize("NFKC", text_value).lower()
+    return [word for word in _WORD_SPLIT.split(normalized) if word]
+
+
+def _word_bigrams(word):
+    if len(word) == 1:
+        return [word]
+    return [word[i:i + 2] for i in range(len(word) - 1)]
+
+
+def ngram_text(text_value):
+    return " ".join(gram for word in _normalize(text_value) for gram in _word_bigrams(word))
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.execute(
+            "CREATE TABLE product_search ("
+            "product_id INTEGER PRIMARY KEY REFERENCES products(id) ON DELETE CASCADE, "
+            "document TSVECTOR NOT NULL)"
+        )
+        op.execute("CREATE INDEX ix_product_search_document ON product_search USING gin (document)")
+        insert_sql = sa.text(
+            "INSERT INTO product_search (product_id, document) VALUES (:id, "
+            "setweight(to_tsvector('simple', :name), 'A') || "
+            "setweight(to_tsvector('simple', :description), 'B'))"
+        )
+    else:
+        op.execute("CREATE VIRTUAL TABLE products_fts USING fts5(name, description)")
+        insert_sql = sa.text(
+            "INSERT INTO products_fts (rowid, name, description) VALUES (:id, :name, :description)"
+        )
+
+    # 既存の商品を索引に登録
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.text(
+                "SELECT id, name, description FROM products "
+                "WHERE id > :last_id AND is_active = :active AND status != 'deleted' "
+                "ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "active": True, "limit": BATCH_SIZE}
+        ).fetchall()
+        if not rows:
+            break
+        bind.execute(insert_sql, [
+            {"id": row.id, "name": ngram_text(row.name), "description": ngram_text(row.description)}
+            for row in rows
+        ])
+        last_id = rows[-1].id
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("DROP TABLE product_search")
+    else:
+        op.execute("DROP TABLE products_fts")
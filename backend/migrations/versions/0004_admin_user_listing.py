@@ -0,0 +1,24 @@
+"""管理画面のユーザー一覧のインデックス
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = {index["name"] for index in sa.inspect(op.get_bind()).get_indexes("users")}
+    if "ix_users_role_active_id" not in existing:
+        op.create_index("ix_users_role_active_id", "users", ["role", "is_active", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_users_role_active_id", table_name="users")
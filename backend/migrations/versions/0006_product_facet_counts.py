@@ -0,0 +1,47 @@
+"""商品の件数集計テーブル（カテゴリ・価格帯ごとの件数）
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if "product_facet_counts" in sa.inspect(op.get_bind()).get_table_names():
+        return
+
+    op.create_table(
+        "product_facet_counts",
+        sa.Column("category_id", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("price_bucket", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("status", sa.String(50), primary_key=True),
+        sa.Column("count", sa.Integer(), nullable=False),
+    )
+    # 既存の商品から初期値を作る（以降は app.facets が差分で更新する）
+    op.execute(
+        """
+        INSERT INTO product_facet_counts (category_id, price_bucket, status, count)
+        SELECT COALESCE(category_id, 0),
+               CASE WHEN price <= 3000 THEN 0
+                    WHEN price <= 5000 THEN 1
+                    WHEN price <= 10000 THEN 2
+                    ELSE 3 END,
+               status,
+               COUNT(*)
+        FROM products
+        WHERE is_active AND status != 'deleted'
+        GROUP BY 1, 2, 3
+        """
+    )
+
+
+def downgrade():
+    op.drop_table("product_facet_counts")
@@ -0,0 +1,55 @@
+"""出品者の受注一覧（注文明細に出品者・対応状況を追加）
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+# (インデックス名, カラム)
+INDEXES = [
+    ("ix_order_items_seller_id", ["seller_id", "id"]),
+    ("ix_order_items_seller_status_id", ["seller_id", "status", "id"]),
+    ("ix_order_items_product_id", ["product_id"]),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    columns = {column["name"] for column in inspector.get_columns("order_items")}
+    if "seller_id" not in columns:
+        # SQLiteでは外部キー付きの列を追加できないため、batchモード（テーブルの作り直し）で追加する
+        with op.batch_alter_table("order_items") as batch:
+            batch.add_column(sa.Column("seller_id", sa.Integer()))
+            batch.create_foreign_key("fk_order_items_seller_id_users", "users", ["seller_id"], ["id"])
+        # 既存の明細は商品の出品者で埋める
+        op.execute(
+            "UPDATE order_items SET seller_id = "
+            "(SELECT seller_id FROM products WHERE products.id = order_items.product_id)"
+        )
+    if "status" not in columns:
+        op.add_column(
+            "order_items",
+            sa.Column("status", sa.String(50), nullable=False, server_default="pending")
+        )
+
+    existing = {index["name"] for index in inspector.get_indexes("order_items")}
+    for name, index_columns in INDEXES:
+        if name not in existing:
+            op.create_index(name, "order_items", index_columns)
+
+
+def downgrade():
+    for name, _ in reversed(INDEXES):
+        op.drop_index(name, table_name="order_items")
+    with op.batch_alter_table("order_items") as batch:
+        batch.drop_constraint("fk_order_items_seller_id_users", type_="foreignkey")
+        batch.drop_column("status")
+        batch.drop_column("seller_id")
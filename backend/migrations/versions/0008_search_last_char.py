@@ -0,0 +1,81 @@
+"""全文検索の索引に単語の最後の文字を追加（1文字の検索で語末の文字に一致させる）
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+import re
+import unicodedata
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+#-------------------------------------------------------
+# このリビジョン時点の分割（app.search の変更の影響を受けないよう固定したコピー）
+#-------------------------------------------------------
+_WORD_SPLIT = re.compile(r"[^\w]+|_+")
+
+
+def _normalize(text_value):
+    if not text_value:
+        return []
+    normalized = unicodedata.normalize("NFKC", text_value).lower()
+    return [word for word in _WORD_SPLIT.split(normalized) if word]
+
+
+def _index_grams(word):
+    """bi-gramと、1文字検索用に単語の最後の文字"""
+    if len(word) == 1:
+        return [word]
+    return [word[i:i + 2] for i in range(len(word) - 1)] + [word[-1]]
+
+
+def ngram_text(text_value):
+    return " ".join(gram for word in _normalize(text_value) for gram in _index_grams(word))
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        update_sql = sa.text(
+            "UPDATE product_search SET document = "
+            "setweight(to_tsvector('simple', :name), 'A') || "
+            "setweight(to_tsvector('simple', :description), 'B') "
+            "WHERE product_id = :id"
+        )
+    else:
+        update_sql = sa.text(
+            "UPDATE products_fts SET name = :name, description = :description WHERE rowid = :id"
+        )
+
+    # 索引に登録済みの商品を新しい形式で登録し直す
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.text(
+                "SELECT id, name, description FROM products "
+                "WHERE id > :last_id AND is_active = :active AND status != 'deleted' "
+                "ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "active": True, "limit": BATCH_SIZE}
+        ).fetchall()
+        if not rows:
+            break
+        bind.execute(update_sql, [
+            {"id": row.id, "name": ngram_text(row.name), "description": ngram_text(row.description)}
+            for row in rows
+        ])
+        last_id = rows[-1].id
+
+
+def downgrade():
+    # 追加した1文字のgramは以前の検索式でも害がないため、索引はそのまま残す
+    pass
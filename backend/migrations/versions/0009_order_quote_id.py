@@ -0,0 +1,32 @@
+"""見積もりの使用済み管理（注文に見積もりIDを保存）
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    columns = {column["name"] for column in inspector.get_columns("orders")}
+    if "quote_id" not in columns:
+        op.add_column("orders", sa.Column("quote_id", sa.String(32)))
+
+    existing = {index["name"] for index in inspector.get_indexes("orders")}
+    if "ix_orders_quote_id" not in existing:
+        # NULL（見積もりを使わない注文）は重複してよい
+        op.create_index("ix_orders_quote_id", "orders", ["quote_id"], unique=True)
+
+
+def downgrade():
+    op.drop_index("ix_orders_quote_id", table_name="orders")
+    with op.batch_alter_table("orders") as batch:
+        batch.drop_column("quote_id")
@@ -0,0 +1,103 @@
+# テストの共通設定
+#
+# DATABASE_URL を指定しなければ一時ディレクトリのSQLiteで実行する。
+# PostgreSQLで実行する場合は DATABASE_URL にテスト用のDBを指定する
+# （テストのデータは一意な名前で作成し、既存のデータは削除しない）。
+import os
+import tempfile
+import uuid
+
+_tmp_dir = tempfile.mkdtemp(prefix="fashion-ec-test-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp_dir}/test.db")
+os.environ.setdefault("IMAGE_STORAGE_DIR", os.path.join(_tmp_dir, "images"))
+os.environ.setdefault("SLOW_QUERY_LOG_PATH", os.path.join(_tmp_dir, "slow_queries.log"))
+# ジョブはテストから明示的に実行する
+os.environ["JOB_WORKERS"] = "0"
+# キャッシュ・計測のミドルウェアを通さずにアプリの結果を確認する
+os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+os.environ["METRICS_ENABLED"] = "false"
+
+import pytest
+from fastapi.testclient import TestClient
+from app import auth, models
+from app.database import SessionLocal
+from app.main import app
+
+# ユーザー作成のたびにbcryptを計算しないよう、ハッシュは1回だけ作る
+PASSWORD = "password"
+_password_hash = auth.get_password_hash(PASSWORD)
+
+
+@pytest.fixture(scope="session")
+def client():
+    """起動処理込みのテストクライアント（全テストで同じイベントループを使う）"""
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def make_user(db):
+    """ユーザーを作成して (ユーザー, 認証ヘッダー) を返す"""
+    def make(role: str = "user"):
+        name = f"test-{uuid.uuid4().hex[:12]}"
+        user = models.User(
+            email=f"{name}@example.com", username=name, hashed_password=_password_hash, role=role
+        )
+        db.add(user)
+        db.commit()
+        token = auth.create_access_token({"sub": user.username, "user_id": user.id})
+        return user, {"Authorization": f"Bearer {token}"}
+    return make
+
+
+@pytest.fixture
+def make_category(db):
+    """一意な名前のカテゴリを作成"""
+    def make():
+        name = f"test-{uuid.uuid4().hex[:12]}"
+        category = models.Category(name=name, slug=name)
+        db.add(category)
+        db.commit()
+        return category
+    return make
+
+
+@pytest.fixture
+def category(make_category):
+    return make_category()
+
+
+@pytest.fixture
+def make_product(db, category):
+    """出品者の商品を作成"""
+    def make(seller, **values):
+        product = models.Product(
+            name=values.pop("name", f"商品-{uuid.uuid4().hex[:8]}"),
+            description=values.pop("description", "テスト用の商品"),
+            price=values.pop("price", 1000),
+            stock=values.pop("stock", 1),
+            category_id=values.pop("category_id", category.id),
+            seller_id=seller.id,
+            **values,
+        )
+        db.add(product)
+        db.commit()
+        return product
+    return make
+
+
+def order_payload(*items) -> dict:
+    """注文のリクエスト本文（items は (商品ID, 数量)）"""
+    return {
+        "items": [{"product_id": product_id, "quantity": quantity} for product_id, quantity in items],
+        "shipping_name": "テスト 太郎",
+        "shipping_phone": "090-0000-0000",
+        "shipping_address": "東京都千代田区1-1-1",
+    }
@@ -0,0 +1,100 @@
+# テスト用のRedisクライアント（RedisBackend が使うコマンドだけをメモリ上で再現する）
+import fnmatch
+from typing import Callable, Dict, Optional, Set, Union
+
+
+class FakeRedis:
+    """redis.asyncio.Redis の代わり（期限は渡された時計で判定する）"""
+
+    def __init__(self, clock: Callable[[], float]):
+        self.clock = clock
+        self._values: Dict[str, Union[bytes, Set[bytes]]] = {}
+        self._expires: Dict[str, float] = {}
+
+    @staticmethod
+    def _bytes(value) -> bytes:
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def _alive(self, key: str) -> bool:
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at <= self.clock():
+            self._values.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._values
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._values[key] if self._alive(key) else None
+
+    async def set(self, key: str, value, ex: Optional[int] = None):
+        self._values[key] = self._bytes(value)
+        self._expires.pop(key, None)
+        if ex is not None:
+            self._expires[key] = self.clock() + ex
+
+    async def sadd(self, key: str, *members):
+        if not self._alive(key):
+            self._values[key] = set()
+        self._values[key].update(self._bytes(member) for member in members)
+
+    async def expire(self, key: str, seconds: int, nx: bool = False, gt: bool = False):
+        if not self._alive(key):
+            return False
+        current = self._expires.get(key)
+        expires_at = self.clock() + seconds
+        # NX: 期限がない場合だけ / GT: 今の期限より長い場合だけ（期限なしは無限として扱う）
+        if nx and current is not None:
+            return False
+        if gt and (current is None or expires_at <= current):
+            return False
+        self._expires[key] = expires_at
+        return True
+
+    async def sunion(self, keys) -> Set[bytes]:
+        members = set()
+        for key in keys:
+            if self._alive(key):
+                members.update(self._values[key])
+        return members
+
+    async def delete(self, *keys):
+        deleted = 0
+        for key in keys:
+            key = key.decode() if isinstance(key, bytes) else key
+            if self._alive(key):
+                deleted += 1
+            self._values.pop(key, None)
+            self._expires.pop(key, None)
+        return deleted
+
+    async def scan_iter(self, match: str = "*"):
+        for key in list(self._values):
+            if self._alive(key) and fnmatch.fnmatchcase(key, match):
+                yield key.encode()
+
+    def pipeline(self, transaction: bool = True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """コマンドをためて execute() でまとめて実行する"""
+
+    def __init__(self, redis: FakeRedis):
+        self._redis = redis
+        self._commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._commands = []
+
+    def __getattr__(self, name):
+        command = getattr(self._redis, name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((command, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self):
+        return [await command(*args, **kwargs) for command, args, kwargs in self._commands]
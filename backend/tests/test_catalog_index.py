@@ -0,0 +1,127 @@
+# カタログ索引（numpy）の一覧がSQLの一覧と同じ商品・同じ並び・同じカーソルになること
+from datetime import datetime, timedelta
+import pytest
+from app.catalog_index import catalog_index
+from app.jobs import job_queue
+from .conftest import order_payload
+
+pytest.importorskip("numpy")
+
+PAGE_SIZE = 3
+SORTS = ["newest", "oldest", "price_asc", "price_desc"]
+FILTERS = [
+    {},
+    {"min_price": 1000},
+    {"max_price": 2000},
+    {"min_price": 1000, "max_price": 2500},
+    {"status": "available"},
+    {"status": "sold"},
+]
+
+
+@pytest.fixture
+def catalog(make_user, make_product, category):
+    """価格・登録日時が重なる商品（売り切れ・削除・非公開を含む）と出品者の (ユーザー, 認証ヘッダー)"""
+    sellers = [make_user(), make_user()]
+    base = datetime(2024, 1, 1, 12, 0, 0)
+    products = []
+    for i, (price, minutes) in enumerate([
+        (500, 0), (1000, 1), (1000, 1), (1000, 2), (1500, 3),
+        (2000, 3), (2000, 4), (2500, 5), (3000, 5), (1200, 6),
+    ]):
+        products.append(make_product(
+            sellers[i % 2][0], price=price, stock=2,
+            created_at=base + timedelta(minutes=minutes, microseconds=250 * (i % 3)),
+        ))
+    make_product(sellers[0][0], price=1000, stock=0, status="sold", created_at=base + timedelta(minutes=2))
+    make_product(sellers[1][0], price=2000, stock=0, status="sold", created_at=base + timedelta(minutes=4))
+    make_product(sellers[0][0], price=1000, status="deleted", is_active=False, created_at=base)
+    make_product(sellers[1][0], price=1500, is_active=False, created_at=base)
+    return sellers, products
+
+
+@pytest.fixture
+def index(client, catalog, monkeypatch):
+    """商品を作成した後にアプリの索引を有効にして作り直す（テスト後に元の状態に戻す）"""
+    for name in ("enabled", "_columns", "_category_ids", "queries", "fallbacks"):
+        monkeypatch.setattr(catalog_index, name, getattr(catalog_index, name))
+    catalog_index.enabled = True
+    client.portal.call(catalog_index.build)
+    return catalog_index
+
+
+def _pages(client, params):
+    """X-Next-Cursor をたどって全ページの (商品ID, 次のカーソル) を取得"""
+    pages, cursor = [], None
+    while True:
+        query = dict(params, limit=PAGE_SIZE)
+        if cursor:
+            query["cursor"] = cursor
+        response = client.get("/api/products", params=query)
+        assert response.status_code == 200, response.text
+        cursor = response.headers.get("x-next-cursor")
+        pages.append(([p["id"] for p in response.json()], cursor))
+        if not cursor:
+            return pages
+
+
+def assert_matches_sql(client, index, category):
+    for sort in SORTS:
+        for filters in FILTERS:
+            for category_filter in ({"category_id": category.id}, {"category": category.slug}):
+                params = {"sort": sort, **category_filter, **filters}
+                index.enabled = False
+                try:
+                    expected = _pages(client, params)
+                finally:
+                    index.enabled = True
+                queries = index.queries
+                actual = _pages(client, params)
+                assert index.queries == queries + len(actual), params
+                assert actual == expected, params
+
+
+def test_query_matches_sql(client, catalog, index, category):
+    _, products = catalog
+    assert_matches_sql(client, index, category)
+    # 空でない結果を比べていること
+    listed = _pages(client, {"category_id": category.id, "sort": "newest"})
+    assert sum(len(ids) for ids, _ in listed) == len(products) + 2
+
+
+def test_query_matches_sql_after_updates(client, catalog, index, category, make_user):
+    sellers, products = catalog
+    seller_headers = {seller.id: headers for seller, headers in sellers}
+    _, buyer_headers = make_user()
+    _, admin_headers = make_user("admin")
+
+    # 追加（upsert）
+    response = client.post("/api/products", json={
+        "name": "追加した商品", "price": 1000, "category_id": category.id, "stock": 1,
+    }, headers=sellers[0][1])
+    assert response.status_code == 200, response.text
+    assert_matches_sql(client, index, category)
+
+    # 価格の変更（upsert・価格順の作り直し）
+    product = products[4]
+    response = client.put(f"/api/products/{product.id}", json={"price": 2000}, headers=seller_headers[product.seller_id])
+    assert response.status_code == 200, response.text
+    assert_matches_sql(client, index, category)
+
+    # 注文で売り切れ（upsert・販売状況の変更）
+    response = client.post("/api/orders/", json=order_payload((products[1].id, 2)), headers=buyer_headers)
+    assert response.status_code == 200, response.text
+    assert_matches_sql(client, index, category)
+
+    # 削除（remove）
+    product = products[2]
+    response = client.delete(f"/api/products/{product.id}", headers=seller_headers[product.seller_id])
+    assert response.status_code == 200, response.text
+    assert_matches_sql(client, index, category)
+
+    # 出品者の削除（remove_seller。商品の論理削除はジョブの実行後にSQLへ反映される）
+    response = client.delete(f"/api/admin/users/{sellers[1][0].id}", headers=admin_headers)
+    assert response.status_code == 200, response.text
+    while client.portal.call(job_queue.run_once):
+        pass
+    assert_matches_sql(client, index, category)
@@ -0,0 +1,57 @@
+# 商品画像の保存（拡張子は画像データの形式から決める）
+import base64
+import io
+import os
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+from app.images import image_path, ingest_image_url, store_image
+
+
+def _image_bytes(image_format: str, color=(200, 30, 30)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), color).save(buffer, image_format)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("image_format, mime, ext", [
+    ("PNG", "image/png", "png"),
+    ("JPEG", "image/jpeg", "jpg"),
+    ("JPEG", "image/jpg", "jpg"),
+    ("WEBP", "image/webp", "webp"),
+    ("GIF", "image/gif", "gif"),
+])
+def test_store_image_uses_detected_format(image_format, mime, ext):
+    url = store_image(_image_bytes(image_format), mime)
+    name = url.rsplit("/", 1)[-1]
+    assert name.endswith(f".{ext}")
+    assert os.path.exists(image_path(name))
+
+
+@pytest.mark.parametrize("image_format, mime", [
+    ("PNG", "image/jpeg"),
+    ("JPEG", "image/png"),
+    ("GIF", "image/webp"),
+])
+def test_store_image_rejects_mismatched_declared_type(image_format, mime):
+    data = _image_bytes(image_format, color=(1, 2, 3))
+    with pytest.raises(HTTPException) as error:
+        store_image(data, mime)
+    assert error.value.status_code == 400
+
+
+def test_store_image_rejects_unsupported_and_broken_data():
+    with pytest.raises(HTTPException):
+        store_image(_image_bytes("BMP"), "image/png")
+    with pytest.raises(HTTPException):
+        store_image(b"not an image", "image/png")
+    with pytest.raises(HTTPException):
+        store_image(_image_bytes("PNG"), "image/tiff")
+
+
+def test_ingest_data_uri():
+    data = base64.b64encode(_image_bytes("PNG", color=(4, 5, 6))).decode()
+    assert ingest_image_url(f"data:image/png;base64,{data}").endswith(".png")
+    with pytest.raises(HTTPException):
+        ingest_image_url(f"data:image/jpeg;base64,{data}")
+    assert ingest_image_url("https://example.com/a.jpg") == "https://example.com/a.jpg"
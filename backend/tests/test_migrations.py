@@ -0,0 +1,40 @@
+# マイグレーション（アプリのコードが変わっても結果が変わらないこと）
+import importlib.util
+import os
+
+VERSIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations", "versions")
+
+
+def _load_revision(filename: str):
+    spec = importlib.util.spec_from_file_location(f"migration_{filename[:4]}", os.path.join(VERSIONS_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_0003_tokenizer_is_frozen():
+    migration = _load_revision("0003_product_search.py")
+    # 0003 の時点の索引はbi-gramのみ（語末の1文字は含まない）
+    assert migration.ngram_text("革靴 商品") == "革靴 商品"
+    assert migration.ngram_text("黒い本革靴") == "黒い い本 本革 革靴"
+    assert migration.ngram_text("ＡＢＣ_Def") == "ab bc de ef"
+    assert migration.ngram_text("靴") == "靴"
+    assert migration.ngram_text(None) == ""
+
+
+def test_0008_tokenizer_is_frozen():
+    migration = _load_revision("0008_search_last_char.py")
+    # 0008 で各単語の最後の文字を追加
+    assert migration.ngram_text("革靴 商品") == "革靴 靴 商品 品"
+    assert migration.ngram_text("黒い本革靴") == "黒い い本 本革 革靴 靴"
+    assert migration.ngram_text("ＡＢＣ_Def") == "ab bc c de ef f"
+    assert migration.ngram_text("靴") == "靴"
+    assert migration.ngram_text(None) == ""
+
+
+def test_0008_matches_current_tokenizer():
+    # app.search の分割を変えた場合は、索引を作り直す新しいリビジョンを追加してこのテストを更新する
+    from app.search import ngram_text
+    migration = _load_revision("0008_search_last_char.py")
+    for value in ("革靴 商品", "黒い本革靴、テスト", "ＡＢＣ_Def ghi-j", "x", "", None):
+        assert migration.ngram_text(value) == ngram_text(value)
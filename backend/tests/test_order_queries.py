@@ -0,0 +1,85 @@
+# 注文履歴・注文詳細のSQLの数が注文・明細の数に関係なく一定であること（N+1がないこと）
+import httpx
+from app import models
+from app.main import app
+from app.metrics import RequestStats, current_request
+
+HISTORY_ORDERS = 50
+ITEMS_PER_ORDER = 3
+
+
+class QueryCounter:
+    """リクエストごとのSQLの数を記録するASGIラッパー（metrics.current_request を使う）"""
+
+    def __init__(self, app):
+        self.app = app
+        self.queries = []
+
+    async def __call__(self, scope, receive, send):
+        stats = RequestStats()
+        token = current_request.set(stats)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_request.reset(token)
+            if scope["type"] == "http":
+                self.queries.append(stats.queries)
+
+
+async def _get(path, headers):
+    counter = QueryCounter(app)
+    transport = httpx.ASGITransport(app=counter)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        response = await http.get(path, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json(), counter.queries[-1]
+
+
+def _seed_orders(db, buyer, products, count: int, items_per_order: int):
+    orders = []
+    for _ in range(count):
+        order = models.Order(
+            user_id=buyer.id, total_amount=0, shipping_name="テスト 太郎",
+            shipping_phone="090-0000-0000", shipping_address="東京都千代田区1-1-1"
+        )
+        for product in products[:items_per_order]:
+            order.order_items.append(models.OrderItem(
+                product_id=product.id, seller_id=product.seller_id, quantity=1, price=product.price
+            ))
+            order.total_amount += product.price
+        orders.append(order)
+    db.add_all(orders)
+    db.commit()
+    return orders
+
+
+def _count_queries(client, buyer_headers, order_id):
+    # 認証済みユーザーのキャッシュに載せてから数える
+    client.portal.call(_get, "/api/orders/", buyer_headers)
+    history, history_queries = client.portal.call(_get, "/api/orders/", buyer_headers)
+    detail, detail_queries = client.portal.call(_get, f"/api/orders/{order_id}", buyer_headers)
+    return history, history_queries, detail, detail_queries
+
+
+def test_order_queries_do_not_grow_with_history(client, db, make_user, make_product):
+    seller, _ = make_user()
+    products = [make_product(seller, stock=100) for _ in range(ITEMS_PER_ORDER)]
+
+    small_buyer, small_headers = make_user()
+    small_order, = _seed_orders(db, small_buyer, products, 1, 1)
+    large_buyer, large_headers = make_user()
+    large_orders = _seed_orders(db, large_buyer, products, HISTORY_ORDERS, ITEMS_PER_ORDER)
+
+    history, small_history, _, small_detail = _count_queries(client, small_headers, small_order.id)
+    assert len(history) == 1
+
+    history, large_history, detail, large_detail = _count_queries(client, large_headers, large_orders[0].id)
+    assert len(history) == HISTORY_ORDERS
+    assert all(len(order["order_items"]) == ITEMS_PER_ORDER for order in history)
+    assert all(item["product"]["category"] for order in history for item in order["order_items"])
+    assert len(detail["order_items"]) == ITEMS_PER_ORDER
+
+    assert large_history == small_history
+    assert large_detail == small_detail
+    # 注文と、明細（商品・カテゴリをJOIN）の2回
+    assert large_history <= 2 and large_detail <= 2
@@ -0,0 +1,57 @@
+# スロークエリログ・リクエストのプロファイルにSQLのパラメータの値を書き出さないこと
+import uuid
+import httpx
+import pytest
+from app import profiling
+from app.main import app
+
+
+class CapturingLogger:
+    def __init__(self):
+        self.records = []
+
+    def warning(self, message, extra=None):
+        self.records.append((message, extra))
+
+
+@pytest.fixture
+def slow_log(monkeypatch):
+    logger = CapturingLogger()
+    monkeypatch.setattr(profiling, "slow_query_logger", lambda: logger)
+    # すべてのSQL・リクエストを遅いものとして記録する（実行計画は取らない）
+    monkeypatch.setattr(profiling, "SQL_SLOW_QUERY_MS", 1e-9)
+    monkeypatch.setattr(profiling, "SQL_EXPLAIN_MS", float("inf"))
+    return logger
+
+
+def _login(client, email):
+    async def post():
+        transport = httpx.ASGITransport(app=profiling.ProfilingMiddleware(app))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await http.post("/api/auth/login", data={"username": email, "password": "x"})
+    return client.portal.call(post)
+
+
+def test_slow_query_log_records_parameter_types_only(client, slow_log):
+    email = f"secret-{uuid.uuid4().hex}@example.com"
+    response = client.post("/api/auth/login", data={"username": email, "password": "x"})
+    assert response.status_code == 401
+
+    assert slow_log.records
+    assert email not in repr(slow_log.records)
+    logged = [extra["parameters"] for message, extra in slow_log.records if "users" in extra["sql"]]
+    assert any("str" in parameters["types"] for parameters in logged)
+
+
+def test_request_profile_logs_values_only_when_enabled(client, slow_log, monkeypatch):
+    monkeypatch.setattr(profiling, "SQL_PROFILE_ENABLED", True)
+    email = f"secret-{uuid.uuid4().hex}@example.com"
+    assert _login(client, email).status_code == 401
+    profiles = [extra for message, extra in slow_log.records if message == "request profile"]
+    assert len(profiles) == 1
+    assert profiles[0]["statements"]
+    assert email not in repr(profiles[0])
+
+    monkeypatch.setattr(profiling, "SQL_PROFILE_LOG_PARAMETERS", True)
+    assert _login(client, email).status_code == 401
+    assert email in repr(slow_log.records[-1])
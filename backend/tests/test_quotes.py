@@ -0,0 +1,94 @@
+# カートの見積もり（発行したユーザーだけが1回だけ注文に使えること）
+import asyncio
+import httpx
+from app import models
+from app.main import app
+from .conftest import order_payload
+
+PARALLEL_ORDERS = 10
+
+
+def _quote(client, product_id, quantity, headers=None):
+    response = client.post("/api/cart/quote", json={
+        "items": [{"product_id": product_id, "quantity": quantity}],
+    }, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _order_with_quote(product_id, quantity, quote):
+    return {**order_payload((product_id, quantity)), "quote": quote}
+
+
+def test_quote_is_issued_only_to_logged_in_users(client, make_user, make_product):
+    seller, _ = make_user()
+    _, buyer_headers = make_user()
+    product = make_product(seller, stock=3)
+
+    anonymous = _quote(client, product.id, 1)
+    assert anonymous["purchasable"] is True
+    assert anonymous["quote"] is None
+    assert _quote(client, product.id, 1, buyer_headers)["quote"]
+
+
+def test_quote_can_be_used_once(client, db, make_user, make_product):
+    seller, _ = make_user()
+    _, buyer_headers = make_user()
+    product = make_product(seller, price=1000, stock=3)
+    quote = _quote(client, product.id, 1, buyer_headers)["quote"]
+
+    # 見積もり後の値上げは見積もりの価格で注文できる
+    product.price = 1500
+    db.commit()
+    response = client.post("/api/orders/", json=_order_with_quote(product.id, 1, quote), headers=buyer_headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["total_amount"] == 1000
+
+    response = client.post("/api/orders/", json=_order_with_quote(product.id, 1, quote), headers=buyer_headers)
+    assert response.status_code == 409
+    assert response.json()["detail"] == "この見積もりは使用済みです。カートを更新してください"
+
+    db.expire_all()
+    assert db.get(models.Product, product.id).stock == 2
+
+
+def test_quote_of_another_user_is_rejected(client, db, make_user, make_product):
+    seller, _ = make_user()
+    _, buyer_headers = make_user()
+    _, other_headers = make_user()
+    product = make_product(seller, stock=3)
+    quote = _quote(client, product.id, 1, buyer_headers)["quote"]
+
+    response = client.post("/api/orders/", json=_order_with_quote(product.id, 1, quote), headers=other_headers)
+    assert response.status_code == 403
+
+    # 断られた注文は見積もりを使用済みにしない
+    response = client.post("/api/orders/", json=_order_with_quote(product.id, 1, quote), headers=buyer_headers)
+    assert response.status_code == 200, response.text
+
+
+async def _place_orders_concurrently(payload, headers, count):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        return await asyncio.gather(*(
+            http.post("/api/orders/", json=payload, headers=headers) for _ in range(count)
+        ))
+
+
+def test_parallel_orders_with_same_quote(client, db, make_user, make_product):
+    seller, _ = make_user()
+    buyer, buyer_headers = make_user()
+    product = make_product(seller, stock=PARALLEL_ORDERS)
+    quote = _quote(client, product.id, 1, buyer_headers)["quote"]
+
+    responses = client.portal.call(
+        _place_orders_concurrently, _order_with_quote(product.id, 1, quote), buyer_headers, PARALLEL_ORDERS
+    )
+
+    statuses = [response.status_code for response in responses]
+    assert statuses.count(200) == 1, statuses
+    assert statuses.count(409) == PARALLEL_ORDERS - 1, statuses
+
+    db.expire_all()
+    assert db.get(models.Product, product.id).stock == PARALLEL_ORDERS - 1
+    assert db.query(models.Order).filter(models.Order.user_id == buyer.id).count() == 1
@@ -0,0 +1,241 @@
+# 未ログインの閲覧のレスポンスキャッシュ（プロセス内のLRU・Redisの両方で同じテストを実行する）
+import asyncio
+from types import SimpleNamespace
+import httpx
+import pytest
+from app import response_cache as response_cache_module
+from app.catalog_index import catalog_index
+from app.main import app
+from app.response_cache import MemoryBackend, RedisBackend, ResponseCacheMiddleware, response_cache
+from .conftest import order_payload
+from .fake_redis import FakeRedis
+
+TTL = 10
+STALE_TTL = 20
+
+
+class FakeClock:
+    """キャッシュの期限判定に使う時計（テストから進める）"""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture(params=["memory", "redis"])
+def cache(request, client, monkeypatch):
+    """アプリの response_cache を有効にし、保存先をテスト用に差し替える"""
+    clock = FakeClock()
+    monkeypatch.setattr(response_cache_module, "time", SimpleNamespace(time=clock))
+    if request.param == "redis":
+        backend = RedisBackend(client=FakeRedis(clock), prefix="test:response_cache:")
+    else:
+        backend = MemoryBackend(max_entries=1000, max_bytes=16 * 1024 * 1024)
+    monkeypatch.setattr(response_cache, "backend", backend)
+    monkeypatch.setattr(response_cache, "enabled", True)
+    monkeypatch.setattr(response_cache, "ttl", TTL)
+    monkeypatch.setattr(response_cache, "stale_ttl", STALE_TTL)
+
+    cached_app = ResponseCacheMiddleware(app, cache=response_cache)
+
+    async def fetch(path, headers=None):
+        transport = httpx.ASGITransport(app=cached_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            response = await http.get(path, headers=headers)
+        # 裏での取り直しが終わるまで待つ
+        await asyncio.gather(*list(response_cache._tasks))
+        return response
+
+    cache = SimpleNamespace(clock=clock, backend=backend)
+    cache.get = lambda path, headers=None: client.portal.call(fetch, path, headers)
+    cache.status = lambda path: cache.get(path).headers.get("x-cache")
+    yield cache
+    client.portal.call(backend.clear)
+
+
+def _warm(cache, *paths):
+    """キャッシュに載せる（2回目がHITになることを確認）"""
+    for path in paths:
+        assert cache.status(path) in ("MISS", "HIT"), path
+        assert cache.status(path) == "HIT", path
+
+
+def test_miss_then_hit(cache, category):
+    path = f"/api/products?category_id={category.id}"
+    first = cache.get(path)
+    assert first.headers["x-cache"] == "MISS"
+    second = cache.get(path)
+    assert second.headers["x-cache"] == "HIT"
+    assert second.json() == first.json()
+
+    # クエリの順序が違っても同じキー、値が違えば別のキー
+    assert cache.status(f"/api/products?limit=100&category_id={category.id}") == "MISS"
+    assert cache.status(f"/api/products?category_id={category.id}&limit=100") == "HIT"
+
+
+def test_authorized_requests_bypass_cache(cache, make_user, category):
+    _, headers = make_user()
+    path = f"/api/products?category_id={category.id}"
+    _warm(cache, path)
+    response = cache.get(path, headers)
+    assert response.status_code == 200
+    assert "x-cache" not in response.headers
+
+
+def test_ttl_expiry_and_stale_while_revalidate(cache, make_user, make_product, category):
+    seller, _ = make_user()
+    path = f"/api/products?category_id={category.id}"
+    _warm(cache, path)
+    assert cache.get(path).json() == []
+
+    # キャッシュを破棄しない変更（DBの直接更新）は期限まで反映されない
+    product = make_product(seller)
+    assert cache.get(path).json() == []
+
+    # 期限切れ後は古いレスポンスを返しつつ裏で取り直す
+    cache.clock.advance(TTL + 1)
+    stale = cache.get(path)
+    assert stale.headers["x-cache"] == "STALE"
+    assert stale.json() == []
+    fresh = cache.get(path)
+    assert fresh.headers["x-cache"] == "HIT"
+    assert [p["id"] for p in fresh.json()] == [product.id]
+
+    # 古いレスポンスを返せる期間も過ぎたら取り直すまで待つ
+    cache.clock.advance(TTL + STALE_TTL + 1)
+    assert cache.status(path) == "MISS"
+
+
+def test_conditional_get_on_cached_entry(cache, make_user):
+    seller, _ = make_user()
+    path = f"/api/shops/{seller.id}"
+    _warm(cache, path)
+    etag = cache.get(path).headers["etag"]
+    response = cache.get(path, {"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["x-cache"] == "HIT"
+
+
+def test_create_invalidates_catalog_and_seller(client, cache, make_user, make_product, category):
+    seller, headers = make_user()
+    other_seller, _ = make_user()
+    other_product = make_product(other_seller, category_id=category.id)
+    listing = f"/api/products?category_id={category.id}"
+    facets = "/api/products/facets"
+    shop, other_shop = f"/api/shops/{seller.id}", f"/api/shops/{other_seller.id}"
+    other_detail = f"/api/products/{other_product.id}"
+    _warm(cache, listing, facets, shop, other_shop, other_detail)
+
+    response = client.post("/api/products", json={
+        "name": "新しい商品", "price": 1500, "category_id": category.id,
+    }, headers=headers)
+    assert response.status_code == 200, response.text
+
+    assert cache.status(listing) == "MISS"
+    assert cache.status(facets) == "MISS"
+    assert cache.status(shop) == "MISS"
+    # 他の出品者のショップ・商品詳細はそのまま
+    assert cache.status(other_shop) == "HIT"
+    assert cache.status(other_detail) == "HIT"
+
+
+def test_update_invalidates_product_catalog_and_seller(client, cache, make_user, make_product, category):
+    seller, headers = make_user()
+    other_seller, _ = make_user()
+    product = make_product(seller)
+    other_product = make_product(other_seller)
+    detail, other_detail = f"/api/products/{product.id}", f"/api/products/{other_product.id}"
+    listing = f"/api/products?category_id={category.id}"
+    shop, other_shop = f"/api/shops/{seller.id}", f"/api/shops/{other_seller.id}"
+    _warm(cache, detail, other_detail, listing, shop, other_shop)
+
+    response = client.put(f"/api/products/{product.id}", json={"price": 2500}, headers=headers)
+    assert response.status_code == 200, response.text
+
+    updated = cache.get(detail)
+    assert updated.headers["x-cache"] == "MISS"
+    assert updated.json()["price"] == 2500
+    assert cache.status(listing) == "MISS"
+    assert cache.status(shop) == "MISS"
+    assert cache.status(other_detail) == "HIT"
+    assert cache.status(other_shop) == "HIT"
+
+
+def test_delete_invalidates_product_catalog_and_seller(client, cache, make_user, make_product, category):
+    seller, headers = make_user()
+    other_seller, _ = make_user()
+    product = make_product(seller)
+    other_product = make_product(other_seller)
+    detail, other_detail = f"/api/products/{product.id}", f"/api/products/{other_product.id}"
+    listing = f"/api/products?category_id={category.id}"
+    shop = f"/api/shops/{seller.id}"
+    _warm(cache, detail, other_detail, listing, shop)
+
+    response = client.delete(f"/api/products/{product.id}", headers=headers)
+    assert response.status_code == 200, response.text
+
+    deleted = cache.get(detail)
+    assert deleted.headers["x-cache"] == "MISS"
+    assert deleted.json()["status"] == "deleted"
+    listed = cache.get(listing)
+    assert listed.headers["x-cache"] == "MISS"
+    assert product.id not in [p["id"] for p in listed.json()]
+    assert cache.status(shop) == "MISS"
+    assert cache.status(other_detail) == "HIT"
+
+
+def test_order_invalidates_ordered_products(client, cache, make_user, make_product, make_category, category):
+    other_category = make_category()
+    seller, _ = make_user()
+    other_seller, _ = make_user()
+    _, buyer_headers = make_user()
+    product = make_product(seller, stock=2)
+    other_product = make_product(other_seller, category_id=other_category.id)
+    detail, other_detail = f"/api/products/{product.id}", f"/api/products/{other_product.id}"
+    listing = f"/api/products?category_id={category.id}"
+    other_listing = f"/api/products?category_id={other_category.id}"
+    shop, other_shop = f"/api/shops/{seller.id}", f"/api/shops/{other_seller.id}"
+    _warm(cache, detail, other_detail, listing, other_listing, shop, other_shop)
+
+    # 在庫が残る注文: 注文した商品を含むページだけ破棄し、他の一覧（絞り込み結果は変わらない）は残す
+    response = client.post("/api/orders/", json=order_payload((product.id, 1)), headers=buyer_headers)
+    assert response.status_code == 200, response.text
+    ordered = cache.get(detail)
+    assert ordered.headers["x-cache"] == "MISS"
+    assert ordered.json()["stock"] == 1
+    assert cache.status(shop) == "MISS"
+    assert cache.status(listing) == "MISS"
+    for path in (other_detail, other_listing, other_shop):
+        assert cache.status(path) == "HIT", path
+
+    # 売り切れる注文: 販売状況の絞り込みが変わるため全ての一覧を破棄する
+    response = client.post("/api/orders/", json=order_payload((product.id, 1)), headers=buyer_headers)
+    assert response.status_code == 200, response.text
+    assert cache.get(detail).json()["status"] == "sold"
+    assert cache.status(other_listing) == "MISS"
+    assert cache.status(other_detail) == "HIT"
+    assert cache.status(other_shop) == "HIT"
+
+
+def test_deleting_seller_invalidates_before_cleanup_job(client, cache, make_user, make_product, category, monkeypatch):
+    # 商品の後片付けのジョブ（別プロセスのワーカーで動くことがある）を待たずに、このプロセスで破棄する
+    removed_sellers = []
+    monkeypatch.setattr(catalog_index, "remove_seller", removed_sellers.append)
+    _, admin_headers = make_user("admin")
+    seller, _ = make_user()
+    make_product(seller)
+    listing = f"/api/products?category_id={category.id}"
+    facets = "/api/products/facets"
+    _warm(cache, listing, facets)
+
+    response = client.delete(f"/api/admin/users/{seller.id}", headers=admin_headers)
+    assert response.status_code == 200, response.text
+
+    assert removed_sellers == [seller.id]
+    assert cache.status(listing) == "MISS"
+    assert cache.status(facets) == "MISS"
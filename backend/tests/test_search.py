@@ -0,0 +1,45 @@
+# 商品の全文検索（bi-gram索引での部分一致）
+import uuid
+import pytest
+from app.search import ngram_text
+
+
+def _create_product(client, headers, category, name, description="テスト用の商品"):
+    response = client.post("/api/products", json={
+        "name": name, "description": description, "price": 1000, "category_id": category.id,
+    }, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def _search_ids(client, q, category):
+    response = client.get("/api/products/search", params={"q": q, "category_id": category.id})
+    assert response.status_code == 200, response.text
+    return {product["id"] for product in response.json()}
+
+
+def test_index_contains_last_character_of_each_word():
+    assert ngram_text("革靴 商品") == "革靴 靴 商品 品"
+    assert ngram_text("靴") == "靴"
+
+
+@pytest.mark.parametrize("q", ["革", "靴", "革靴", "本革靴", "黒い", "い", "黒"])
+def test_search_matches_substrings_including_single_characters(client, make_user, category, q):
+    _, headers = make_user()
+    product_id = _create_product(client, headers, category, "黒い本革靴")
+    assert product_id in _search_ids(client, q, category)
+
+
+@pytest.mark.parametrize("q", ["靴革", "白", "革靴下"])
+def test_search_does_not_match_other_text(client, make_user, category, q):
+    _, headers = make_user()
+    product_id = _create_product(client, headers, category, "黒い本革靴")
+    assert product_id not in _search_ids(client, q, category)
+
+
+def test_single_character_search_finds_word_ending_in_description(client, make_user, category):
+    _, headers = make_user()
+    marker = uuid.uuid4().hex[:8]
+    product_id = _create_product(client, headers, category, f"item {marker}", description="テスト商品")
+    assert product_id in _search_ids(client, "品", category)
+    assert product_id in _search_ids(client, "商", category)
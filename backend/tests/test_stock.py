@@ -0,0 +1,103 @@
+# 在庫引当の競合テスト（同じ商品への同時注文で売り越さないこと）
+import asyncio
+from unittest.mock import patch
+import httpx
+import pytest
+from sqlalchemy.orm.attributes import set_committed_value
+from app import models, stock
+from app.database import AsyncSessionLocal
+from app.main import app
+from app.schemas import OrderItemCreate
+from .conftest import order_payload
+
+BUYERS = 20
+
+
+async def _place_orders_concurrently(requests):
+    """注文をすべて同時に送信してレスポンスを返す"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        return await asyncio.gather(*(
+            http.post("/api/orders/", json=payload, headers=headers) for payload, headers in requests
+        ))
+
+
+def test_parallel_orders_do_not_oversell(client, db, make_user, make_product):
+    seller, _ = make_user()
+    product = make_product(seller, stock=1)
+    buyers = [make_user()[1] for _ in range(BUYERS)]
+
+    # アプリと同じイベントループで同時に実行する（DBのコネクションはループに紐づくため）
+    responses = client.portal.call(
+        _place_orders_concurrently,
+        [(order_payload((product.id, 1)), headers) for headers in buyers]
+    )
+
+    statuses = [response.status_code for response in responses]
+    assert statuses.count(200) == 1, statuses
+    # 残りは在庫不足として断られる（ロック待ちのエラーなどで500にならない）
+    assert statuses.count(400) == BUYERS - 1, statuses
+
+    db.expire_all()
+    product = db.get(models.Product, product.id)
+    assert product.stock == 0
+    assert product.status == "sold"
+    ordered = db.query(models.OrderItem).filter(models.OrderItem.product_id == product.id).count()
+    assert ordered == 1
+
+
+def test_parallel_orders_share_remaining_stock(client, db, make_user, make_product):
+    seller, _ = make_user()
+    product = make_product(seller, stock=5)
+    buyers = [make_user()[1] for _ in range(BUYERS)]
+
+    responses = client.portal.call(
+        _place_orders_concurrently,
+        [(order_payload((product.id, 2)), headers) for headers in buyers]
+    )
+
+    statuses = [response.status_code for response in responses]
+    assert statuses.count(200) == 2, statuses
+
+    db.expire_all()
+    assert db.get(models.Product, product.id).stock == 1
+
+
+async def _reserve_with_stale_read(items, stale_stock):
+    """読み込み後に他の注文が在庫を減らした状況で引き当てる（1回目の読み込みは古い在庫を返す）"""
+    calls = []
+    load_products = stock.load_products
+
+    async def stale_load_products(db, product_ids, lock=False):
+        products = await load_products(db, product_ids, lock)
+        if not calls:
+            for product_id, value in stale_stock.items():
+                set_committed_value(products[product_id], "stock", value)
+        calls.append(list(product_ids))
+        return products
+
+    async with AsyncSessionLocal() as db:
+        with patch.object(stock, "load_products", stale_load_products):
+            with pytest.raises(stock.StockError) as error:
+                await stock.reserve_stock(db, items)
+        # 引当の失敗後もトランザクションは呼び出し側のもの（ここでrollbackする）
+        assert db.in_transaction()
+        await db.rollback()
+    return error.value, calls
+
+
+def test_reserve_conflict_reports_only_conflicted_products(client, db, make_user, make_product):
+    seller, _ = make_user()
+    available = make_product(seller, stock=5)
+    sold_out = make_product(seller, stock=0)
+    items = [OrderItemCreate(product_id=available.id, quantity=1), OrderItemCreate(product_id=sold_out.id, quantity=1)]
+
+    error, calls = client.portal.call(_reserve_with_stale_read, items, {sold_out.id: 1})
+
+    assert [failure["product_id"] for failure in error.failures] == [sold_out.id]
+    assert error.failures[0]["reason"] == "insufficient_stock"
+    # 読み直すのは減算できなかった商品だけ
+    assert calls[1] == [sold_out.id]
+
+    db.expire_all()
+    assert db.get(models.Product, available.id).stock == 5
@@ -0,0 +1,51 @@
+# 別プロセスのジョブワーカー（python -m app.worker）
+import os
+import subprocess
+import sys
+import time
+from app import models, tasks
+from .conftest import order_payload
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TIMEOUT_SECONDS = 30
+
+
+def _wait_for_job(db, idempotency_key: str, worker: subprocess.Popen) -> models.Job:
+    """ジョブが終わるまで待つ（ワーカーが先に終了した場合・時間切れは失敗）"""
+    deadline = time.monotonic() + TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        assert worker.poll() is None, worker.stdout.read()
+        db.expire_all()
+        job = db.query(models.Job).filter(models.Job.idempotency_key == idempotency_key).one()
+        if job.status in ("succeeded", "failed"):
+            return job
+        time.sleep(0.1)
+    raise AssertionError(f"ジョブが終わりませんでした: {job.status}")
+
+
+def test_standalone_worker_runs_order_placed_job(client, db, make_user, make_product):
+    seller, _ = make_user()
+    _, buyer_headers = make_user()
+    product = make_product(seller, stock=1)
+
+    # APIのプロセスではワーカーを動かさない（JOB_WORKERS=0）ので、ジョブは登録されたまま残る
+    response = client.post("/api/orders/", json=order_payload((product.id, 1)), headers=buyer_headers)
+    assert response.status_code == 200, response.text
+    idempotency_key = f"{tasks.ORDER_PLACED}:{response.json()['id']}"
+
+    env = dict(os.environ, JOB_WORKERS="1", JOB_POLL_INTERVAL="0.1")
+    worker = subprocess.Popen(
+        [sys.executable, "-m", "app.worker"], cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+    )
+    try:
+        job = _wait_for_job(db, idempotency_key, worker)
+    finally:
+        worker.terminate()
+        output, _ = worker.communicate(timeout=TIMEOUT_SECONDS)
+
+    assert job.status == "succeeded", job.last_error
+    assert job.attempts == 1
+    assert f"注文通知 order_id={response.json()['id']} seller_id={seller.id}" in output
+    # SIGTERMで実行中のワーカーを止めて正常終了する
+    assert worker.returncode == 0, output
@@ -4,6 +4,8 @@ import { createContext, useContext, useState, useEffect } from 'react';
 
 const CartContext = createContext();
 
+const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
+
 export function CartProvider({ children }) {
   const [cart, setCart] = useState([]);
 
@@ -65,6 +67,43 @@ export function CartProvider({ children }) {
     setCart([]);
   };
 
+  // サーバーの現在の価格・在庫でカートを確認（全商品を1回のリクエストで）
+  // 購入できる場合は注文時に渡す見積もり（quote.quote）も返る
+  // ログイン中は注文に使える見積もり（quote）も発行される
+  const refreshCart = async () => {
+    const token = localStorage.getItem('token');
+    const response = await fetch(`${API_URL}/api/cart/quote`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        ...(token ? { 'Authorization': `Bearer ${token}` } : {})
+      },
+      body: JSON.stringify({
+        items: cart.map(item => ({
+          product_id: item.id,
+          quantity: item.quantity,
+          price: item.price
+        }))
+      })
+    });
+    if (!response.ok) {
+      throw new Error('カートの確認に失敗しました');
+    }
+    const quote = await response.json();
+
+    // 現在の価格・在庫をカートに反映
+    const lines = new Map(quote.items.map(line => [line.product_id, line]));
+    setCart(prevCart =>
+      prevCart.map(item => {
+        const line = lines.get(item.id);
+        return line && line.price !== null
+          ? { ...item, price: line.price, stock: line.stock, status: line.status }
+          : item;
+      })
+    );
+    return quote;
+  };
+
   // 合計金額を計算
   const getTotalPrice = () => {
     return cart.reduce((total, item) => total + item.price * item.quantity, 0);
@@ -83,6 +122,7 @@ export function CartProvider({ children }) {
         removeFromCart,
         updateQuantity,
         clearCart,
+        refreshCart,
         getTotalPrice,
         getTotalItems,
       }}
@@ -9,6 +9,16 @@ const nextConfig = {
   env: {
     NEXT_PUBLIC_API_URL: process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000',
   },
+
+  // 商品画像（image_urlは /api/images/... の相対URL）をバックエンドへ転送
+  async rewrites() {
+    return [
+      {
+        source: '/api/images/:path*',
+        destination: `${process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'}/api/images/:path*`,
+      },
+    ];
+  },
 };
 
 export default nextConfig;
@@ -12,10 +12,14 @@ export default function AdminPage() {
   const [products, setProducts] = useState([]);
   const [users, setUsers] = useState([]);
   const [orders, setOrders] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [totalCount, setTotalCount] = useState(null);
   const [dataLoading, setDataLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [activeTab, setActiveTab] = useState('products'); // products, users, orders
 
   const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
+  const PAGE_SIZE = 50;
 
   useEffect(() => {
     // 認証チェックが完了していない場合は待つ
@@ -39,29 +43,55 @@ export default function AdminPage() {
     fetchUsers();
   }, [user, authLoading, router]);
 
-  const fetchUsers = async () => {
-    try {
-      const token = localStorage.getItem('token');
+  // 次のページは X-Next-Cursor のカーソルで取得する
+  const fetchUserPage = async (cursor) => {
+    const token = localStorage.getItem('token');
+    const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+    if (cursor) params.set('cursor', cursor);
+    const response = await fetch(`${API_URL}/api/admin/users?${params.toString()}`, {
+      headers: {
+        'Authorization': `Bearer ${token}`  // ヘッダーで送信
+      }
+    });
 
-      const response = await fetch(`${API_URL}/api/admin/users`, {
-        headers: {
-          'Authorization': `Bearer ${token}`  // ヘッダーで送信
-        }
-      });
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
 
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`);
-      }
+    return {
+      items: await response.json(),
+      cursor: response.headers.get('X-Next-Cursor'),
+      total: response.headers.get('X-Total-Count'),
+      exact: response.headers.get('X-Total-Count-Exact') !== 'false',
+    };
+  };
 
-      const data = await response.json();
-      setUsers(data);
-      setDataLoading(false);
+  const fetchUsers = async () => {
+    try {
+      const page = await fetchUserPage();
+      setUsers(page.items);
+      setNextCursor(page.cursor);
+      setTotalCount(page.total ? { value: Number(page.total), exact: page.exact } : null);
     } catch (error) {
       console.error('ユーザー取得エラー:', error);
+    } finally {
       setDataLoading(false);
     }
   };
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const page = await fetchUserPage(nextCursor);
+      setUsers(prev => [...prev, ...page.items]);
+      setNextCursor(page.cursor);
+    } catch (error) {
+      console.error('ユーザー取得エラー:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleDeleteUser = async (userId) => {
     if (!confirm('このユーザーを削除しますか？')) return;
 
@@ -118,7 +148,10 @@ export default function AdminPage() {
             <h1 className="text-3xl font-bold text-gray-900">
               管理者画面
             </h1>
-            <p className="text-gray-600">ユーザー管理</p>
+            <p className="text-gray-600">
+              ユーザー管理
+              {totalCount && `（${totalCount.exact ? '' : '約'}${totalCount.value.toLocaleString()}人）`}
+            </p>
           </div>
         </div>
 
@@ -220,6 +253,18 @@ export default function AdminPage() {
             </div>
           ))}
         </div>
+
+        {nextCursor && (
+          <div className="mt-8 text-center">
+            <button
+              onClick={loadMore}
+              disabled={loadingMore}
+              className="btn-primary disabled:opacity-50"
+            >
+              {loadingMore ? '読み込み中...' : 'もっと見る'}
+            </button>
+          </div>
+        )}
       </main>
     </div>
   );
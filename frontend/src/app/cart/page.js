@@ -1,5 +1,6 @@
 'use client';
 
+import {useEffect, useState} from 'react';
 import {useCart} from '../../../contexts/CartContext';
 import {useRouter} from 'next/navigation';
 import Header from '../../../components/Header';
@@ -7,7 +8,19 @@ import Link from 'next/link';
 
 export default function CartPage() {
     const router = useRouter();
-    const {cart, removeFromCart, updateQuantity, clearCart, getTotalPrice} = useCart();
+    const {cart, removeFromCart, updateQuantity, clearCart, getTotalPrice, refreshCart} = useCart();
+    const [lineStatus, setLineStatus] = useState({});
+
+    // 現在の価格・在庫をまとめて確認（商品ごとにリクエストしない）
+    useEffect(() => {
+        if (cart.length === 0) return;
+        refreshCart()
+            .then(quote => setLineStatus(
+                Object.fromEntries(quote.items.map(line => [line.product_id, line]))
+            ))
+            .catch(() => setLineStatus({}));
+        // eslint-disable-next-line react-hooks/exhaustive-deps
+    }, [cart.length]);
 
     if (cart.length === 0) {
         return (
@@ -73,6 +86,16 @@ export default function CartPage() {
                                         <p className="text-lg font-bold mt-2">
                                             ¥{item.price.toLocaleString()}
                                         </p>
+                                        {lineStatus[item.id]?.price_changed && (
+                                            <p className="text-sm text-yellow-700 mt-1">
+                                                価格が変更されました（以前: ¥{lineStatus[item.id].requested_price.toLocaleString()}）
+                                            </p>
+                                        )}
+                                        {lineStatus[item.id] && !lineStatus[item.id].available && (
+                                            <p className="text-sm text-red-600 mt-1">
+                                                {lineStatus[item.id].message}
+                                            </p>
+                                        )}
 
                                         {/* 数量変更 */}
                                         <div className="flex items-center gap-4 mt-4 flex-wrap">
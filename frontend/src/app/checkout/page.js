@@ -9,7 +9,7 @@ import Link from 'next/link';
 
 export default function CheckoutPage() {
   const router = useRouter();
-  const { cart, getTotalPrice, clearCart } = useCart();
+  const { cart, getTotalPrice, clearCart, refreshCart } = useCart();
   const { user, loading: authLoading } = useAuth();
 
   const [shippingInfo, setShippingInfo] = useState({
@@ -23,6 +23,7 @@ export default function CheckoutPage() {
   });
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
+  const [quote, setQuote] = useState(null);
 
   const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
 
@@ -33,6 +34,15 @@ export default function CheckoutPage() {
     }
   }, [user, authLoading, router]);
 
+  // 現在の価格・在庫を確認して見積もりを取得（カートの読み込み後・数量の変更時）
+  useEffect(() => {
+    if (cart.length === 0) return;
+    refreshCart()
+      .then(setQuote)
+      .catch(err => setError(err.message));
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [cart.length]);
+
   // カートが空の場合
   if (cart.length === 0) {
     return (
@@ -84,7 +94,9 @@ export default function CheckoutPage() {
           product_id: item.id,
           quantity: item.quantity,
           price: item.price
-        }))
+        })),
+        // 見積もりがあればその価格で注文する（サーバー側で価格を確定）
+        quote: quote?.quote
       };
 
       const response = await fetch(`${API_URL}/api/orders?token=${token}`, {
@@ -97,6 +109,10 @@ export default function CheckoutPage() {
 
       if (!response.ok) {
         const errorData = await response.json();
+        if (response.status === 409) {
+          // 価格の変更・使用済みの見積もり: 最新の価格で見積もりを取り直してから再度注文できるようにする
+          refreshCart().then(setQuote).catch(() => setQuote(null));
+        }
         throw new Error(errorData.detail || '注文に失敗しました');
       }
 
@@ -129,6 +145,14 @@ export default function CheckoutPage() {
           </div>
         )}
 
+        {quote && !quote.purchasable && (
+          <div className="bg-yellow-50 border border-yellow-200 text-yellow-800 px-4 py-3 rounded mb-6">
+            {quote.items.filter(line => !line.available).map(line => (
+              <p key={line.product_id}>{line.message}</p>
+            ))}
+          </div>
+        )}
+
         <div className="grid grid-cols-1 lg:grid-cols-3 gap-8">
           {/* 配送先情報入力 */}
           <div className="lg:col-span-2">
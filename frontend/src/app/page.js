@@ -15,21 +15,40 @@ function HomePageContent() {
     const priceFilter = searchParams.get('price');
 
     const [products, setProducts] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const [loading, setLoading] = useState(true);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [error, setError] = useState(null);
 
     const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
+    const PAGE_SIZE = 40;
+
+    // カテゴリと価格はサーバー側で絞り込み、次のページは X-Next-Cursor のカーソルで取得する
+    const fetchProductPage = async (cursor) => {
+        const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+        if (category) params.set('category', category);
+        if (priceFilter) params.set('max_price', priceFilter);
+        if (cursor) params.set('cursor', cursor);
+        const response = await fetch(`${API_URL}/api/products?${params.toString()}`, {
+            cache: 'no-store'
+        });
+        if (!response.ok) {
+            throw new Error('商品の取得に失敗しました');
+        }
+        return {
+            items: await response.json(),
+            cursor: response.headers.get('X-Next-Cursor'),
+        };
+    };
 
     useEffect(() => {
 
         async function fetchProducts() {
             try {
                 setLoading(true);
-                const response = await fetch(`${API_URL}/api/products`, {
-                    cache: 'no-store'
-                });
-                const data = await response.json();
-                setProducts(data);
+                const page = await fetchProductPage();
+                setProducts(page.items);
+                setNextCursor(page.cursor);
             } catch (error) {
                 console.error('取得エラー:', error);
                 setError(error.message);
@@ -39,26 +58,20 @@ function HomePageContent() {
         }
 
         fetchProducts();
-    }, [API_URL]);
-
-    // カテゴリと価格でフィルタリング
-    const filteredProducts = products.filter(product => {
-
-        // カテゴリフィルター
-        if (category && product.category?.slug !== category) {
-            return false;
-        }
-
-        // 価格フィルター
-        if (priceFilter) {
-            const maxPrice = parseInt(priceFilter);
-            if (product.price > maxPrice) {
-                return false;
-            }
+    }, [API_URL, category, priceFilter]);
+
+    const loadMore = async () => {
+        setLoadingMore(true);
+        try {
+            const page = await fetchProductPage(nextCursor);
+            setProducts(prev => [...prev, ...page.items]);
+            setNextCursor(page.cursor);
+        } catch (error) {
+            console.error('取得エラー:', error);
+        } finally {
+            setLoadingMore(false);
         }
-
-        return true;
-    });
+    };
 
     if (loading) {
         return (
@@ -111,7 +124,7 @@ function HomePageContent() {
                     </h2>
                     <div className="flex items-center gap-4">
                         <p className="text-gray-600 text-lg">
-                            {filteredProducts.length}件の商品
+                            {products.length}{nextCursor ? '件以上' : '件'}の商品
                         </p>
                         {(category || priceFilter) && (
                             <button
@@ -126,13 +139,26 @@ function HomePageContent() {
 
                 {/* 商品グリッド */}
                 <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-3 xl:grid-cols-4 gap-8">
-                    {filteredProducts.map(product => (
+                    {products.map(product => (
                         <ProductCard key={product.id} product={product}/>
                     ))}
                 </div>
 
+                {/* 次のページ */}
+                {nextCursor && (
+                    <div className="mt-12 text-center">
+                        <button
+                            onClick={loadMore}
+                            disabled={loadingMore}
+                            className="btn-primary disabled:opacity-50"
+                        >
+                            {loadingMore ? '読み込み中...' : 'もっと見る'}
+                        </button>
+                    </div>
+                )}
+
                 {/* 商品がない場合 */}
-                {filteredProducts.length === 0 && !loading && !error && (
+                {products.length === 0 && !loading && !error && (
                     <div className="text-center py-20">
                         <div className="text-6xl mb-6">😢</div>
                         <p className="text-gray-500 text-xl mb-6">
@@ -9,28 +9,32 @@ export default function ShopPage() {
   const params = useParams();
   const router = useRouter();
   const [shopOwner, setShopOwner] = useState(null);
+  const [stats, setStats] = useState(null);
   const [products, setProducts] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
 
+  // ショップ情報（出品者・件数・商品の1ページ目以降）を1回のリクエストで取得
+  const fetchShopPage = async (cursor) => {
+    const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+    const res = await fetch(`${API_URL}/api/shops/${params.userId}${query}`);
+    if (!res.ok) {
+      throw new Error('ユーザーが見つかりません');
+    }
+    return res.json();
+  };
+
   useEffect(() => {
     const fetchShopData = async () => {
       try {
-        // ショップオーナー情報取得
-        const userRes = await fetch(`${API_URL}/api/users/${params.userId}`);
-        if (!userRes.ok) {
-          throw new Error('ユーザーが見つかりません');
-        }
-        const userData = await userRes.json();
-        setShopOwner(userData);
-
-        // そのユーザーの商品取得
-        const productsRes = await fetch(`${API_URL}/api/users/${params.userId}/products`);
-        if (productsRes.ok) {
-          const productsData = await productsRes.json();
-          setProducts(productsData);
-        }
+        const data = await fetchShopPage();
+        setShopOwner(data.seller);
+        setStats(data.stats);
+        setProducts(data.products);
+        setNextCursor(data.next_cursor);
       } catch (error) {
         console.error('データ取得エラー:', error);
       } finally {
@@ -42,6 +46,19 @@ export default function ShopPage() {
     }
   }, [params.userId, API_URL]);
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const data = await fetchShopPage(nextCursor);
+      setProducts(prev => [...prev, ...data.products]);
+      setNextCursor(data.next_cursor);
+    } catch (error) {
+      console.error('データ取得エラー:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   if (loading) {
     return (
       <div className="min-h-screen flex items-center justify-center">
@@ -95,7 +112,8 @@ export default function ShopPage() {
                 {shopOwner.username}'s Store
               </h1>
               <p className="text-gray-600 mt-1">
-                {products.length}件の商品を販売中
+                {stats.listing_count}件の商品を販売中
+                {stats.sold_count > 0 && ` ・ ${stats.sold_count}件売却済み`}
               </p>
             </div>
           </div>
@@ -115,6 +133,18 @@ export default function ShopPage() {
             ))}
           </div>
         )}
+
+        {nextCursor && (
+          <div className="mt-8 text-center">
+            <button
+              onClick={loadMore}
+              disabled={loadingMore}
+              className="px-6 py-3 bg-white rounded-lg shadow text-gray-700 hover:bg-gray-50 disabled:opacity-50"
+            >
+              {loadingMore ? '読み込み中...' : 'もっと見る'}
+            </button>
+          </div>
+        )}
       </main>
     </div>
   );